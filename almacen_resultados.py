@@ -0,0 +1,169 @@
+import os
+import sys
+import csv
+import sqlite3
+
+# =========================================================================
+# 📌 ALMACÉN DE RESULTADOS (SQLite)
+# =========================================================================
+# En la ejecución por subprocesos (app.py sin --en-proceso) cada etapa de
+# reintento leía el CSV completo, cambiaba unas cuantas filas y lo reescribía
+# entero. Con el almacén:
+#   * proceso1 guarda todas las filas una vez;
+#   * reintentos (o proceso2 ... proceso4 sueltos) consultan SOLO las filas NO
+#     ENCONTRADO (índice por Estatus) y actualizan únicamente esas filas;
+#   * el CSV 'resultados_coordenadas.csv' se exporta al final (reintentos) o a
+#     pedido:  python almacen_resultados.py [archivo.csv]
+# Los valores se guardan como texto, igual que en el CSV, para que la
+# exportación sea idéntica a la que escribían los procesos.
+
+ARCHIVO_ALMACEN = 'resultados_coordenadas.db'
+CSV_EXPORTACION = 'resultados_coordenadas.csv'
+CAMPOS = ['OT', 'Resto_Nombre', 'Latitud_Extraida', 'Longitud_Extraida', 'Latitud_Decimal', 'Longitud_Decimal', 'Estatus', 'Metodo_Extraccion']
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS resultados (
+    orden INTEGER PRIMARY KEY, -- posición de la fila en el CSV
+    OT TEXT, Resto_Nombre TEXT, Latitud_Extraida TEXT, Longitud_Extraida TEXT,
+    Latitud_Decimal TEXT, Longitud_Decimal TEXT, Estatus TEXT, Metodo_Extraccion TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_resultados_ot_resto ON resultados (OT, Resto_Nombre);
+CREATE INDEX IF NOT EXISTS idx_resultados_estatus ON resultados (Estatus);
+"""
+
+
+def clave_fila(ot, resto_nombre):
+    """
+    Clave de una fila: (OT rellenada a 8 dígitos, Resto_Nombre). proceso2 reescribe la
+    OT rellenada al recuperar una falla, así que la OT original y la rellenada dan la misma clave.
+    """
+    return (ot or '').strip().zfill(8), (resto_nombre or '').strip()
+
+
+def indexar_filas(filas):
+    """Índice {clave_fila: fila} (la primera fila gana si la clave se repite)."""
+    indice = {}
+    for fila in filas:
+        indice.setdefault(clave_fila(fila.get('OT', ''), fila.get('Resto_Nombre', '')), fila)
+    return indice
+
+
+def existe(ruta_almacen=ARCHIVO_ALMACEN):
+    """True si ya hay un almacén creado por proceso1."""
+    return os.path.exists(ruta_almacen)
+
+
+def _conectar(ruta_almacen):
+    conexion = sqlite3.connect(ruta_almacen)
+    conexion.executescript(_ESQUEMA)
+    return conexion
+
+
+def _valores(fila):
+    return tuple('' if fila.get(campo) is None else str(fila.get(campo, '')) for campo in CAMPOS)
+
+
+def guardar_filas(filas, ruta_almacen=ARCHIVO_ALMACEN):
+    """Reemplaza el contenido del almacén con 'filas' (en ese orden)."""
+    conexion = _conectar(ruta_almacen)
+    try:
+        with conexion:
+            conexion.execute("DELETE FROM resultados")
+            conexion.executemany(
+                f"INSERT INTO resultados (orden, {', '.join(CAMPOS)}) VALUES (?{', ?' * len(CAMPOS)})",
+                ((orden,) + _valores(fila) for orden, fila in enumerate(filas))
+            )
+        print(f"\n✅ ALMACÉN ACTUALIZADO: {len(filas)} registros guardados en {ruta_almacen}")
+    finally:
+        conexion.close()
+
+
+def importar_csv(nombre_csv, ruta_almacen=ARCHIVO_ALMACEN):
+    """Crea el almacén a partir de un CSV de resultados existente. Devuelve False si no se pudo leer."""
+    try:
+        with open(nombre_csv, 'r', newline='', encoding='utf-8') as archivo_csv:
+            filas = list(csv.DictReader(archivo_csv))
+    except Exception as e:
+        print(f"❌ Error al leer el CSV '{nombre_csv}' para crear el almacén: {e}")
+        return False
+    guardar_filas(filas, ruta_almacen)
+    return True
+
+
+def filas_con_estatus(estatus, ruta_almacen=ARCHIVO_ALMACEN):
+    """Consulta indexada: devuelve (ordenes, filas) de los registros con ese Estatus."""
+    conexion = _conectar(ruta_almacen)
+    try:
+        cursor = conexion.execute(
+            f"SELECT orden, {', '.join(CAMPOS)} FROM resultados WHERE Estatus = ? ORDER BY orden", (estatus,)
+        )
+        ordenes, filas = [], []
+        for registro in cursor:
+            ordenes.append(registro[0])
+            filas.append(dict(zip(CAMPOS, registro[1:])))
+        return ordenes, filas
+    finally:
+        conexion.close()
+
+
+def fallas_para_reproceso(estatus, csv_respaldo, ruta_almacen=ARCHIVO_ALMACEN):
+    """
+    Entrada de las etapas de reintento fuera del pipeline: (ordenes, filas) con ese Estatus.
+    Si aún no hay almacén pero sí un CSV de resultados, se importa primero.
+    Devuelve (None, None) si no hay de dónde leer.
+    """
+    if not existe(ruta_almacen):
+        if not os.path.exists(csv_respaldo):
+            print(f"❌ Error: No se encontró el almacén '{ruta_almacen}' ni el archivo de entrada '{csv_respaldo}'.")
+            return None, None
+        print(f"📥 Importando '{csv_respaldo}' al almacén '{ruta_almacen}'...")
+        if not importar_csv(csv_respaldo, ruta_almacen):
+            return None, None
+    return filas_con_estatus(estatus, ruta_almacen)
+
+
+def actualizar_filas(ordenes, filas, ruta_almacen=ARCHIVO_ALMACEN):
+    """Upsert por posición: escribe solo las filas indicadas, el resto del almacén no se toca."""
+    conexion = _conectar(ruta_almacen)
+    try:
+        with conexion:
+            conexion.executemany(
+                f"INSERT OR REPLACE INTO resultados (orden, {', '.join(CAMPOS)}) VALUES (?{', ?' * len(CAMPOS)})",
+                ((orden,) + _valores(fila) for orden, fila in zip(ordenes, filas))
+            )
+        print(f"\n✅ ALMACÉN ACTUALIZADO: {len(ordenes)} registros reprocesados guardados en {ruta_almacen}")
+    finally:
+        conexion.close()
+
+
+def leer_filas(ruta_almacen=ARCHIVO_ALMACEN):
+    """Devuelve todas las filas en el orden original."""
+    conexion = _conectar(ruta_almacen)
+    try:
+        cursor = conexion.execute(f"SELECT {', '.join(CAMPOS)} FROM resultados ORDER BY orden")
+        return [dict(zip(CAMPOS, registro)) for registro in cursor]
+    finally:
+        conexion.close()
+
+
+def exportar_csv(nombre_csv=CSV_EXPORTACION, ruta_almacen=ARCHIVO_ALMACEN):
+    """Exporta el almacén al formato CSV de resultados de siempre."""
+    try:
+        with open(nombre_csv, 'w', newline='', encoding='utf-8') as archivo_csv:
+            escritor = csv.DictWriter(archivo_csv, fieldnames=CAMPOS, restval='')
+            escritor.writeheader()
+            escritor.writerows(leer_filas(ruta_almacen))
+        print(f"\n✅ EXPORTACIÓN EXITOSA: Los resultados se guardaron en {nombre_csv}")
+        return True
+    except Exception as e:
+        print(f"\n❌ ERROR DE EXPORTACIÓN: No se pudo escribir el archivo CSV. {e}")
+        return False
+
+
+if __name__ == '__main__':
+    # Exportación a pedido: python almacen_resultados.py [archivo_salida.csv]
+    if not existe():
+        print(f"❌ No existe el almacén '{ARCHIVO_ALMACEN}'. Ejecute primero proceso1.")
+        sys.exit(1)
+    if not exportar_csv(sys.argv[1] if len(sys.argv) > 1 else CSV_EXPORTACION):
+        sys.exit(1)
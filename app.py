@@ -7,20 +7,38 @@ import importlib.util # Para verificar librerías
 
 # --- Configuración ---
 # Lista de los scripts a ejecutar en orden.
-# Formato: (nombre_del_script, requiere_ciudad, requiere_tesseract)
+# Formato: (nombre_del_script, requiere_ciudad, requiere_tesseract, recibe_opciones)
+# recibe_opciones: el script recibe las opciones adicionales de app.py (ej. --workers N)
 PROCESOS = [
-    ("proceso1.py", True, True),  # Necesita ciudad y Tesseract path
-    ("proceso2.py", False, True), # Necesita Tesseract path, NO ciudad
-    ("proceso3.py", True, True),  # Necesita ciudad y Tesseract path
-    ("proceso4.py", True, True),  # Necesita ciudad y Tesseract path
-    ("proceso5.py", False, False), # No necesita nada
+    ("proceso1.py", True, True, True),  # Necesita ciudad y Tesseract path
+    ("reintentos.py", True, True, True), # Reintentos de fallas (antes proceso2, proceso3 y proceso4)
+    ("proceso5.py", False, False, False), # No necesita nada
 ]
+# Con --revalidar no hay OCR: se revalidan las lecturas guardadas y se recalculan las distancias
+PROCESOS_REVALIDACION = [
+    ("revalidacion.py", True, False, False), # Solo necesita la ciudad
+    ("proceso5.py", False, False, False),
+]
+
+# Opciones de línea de comandos del orquestador:
+#   --en-proceso : ejecuta las etapas como funciones en un solo intérprete (pipeline.py),
+#                  pasando los registros en memoria en lugar de re-leer el CSV en cada proceso.
+#   --snapshots  : (solo con --en-proceso) guarda el CSV intermedio de cada etapa.
+#   --motor M    : motor OCR para todas las etapas ('cli' o 'libtesseract').
+#   --revalidar  : no lee imágenes ni usa Tesseract: vuelve a aplicar corrección, W forzada y
+#                  rangos de la ciudad a las lecturas OCR guardadas (revalidacion.py) y ejecuta proceso5.
+# Cualquier otra opción se reenvía a proceso1 y a reintentos (ej. --workers 8, --estrategias RAW_PSM6,RAW_PSM11).
+OPCION_EN_PROCESO = '--en-proceso'
+OPCION_SNAPSHOTS = '--snapshots'
+OPCION_MOTOR = '--motor'
+OPCION_REVALIDAR = '--revalidar'
 
 # Archivos y carpeta a eliminar al final
 CARPETA_LIMPIEZA = "diagnostico_ocr"
 # 🛑 ACTUALIZADO: resultados_coordenadas.csv se eliminará al final.
 ARCHIVOS_LIMPIEZA = [
-    "resultados_coordenadas.csv"
+    "resultados_coordenadas.csv",
+    "resultados_coordenadas.db" # Almacén intermedio de proceso1 y reintentos
 ] 
 
 # 🛑 RUTA HARDCODEADA DE TESSERACT (Usada como fallback)
@@ -153,7 +171,7 @@ def detectar_tesseract_path(hardcoded_path):
     return None
 
 
-def ejecutar_script(script_name, ciudad=None, tesseract_path=None):
+def ejecutar_script(script_name, ciudad=None, tesseract_path=None, argumentos_extra=None):
     """Ejecuta un script Python como un subproceso."""
     print(f"\n============================================================")
     print(f"[{script_name}] >> INICIANDO EJECUCIÓN...")
@@ -175,8 +193,16 @@ def ejecutar_script(script_name, ciudad=None, tesseract_path=None):
         comando.append(tesseract_path)
         # 🛑 RUTA OCULTA
         print(f"[{script_name}] Enviando UN SOLO ARGUMENTO (Ruta Tesseract): [Ruta Oculta]")
+    elif ciudad:
+        # Caso revalidacion: solo la Ciudad (Arg 1)
+        comando.append(ciudad)
+        print(f"[{script_name}] Argumento 1 (Ciudad) Enviado: '{ciudad}'")
     # Si ninguno es requerido (P5), comando es solo [python, script_name]
 
+    if argumentos_extra:
+        comando.extend(argumentos_extra)
+        print(f"[{script_name}] Opciones adicionales: {' '.join(argumentos_extra)}")
+
     try:
         # Ejecutar el subproceso. La salida se imprime en tiempo real
         resultado = subprocess.run(
@@ -200,6 +226,22 @@ def ejecutar_script(script_name, ciudad=None, tesseract_path=None):
         print(f"ERROR: No se encontró el script '{script_name}'. Asegúrate de que el archivo exista.")
         return False
 
+def ejecutar_en_proceso(ciudad, tesseract_path, snapshots=False, argumentos_proceso1=None):
+    """Ejecuta todas las etapas dentro de este intérprete usando pipeline.py."""
+    print(f"\n============================================================")
+    print(f"[pipeline.py] >> MODO EN PROCESO (snapshots: {'SÍ' if snapshots else 'NO'})")
+    print(f"============================================================")
+
+    # Se importa aquí porque las librerías pueden haberse instalado en esta misma ejecución
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    import pipeline
+
+    try:
+        return pipeline.ejecutar_pipeline(ciudad, tesseract_path, snapshots=snapshots, argumentos_proceso1=argumentos_proceso1)
+    except Exception as e:
+        print(f"ERROR: [pipeline.py] FALLÓ con una excepción no controlada: {e}")
+        return False
+
 def limpiar_archivos():
     """Elimina la carpeta y archivos especificados."""
     print(f"\n============================================================")
@@ -231,16 +273,26 @@ def limpiar_archivos():
 def main():
     """Función principal para solicitar input y orquestar la ejecución."""
     print("--- INICIO DEL ORQUESTADOR DE PROCESOS ---")
+
+    argumentos = sys.argv[1:]
+    modo_en_proceso = OPCION_EN_PROCESO in argumentos
+    con_snapshots = OPCION_SNAPSHOTS in argumentos
+    modo_revalidar = OPCION_REVALIDAR in argumentos
+    argumentos_proceso1 = [arg for arg in argumentos if arg not in (OPCION_EN_PROCESO, OPCION_SNAPSHOTS, OPCION_REVALIDAR)]
+
+    # El motor OCR se entrega a proceso1 como opción y al resto de procesos por la variable de entorno OCR_MOTOR
+    if OPCION_MOTOR in argumentos[:-1]:
+        os.environ['OCR_MOTOR'] = argumentos[argumentos.index(OPCION_MOTOR) + 1]
     
     # 🛑 1. VALIDACIÓN E INSTALACIÓN DE LIBRERÍAS
     if not verificar_e_instalar_librerias_globales():
         print("\n*** EJECUCIÓN DETENIDA DEBIDO AL FALLO EN LA INSTALACIÓN DE LIBRERÍAS. ***")
         return
     
-    # 🛑 2. VALIDACIÓN Y DETECCIÓN DE TESSERACT
-    tesseract_path_result = detectar_tesseract_path(TESSERACT_EXE_PATH)
+    # 🛑 2. VALIDACIÓN Y DETECCIÓN DE TESSERACT (la revalidación no usa OCR)
+    tesseract_path_result = None if modo_revalidar else detectar_tesseract_path(TESSERACT_EXE_PATH)
     
-    if not tesseract_path_result:
+    if not tesseract_path_result and not modo_revalidar:
         print("\n*** EJECUCIÓN DETENIDA DEBIDO AL FALLO EN LA VERIFICACIÓN DE TESSERACT. ***")
         return
 
@@ -254,15 +306,35 @@ def main():
     # Convertir a mayúsculas aquí para pasarlo consistente a todos los scripts
     ciudad_upper = ciudad_input.upper() 
     print(f"CIUDAD SELECCIONADA: {ciudad_upper}")
+
+    if modo_revalidar and modo_en_proceso:
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+        import pipeline
+        if not pipeline.ejecutar_revalidacion(ciudad_upper):
+            print("\n*** EJECUCIÓN DETENIDA DEBIDO A UN ERROR EN LA REVALIDACIÓN. ***")
+            return
+        limpiar_archivos()
+        print("\n--- REVALIDACIÓN Y FASE DE LIMPIEZA FINALIZADAS ---")
+        return
+
+    if modo_en_proceso:
+        if not ejecutar_en_proceso(ciudad_upper, tesseract_path_result, snapshots=con_snapshots, argumentos_proceso1=argumentos_proceso1):
+            print("\n*** EJECUCIÓN DETENIDA DEBIDO A UN ERROR EN EL PIPELINE EN PROCESO. ***")
+            return
+        limpiar_archivos()
+        print("\n--- TODOS LOS PROCESOS Y LA FASE DE LIMPIEZA HAN FINALIZADO EXITOSAMENTE ---")
+        return
+
     print("\n--- INICIO DE EJECUCIÓN SECUENCIAL ---")
 
     # Ejecutar cada proceso en orden
-    for script_name, requiere_ciudad, requiere_tesseract in PROCESOS:
+    for script_name, requiere_ciudad, requiere_tesseract, recibe_opciones in (PROCESOS_REVALIDACION if modo_revalidar else PROCESOS):
         ciudad_a_pasar = ciudad_upper if requiere_ciudad else None
         tesseract_a_pasar = tesseract_path_result if requiere_tesseract else None
+        opciones_a_pasar = argumentos_proceso1 if recibe_opciones else None
 
         # Llamar a la función de ejecución que maneja la lógica de argumentos
-        if not ejecutar_script(script_name, ciudad_a_pasar, tesseract_a_pasar):
+        if not ejecutar_script(script_name, ciudad_a_pasar, tesseract_a_pasar, opciones_a_pasar):
             print("\n*** EJECUCIÓN DETENIDA DEBIDO A UN ERROR EN EL PROCESO ANTERIOR. ***")
             return
 
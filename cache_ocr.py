@@ -0,0 +1,196 @@
+import os
+import sys
+import time
+import hashlib
+import sqlite3
+import threading
+
+# =========================================================================
+# 📌 CACHÉ PERSISTENTE DE TEXTO OCR (SQLite)
+# =========================================================================
+# Volver a correr el pipeline (otra ciudad, después de una caída, con otra regla
+# de validación) repetía todas las llamadas a Tesseract aunque los píxeles y el
+# preprocesamiento fueran los mismos, y el OCR es casi todo el tiempo de una
+# ejecución. Aquí cada texto reconocido se guarda con la clave
+#     hash(píxeles enviados al OCR) + forma + configuración (PSM) + idioma + salida + motor
+# El hash es de la imagen ya recortada, preprocesada y escalada, así que la
+# variante, el recorte y la escala quedan dentro de la clave sin tener que
+# nombrarlos: si cambia cualquier paso, cambian los píxeles y la clave.
+#
+# ocr_motor consulta la caché antes de cada llamada (reconocer, reconocer_datos
+# y cada imagen de reconocer_lote), así que la usan todos los procesos.
+# Con cada texto se guarda lo que costó reconocerlo. planificador_pasadas ordena las
+# pasadas por aciertos por segundo de OCR: un acierto de la caché (~0 s) haría ver
+# barata a cualquier pasada. Por eso el tiempo de OCR se mide con segundos_ocr(), que
+# suma por hilo el tiempo real de cada OCR y, en cada acierto, el costo guardado.
+# Las entradas de cachés anteriores (sin costo) se vuelven a reconocer una vez.
+# El tamaño está acotado: al pasar de MAX_ENTRADAS_CACHE se borran las entradas
+# usadas hace más tiempo (LRU). Cada hilo y cada proceso usa su propia conexión;
+# el modo WAL deja que los trabajadores (--workers) lean y escriban a la vez.
+#
+#   python cache_ocr.py            -> entradas guardadas
+#   python cache_ocr.py --vaciar   -> borra la caché
+
+ARCHIVO_CACHE = 'cache_ocr.db'
+USAR_CACHE_OCR = os.environ.get('OCR_CACHE', '1') != '0' # Se desactiva con la variable de entorno OCR_CACHE=0
+MAX_ENTRADAS_CACHE = 200000 # Los textos de los sellos son cortos: unas decenas de MB
+PODAR_CADA = 1000 # Inserciones (por proceso) entre cada revisión del tamaño
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS textos (
+    clave TEXT PRIMARY KEY,
+    texto TEXT NOT NULL,
+    uso INTEGER NOT NULL, -- último uso (ns), para el desalojo LRU
+    segundos REAL -- lo que costó el OCR original; NULL en entradas de versiones anteriores
+);
+CREATE INDEX IF NOT EXISTS idx_textos_uso ON textos (uso);
+"""
+
+_conexiones = threading.local() # Una conexión por hilo (y por proceso, ver _conexion)
+_tiempo_ocr = threading.local() # Segundos de OCR acumulados por hilo (ver segundos_ocr)
+_candado = threading.Lock()
+_estado = {'inserciones': 0, 'desactivada': False}
+
+
+def clave(buffer, config_ocr, lang, salida, motor):
+    """Clave de la caché: hash de los píxeles (arreglo uint8 contiguo) y de cómo se reconocieron."""
+    resumen = hashlib.blake2b(digest_size=20)
+    resumen.update(f"{salida}|{motor}|{lang}|{config_ocr}|{buffer.shape}|".encode('utf-8'))
+    resumen.update(buffer)
+    return resumen.hexdigest()
+
+
+def _desactivar(error):
+    if not _estado['desactivada']:
+        _estado['desactivada'] = True
+        print(f"⚠️ No se pudo usar la caché OCR '{ARCHIVO_CACHE}' ({error}). Se reconoce sin caché.")
+
+
+def _conexion():
+    """Conexión del hilo actual; se abre de nuevo en los procesos hijos (no se comparte tras un fork)."""
+    if not USAR_CACHE_OCR or _estado['desactivada']:
+        return None
+    conexion = getattr(_conexiones, 'conexion', None)
+    if conexion is not None and _conexiones.pid == os.getpid():
+        return conexion
+    try:
+        conexion = sqlite3.connect(ARCHIVO_CACHE, timeout=30, isolation_level=None)
+        conexion.execute("PRAGMA journal_mode=WAL")
+        conexion.execute("PRAGMA synchronous=NORMAL")
+        conexion.executescript(_ESQUEMA)
+        if 'segundos' not in [columna[1] for columna in conexion.execute("PRAGMA table_info(textos)")]:
+            try:
+                conexion.execute("ALTER TABLE textos ADD COLUMN segundos REAL") # Caché de una versión anterior
+            except sqlite3.OperationalError:
+                pass # Otro proceso ya la agregó
+    except sqlite3.Error as e:
+        _desactivar(e)
+        return None
+    _conexiones.conexion, _conexiones.pid = conexion, os.getpid()
+    return conexion
+
+
+def segundos_ocr():
+    """
+    Segundos de OCR acumulados en el hilo actual: el tiempo medido de cada reconocimiento
+    y, si vino de la caché, lo que costó originalmente. La diferencia entre dos lecturas
+    es el costo de OCR de lo que se hizo entre ellas (lo que registra planificador_pasadas).
+    """
+    return getattr(_tiempo_ocr, 'segundos', 0.0)
+
+
+def sumar_segundos(segundos):
+    """Suma 'segundos' al tiempo de OCR del hilo actual (ver segundos_ocr)."""
+    _tiempo_ocr.segundos = segundos_ocr() + segundos
+
+
+def buscar(claves):
+    """{clave: (texto, segundos)} de las claves que ya están en la caché con su costo (y marca su uso)."""
+    conexion = _conexion()
+    if conexion is None or not claves:
+        return {}
+    encontrados = {}
+    try:
+        claves = list(dict.fromkeys(claves))
+        for inicio in range(0, len(claves), 500): # Límite de parámetros de SQLite
+            bloque = claves[inicio:inicio + 500]
+            filas = conexion.execute(
+                f"SELECT clave, texto, segundos FROM textos WHERE segundos IS NOT NULL AND clave IN ({', '.join('?' * len(bloque))})", bloque
+            ).fetchall()
+            encontrados.update((c, (texto, segundos)) for c, texto, segundos in filas)
+        if encontrados:
+            ahora = time.time_ns()
+            conexion.executemany("UPDATE textos SET uso = ? WHERE clave = ?", ((ahora, c) for c in encontrados))
+    except sqlite3.Error as e:
+        _desactivar(e)
+    return encontrados
+
+
+def guardar(textos):
+    """Guarda {clave: (texto, segundos)}; cada PODAR_CADA inserciones recorta la caché a MAX_ENTRADAS_CACHE."""
+    conexion = _conexion()
+    if conexion is None or not textos:
+        return
+    try:
+        ahora = time.time_ns()
+        conexion.executemany("INSERT OR REPLACE INTO textos (clave, texto, uso, segundos) VALUES (?, ?, ?, ?)",
+                             ((c, texto, ahora, segundos) for c, (texto, segundos) in textos.items()))
+        with _candado:
+            _estado['inserciones'] += len(textos)
+            podar_ahora = _estado['inserciones'] >= PODAR_CADA
+            if podar_ahora:
+                _estado['inserciones'] = 0
+        if podar_ahora:
+            podar(conexion)
+    except sqlite3.Error as e:
+        _desactivar(e)
+
+
+def podar(conexion, max_entradas=None):
+    """Borra las entradas usadas hace más tiempo hasta dejar 'max_entradas' (por defecto MAX_ENTRADAS_CACHE)."""
+    max_entradas = MAX_ENTRADAS_CACHE if max_entradas is None else max_entradas
+    sobrantes = conexion.execute("SELECT COUNT(*) FROM textos").fetchone()[0] - max_entradas
+    if sobrantes > 0:
+        conexion.execute("DELETE FROM textos WHERE clave IN (SELECT clave FROM textos ORDER BY uso LIMIT ?)", (sobrantes,))
+
+
+def _reconocer_medido(reconocer):
+    """(texto, segundos) de reconocer(); el tiempo se suma a segundos_ocr aunque falle."""
+    inicio = time.perf_counter()
+    try:
+        texto = reconocer()
+    finally:
+        segundos = time.perf_counter() - inicio
+        sumar_segundos(segundos)
+    return texto, segundos
+
+
+def reconocer_con_cache(buffer, config_ocr, lang, salida, motor, reconocer):
+    """
+    Texto de la caché o, si no está, reconocer() y se guarda con su costo. Los errores de OCR
+    no se guardan. En los dos casos el costo del OCR se suma a segundos_ocr.
+    """
+    if not USAR_CACHE_OCR or _estado['desactivada']:
+        return _reconocer_medido(reconocer)[0]
+    c = clave(buffer, config_ocr, lang, salida, motor)
+    encontrado = buscar([c])
+    if c in encontrado:
+        texto, segundos = encontrado[c]
+        sumar_segundos(segundos)
+        return texto
+    texto, segundos = _reconocer_medido(reconocer)
+    guardar({c: (texto, segundos)})
+    return texto
+
+
+if __name__ == '__main__':
+    conexion = _conexion()
+    if conexion is None:
+        sys.exit(1)
+    if '--vaciar' in sys.argv[1:]:
+        conexion.execute("DELETE FROM textos")
+        conexion.execute("VACUUM")
+        print(f"🧹 Caché OCR '{ARCHIVO_CACHE}' vaciada.")
+    else:
+        total = conexion.execute("SELECT COUNT(*) FROM textos").fetchone()[0]
+        print(f"🗃️ Caché OCR '{ARCHIVO_CACHE}': {total} textos (máximo {MAX_ENTRADAS_CACHE}).")
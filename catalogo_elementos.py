@@ -0,0 +1,178 @@
+import os
+import io
+import csv
+import sys
+import hashlib
+import pandas as pd
+import indice_espacial # Rejilla del catálogo (se guarda ya construida junto con la tabla)
+
+# =========================================================================
+# 📌 CATÁLOGO DE ELEMENTOS CON CACHÉ BINARIA
+# =========================================================================
+# elementos.csv (la exportación de Salesforce) es mucho más grande que las fotos
+# de una ciudad y proceso5 lo volvía a leer completo en cada ejecución: pd.read_csv
+# (y otra vez con latin-1 si fallaba utf-8), pd.to_numeric de las coordenadas,
+# las cadenas 'coordenada_elemento' y, desde indice_espacial, la rejilla.
+# Aquí el CSV se lee una vez: la codificación se detecta sobre los bytes ya leídos,
+# los tipos se fijan (elemento y segmento como texto, coordenadas float64) y se
+# guarda en CARPETA_CACHE_CATALOGO:
+#     tabla.pkl   -> columnas que usa proceso5 (pickle de pandas, por columnas)
+#     *.npy       -> coordenadas y arreglos de indice_espacial (se abren con mmap)
+#     firma.csv   -> tamaño, mtime y hash (blake2b) del CSV, codificación y versión
+# En la siguiente ejecución, si el tamaño y el mtime no cambiaron se usa la caché
+# sin leer el CSV; si cambió el mtime pero no el hash (copia, checkout) también.
+# La firma se escribe al final, así que una caché a medio escribir no se usa.
+#
+#   python catalogo_elementos.py            -> reconstruye la caché si hace falta
+#   python catalogo_elementos.py --vaciar   -> borra la caché
+
+ARCHIVO_ELEMENTOS = 'elementos.csv'
+CARPETA_CACHE_CATALOGO = 'cache_catalogo'
+ARCHIVO_FIRMA = 'firma.csv'
+ARCHIVO_TABLA = 'tabla.pkl'
+CAMPOS_FIRMA = ['Archivo', 'Tamano', 'Mtime_ns', 'Hash', 'Codificacion', 'Version']
+USAR_CACHE_CATALOGO = os.environ.get('CATALOGO_CACHE', '1') != '0' # Se desactiva con CATALOGO_CACHE=0
+# Cambia si cambia el formato de la caché o la rejilla de indice_espacial
+VERSION_CACHE = f"1|{indice_espacial.CELDA_GRADOS}|{indice_espacial.FACTOR_NIVEL}|{indice_espacial.NIVELES}"
+COLUMNAS_CATALOGO = {
+    'elemento': 'elemento_merge',
+    'Latitud': 'latitud_elemento',
+    'Longitud': 'longitud_elemento',
+    'segmento': 'segmento_elemento',
+}
+
+
+def _hash_bytes(datos):
+    return hashlib.blake2b(datos, digest_size=20).hexdigest()
+
+
+def leer_firma(carpeta=CARPETA_CACHE_CATALOGO):
+    """Firma guardada de la caché ({campo: valor}); None si no hay caché completa."""
+    try:
+        with open(os.path.join(carpeta, ARCHIVO_FIRMA), 'r', newline='', encoding='utf-8') as archivo_csv:
+            return next(csv.DictReader(archivo_csv), None)
+    except OSError:
+        return None
+
+
+def escribir_firma(firma, carpeta=CARPETA_CACHE_CATALOGO):
+    ruta_temporal = os.path.join(carpeta, ARCHIVO_FIRMA + '.tmp')
+    with open(ruta_temporal, 'w', newline='', encoding='utf-8') as archivo_csv:
+        escritor = csv.DictWriter(archivo_csv, fieldnames=CAMPOS_FIRMA)
+        escritor.writeheader()
+        escritor.writerow(firma)
+    os.replace(ruta_temporal, os.path.join(carpeta, ARCHIVO_FIRMA))
+
+
+def decodificar(datos):
+    """(texto, codificación): utf-8 y, si no se puede, latin-1 (como leía proceso5)."""
+    try:
+        return datos.decode('utf-8'), 'utf-8'
+    except UnicodeDecodeError:
+        return datos.decode('latin-1'), 'latin-1'
+
+
+def leer_catalogo_csv(texto):
+    """
+    Tabla del catálogo con los tipos fijos: elemento y segmento como texto, coordenadas
+    float64 ('coordenada_elemento' se arma con el texto numérico, igual que antes).
+    """
+    df_elementos = pd.read_csv(io.StringIO(texto), dtype={'elemento': str, 'segmento': str})
+    df_elementos = df_elementos.rename(columns=COLUMNAS_CATALOGO)
+    df_elementos['coordenada_elemento'] = df_elementos['latitud_elemento'].astype(str) + ',' + df_elementos['longitud_elemento'].astype(str)
+    df_elementos['latitud_elemento'] = pd.to_numeric(df_elementos['latitud_elemento'], errors='coerce').astype('float64')
+    df_elementos['longitud_elemento'] = pd.to_numeric(df_elementos['longitud_elemento'], errors='coerce').astype('float64')
+    return df_elementos[['elemento_merge', 'coordenada_elemento', 'segmento_elemento', 'latitud_elemento', 'longitud_elemento']]
+
+
+def guardar_cache(df_elementos, indice, firma, carpeta=CARPETA_CACHE_CATALOGO):
+    """Guarda tabla e índice; la firma va al final (sin firma la caché no se usa)."""
+    try:
+        os.makedirs(carpeta, exist_ok=True)
+        ruta_firma = os.path.join(carpeta, ARCHIVO_FIRMA)
+        if os.path.exists(ruta_firma):
+            os.remove(ruta_firma)
+        df_elementos.to_pickle(os.path.join(carpeta, ARCHIVO_TABLA))
+        indice_espacial.guardar_indice(indice, carpeta)
+        escribir_firma(firma, carpeta)
+        print(f"💾 Caché del catálogo guardada en '{carpeta}' ({len(df_elementos)} filas).")
+    except Exception as e:
+        print(f"⚠️ No se pudo guardar la caché del catálogo en '{carpeta}'. {e}")
+
+
+def cargar_cache(carpeta=CARPETA_CACHE_CATALOGO):
+    """(df_elementos, indice) de la caché; los arreglos del índice quedan mapeados en memoria."""
+    return pd.read_pickle(os.path.join(carpeta, ARCHIVO_TABLA)), indice_espacial.cargar_indice(carpeta)
+
+
+def construir_catalogo(datos):
+    """(df_elementos, indice, codificación) a partir de los bytes del CSV."""
+    texto, codificacion = decodificar(datos)
+    df_elementos = leer_catalogo_csv(texto)
+    indice = indice_espacial.construir_indice(df_elementos['elemento_merge'], df_elementos['latitud_elemento'],
+                                              df_elementos['longitud_elemento'])
+    return df_elementos, indice, codificacion
+
+
+def cargar_catalogo(ruta_elementos=ARCHIVO_ELEMENTOS, carpeta=CARPETA_CACHE_CATALOGO):
+    """
+    Devuelve (df_elementos, indice) del catálogo: de la caché si el CSV no cambió (tamaño y
+    mtime, o el mismo hash) y, si no, leyéndolo y guardando la caché nueva.
+    Las columnas son elemento_merge, coordenada_elemento, segmento_elemento, latitud_elemento
+    y longitud_elemento; 'indice' es el de indice_espacial.
+    """
+    estado = os.stat(ruta_elementos)
+    firma = {'Archivo': os.path.basename(ruta_elementos), 'Tamano': str(estado.st_size),
+             'Mtime_ns': str(estado.st_mtime_ns), 'Version': VERSION_CACHE}
+    guardada = leer_firma(carpeta) if USAR_CACHE_CATALOGO else None
+    if guardada and guardada.get('Version') != VERSION_CACHE:
+        guardada = None
+    mismo_archivo = guardada and guardada['Archivo'] == firma['Archivo'] and guardada['Tamano'] == firma['Tamano']
+
+    datos = None
+    if mismo_archivo and guardada['Mtime_ns'] != firma['Mtime_ns']:
+        # El mtime cambió: solo se reconstruye si también cambió el contenido
+        with open(ruta_elementos, 'rb') as archivo:
+            datos = archivo.read()
+        mismo_archivo = _hash_bytes(datos) == guardada['Hash']
+        if mismo_archivo:
+            try:
+                escribir_firma(dict(guardada, Mtime_ns=firma['Mtime_ns']), carpeta)
+            except OSError:
+                pass
+    if mismo_archivo:
+        try:
+            df_elementos, indice = cargar_cache(carpeta)
+            print(f"🗃️ Catálogo '{ruta_elementos}' desde la caché '{carpeta}' ({len(df_elementos)} filas).")
+            return df_elementos, indice
+        except Exception as e:
+            print(f"⚠️ No se pudo leer la caché del catálogo '{carpeta}' ({e}). Se leerá '{ruta_elementos}'.")
+
+    if datos is None:
+        with open(ruta_elementos, 'rb') as archivo:
+            datos = archivo.read()
+    df_elementos, indice, codificacion = construir_catalogo(datos)
+    if USAR_CACHE_CATALOGO:
+        guardar_cache(df_elementos, indice, dict(firma, Hash=_hash_bytes(datos), Codificacion=codificacion), carpeta)
+    return df_elementos, indice
+
+
+def vaciar_cache(carpeta=CARPETA_CACHE_CATALOGO):
+    """Borra los archivos de la caché (empezando por la firma)."""
+    if not os.path.isdir(carpeta):
+        return
+    nombres = sorted(os.listdir(carpeta), key=lambda nombre: nombre != ARCHIVO_FIRMA)
+    for nombre in nombres:
+        os.remove(os.path.join(carpeta, nombre))
+    os.rmdir(carpeta)
+
+
+if __name__ == '__main__':
+    if '--vaciar' in sys.argv[1:]:
+        vaciar_cache()
+        print(f"🧹 Caché del catálogo '{CARPETA_CACHE_CATALOGO}' vaciada.")
+    elif not os.path.exists(ARCHIVO_ELEMENTOS):
+        print(f"❌ ERROR: El archivo '{ARCHIVO_ELEMENTOS}' no existe.")
+        sys.exit(1)
+    else:
+        cargar_catalogo()
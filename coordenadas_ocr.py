@@ -0,0 +1,163 @@
+import re
+
+# =========================================================================
+# 📌 LECTOR ÚNICO DE COORDENADAS EN TEXTO OCR (una pasada, candidatos ordenados)
+# =========================================================================
+# Cada etapa tenía su propia regex (la flexible de proceso1, Patron_Exacto y los
+# números flexibles de proceso2, los patrones decimal y DMS de proceso3/proceso4)
+# y se quedaba con la primera coincidencia: si el texto traía la respuesta buena en
+# un formato un poco distinto (coma decimal, 'O' por '0', grados-minutos-segundos,
+# una fecha antes del sello) se lanzaba otra pasada de OCR.
+# Aquí el texto se recorre UNA vez con un patrón precompilado que reconoce cada
+# coordenada suelta (decimal con signo o cardinal, y DMS ya convertido a decimal);
+# cada par de coordenadas consecutivas es un candidato (latitud, longitud) y los
+# candidatos se ordenan por qué tan creíbles son:
+#     dentro del rango de la ciudad > dentro de México > válido en el mundo
+# y, a igual nivel, los pares pegados (solo separadores entre ellos), los que traen
+# signo o cardinal en las dos y los que aparecen antes en el texto.
+#
+# Las coordenadas se devuelven como texto ('25.68123N', '-100.31', '100.31W'):
+# siguen pasando por la corrección y la validación de cada etapa igual que antes.
+
+# Rango global de México (mismos valores que LAT_MIN_ESPERADA... de los procesos)
+RANGO_MEXICO = (14.0, 33.0, -119.0, -86.0)
+RANGO_MUNDIAL = (-90.0, 90.0, -180.0, 180.0)
+LON_MIN_MEX_MAG = 86.0
+LON_MAX_MEX_MAG = 119.0
+
+# Confusiones de OCR junto a dígitos: 'O'/'o' por 0, 'I'/'l' por 1. Cada reemplazo es
+# de un carácter, así que las posiciones del texto normalizado son las del original.
+# Varias confusiones seguidas ('1OO.31') se corrigen de izquierda a derecha: el patrón se
+# aplica hasta que el texto ya no cambia (cada vuelta corrige la letra que sigue a un dígito).
+# Una 'O' al final del número sin dígito después se deja: puede ser el cardinal (Oeste).
+PATRON_CONFUSIONES = re.compile(r"(?<=\d)[OoIl](?=[OoIl]*(?:\d|[.,]\d))|(?<=[\d.,])[OoIl](?=[OoIl]*\d)|(?<![\w.,])[Il](?=[OoIl]*(?:\d|[.,]\d))")
+REEMPLAZOS_CONFUSIONES = {'O': '0', 'o': '0', 'I': '1', 'l': '1'}
+
+# Una coordenada: DMS (25°41'12.5"N) o decimal (25.68123N, -100,31, 100.31 W).
+# El cardinal puede venir separado por un espacio, pero no ser el inicio de una palabra.
+PATRON_COORDENADA = re.compile(r"""
+    (?:(?P<signo>[-−–])\s?)?(?<![\d.])
+    (?:
+        (?P<grados>\d{1,3})\s?[°º˚]\s?(?P<minutos>\d{1,2})\s?['’′]\s?(?P<segundos>\d{1,2}(?:[.,]\d+)?)\s?(?:''|["”″])?
+      | (?P<entero>\d{1,3})[.,](?P<fraccion>\d+)
+    )
+    (?:\s?(?P<cardinal>[NSEWO])(?![a-z]))?
+""", re.IGNORECASE | re.VERBOSE)
+
+# Lo que puede haber entre la latitud y la longitud de un par "pegado"
+PATRON_SEPARADOR = re.compile(r'[\s,;/|\-]*')
+
+# Textos OCR reales y el par que debe quedar primero (rango de Monterrey);
+# 'python coordenadas_ocr.py' los comprueba después de cambiar los patrones.
+RANGO_CASOS = (25.5, 25.9, -100.5, -100.1)
+CASOS_CONOCIDOS = [
+    ("2O23-01-05 12.30 25.6812N 1OO.3123W", ('25.6812N', '100.3123W')), # Confusiones seguidas después de una fecha
+    ("25.68123N,100.31O, x", ('25.68123N', '100.31W')), # 'O' final = Oeste
+    ("IOO.3123 25.6812 lat 25.6812N lon IOO.3123W", ('25.6812N', '100.3123W')), # Pegado y con cardinales gana
+    ("25,6812 -100,3123", ('25.6812', '-100.3123')), # Coma decimal
+]
+
+
+def normalizar_texto(texto):
+    """Texto en una línea con las confusiones O/0 e I,l/1 corregidas junto a dígitos (mismo largo)."""
+    texto = texto.replace('\n', ' ').replace('\r', ' ').replace('\t', ' ')
+    while True:
+        normalizado = PATRON_CONFUSIONES.sub(lambda m: REEMPLAZOS_CONFUSIONES[m.group(0)], texto)
+        if normalizado == texto:
+            return texto
+        texto = normalizado
+
+
+def _coordenada(match):
+    """
+    (texto, valor, explicita) de una coincidencia de PATRON_COORDENADA. 'valor' ya tiene el
+    signo del cardinal o del '-'; 'explicita' dice si traía alguno de los dos. Si hay cardinal,
+    un '-' delante se toma como separador (25.6N-100.3W).
+    """
+    cardinal = (match.group('cardinal') or '').upper().replace('O', 'W')
+    if match.group('grados') is not None:
+        valor = (int(match.group('grados')) + int(match.group('minutos')) / 60
+                 + float(match.group('segundos').replace(',', '.')) / 3600)
+        numero = f"{valor:.6f}"
+    else:
+        numero = f"{match.group('entero')}.{match.group('fraccion')}"
+        valor = float(numero)
+    negativo = cardinal in ('S', 'W') if cardinal else match.group('signo') is not None
+    texto = ('-' if negativo and not cardinal else '') + numero + cardinal
+    return texto, -valor if negativo else valor, bool(cardinal or match.group('signo'))
+
+
+def _en_caja(lat_dec, lon_dec, rango):
+    lat_min, lat_max, lon_min, lon_max = rango
+    return lat_min <= lat_dec <= lat_max and lon_min <= lon_dec <= lon_max
+
+
+def _nivel(lat_dec, lon_dec, lon_explicita, rango):
+    """3 dentro del rango de la ciudad, 2 dentro de México, 1 válido en el mundo, 0 si no."""
+    if not lon_explicita and LON_MIN_MEX_MAG <= lon_dec <= LON_MAX_MEX_MAG:
+        lon_dec = -lon_dec # Sin signo ni cardinal: los procesos la toman como W
+    if rango is not None and _en_caja(lat_dec, lon_dec, rango):
+        return 3
+    if _en_caja(lat_dec, lon_dec, RANGO_MEXICO):
+        return 2
+    return 1 if _en_caja(lat_dec, lon_dec, RANGO_MUNDIAL) else 0
+
+
+def candidatos(texto, rango=None):
+    """
+    Todos los pares (latitud, longitud) del texto OCR, del más al menos creíble.
+    'rango' es (lat_min, lat_max, lon_min, lon_max) de la ciudad (None: solo México).
+    Cada candidato es (lat, lon, formato, puntaje, tramos): 'formato' es 'cardinal' (las dos
+    con N/S/E/W), 'signo', 'numerico' (alguna sin signo ni cardinal) o 'dms'; 'tramos' son las
+    posiciones (inicio, fin) de cada coordenada en el texto.
+    """
+    if not texto:
+        return []
+    texto = normalizar_texto(texto)
+    coordenadas = [(match, _coordenada(match)) for match in PATRON_COORDENADA.finditer(texto)]
+    resultado = []
+    for (match_lat, (lat, lat_dec, lat_explicita)), (match_lon, (lon, lon_dec, lon_explicita)) in zip(coordenadas, coordenadas[1:]):
+        pegado = PATRON_SEPARADOR.fullmatch(texto, match_lat.end(), match_lon.start()) is not None
+        if match_lat.group('grados') is not None or match_lon.group('grados') is not None:
+            formato = 'dms'
+        elif match_lat.group('cardinal') and match_lon.group('cardinal'):
+            formato = 'cardinal'
+        else:
+            formato = 'signo' if lat_explicita and lon_explicita else 'numerico'
+        puntaje = 4 * _nivel(lat_dec, lon_dec, lon_explicita, rango) + 2 * pegado + (lat_explicita and lon_explicita)
+        resultado.append((lat, lon, formato, puntaje, (match_lat.span(), match_lon.span())))
+    resultado.sort(key=lambda candidato: (-candidato[3], candidato[4][0][0]))
+    return resultado
+
+
+def tramos_coordenadas(texto):
+    """Posiciones (inicio, fin) de cada coordenada suelta del texto, formen par o no."""
+    return [match.span() for match in PATRON_COORDENADA.finditer(normalizar_texto(texto or ''))]
+
+
+def mejor_candidato(texto, rango=None):
+    """El candidato más creíble del texto (ver candidatos) o None."""
+    encontrados = candidatos(texto, rango)
+    return encontrados[0] if encontrados else None
+
+
+def completar_cardinales(lat, lon):
+    """Agrega N a la latitud y W a la longitud que no traen signo ni cardinal (contexto de México)."""
+    if not lat[-1].isalpha() and not lat.startswith('-'):
+        lat += 'N'
+    if not lon[-1].isalpha() and not lon.startswith('-'):
+        lon += 'W'
+    return lat, lon
+
+
+if __name__ == '__main__':
+    fallas = 0
+    for texto, esperado in CASOS_CONOCIDOS:
+        candidato = mejor_candidato(texto, RANGO_CASOS)
+        obtenido = candidato[:2] if candidato else None
+        if obtenido != esperado:
+            fallas += 1
+            print(f"❌ {texto!r}: se esperaba {esperado}, se obtuvo {obtenido}")
+    print(f"{'✅' if not fallas else '❌'} Casos conocidos: {len(CASOS_CONOCIDOS) - fallas} de {len(CASOS_CONOCIDOS)} correctos.")
+    if fallas:
+        raise SystemExit(1)
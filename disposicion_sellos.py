@@ -0,0 +1,90 @@
+import os
+import csv
+from PIL import Image
+
+# =========================================================================
+# 📌 DISPOSICIÓN APRENDIDA DEL SELLO POR GEOMETRÍA DE FOTO
+# =========================================================================
+# Las fotos vienen de unas pocas apps de cámara y cada una pone el sello en el
+# mismo lugar para una misma resolución y orientación. Cada vez que proceso1
+# extrae coordenadas válidas del sello localizado (ver localizador_sello), guarda
+# dónde estaba, relativo a la franja inferior, con la clave (ancho, alto,
+# orientación EXIF) de la foto. Las fotos siguientes con la misma geometría
+# prueban primero ese rectángulo: una sola llamada de OCR sobre un recorte chico.
+#
+# El archivo se lee al empezar proceso1 y se reescribe al terminar (reemplazo
+# atómico, como el manifiesto). Las coordenadas son fracciones de la franja, así
+# que no dependen de la escala a la que se decodificó.
+
+ARCHIVO_DISPOSICION = 'disposicion_sellos.csv'
+CAMPOS_DISPOSICION = ['Ancho', 'Alto', 'Orientacion', 'X0', 'Y0', 'X1', 'Y1', 'Config', 'Aciertos']
+TAG_ORIENTACION = 0x0112 # Orientation (EXIF); cv2.imread ya aplica la rotación al decodificar
+MARGEN_APRENDIDO = 0.02 # Holgura (fracción de la franja) para textos de largo un poco distinto
+
+
+def geometria_imagen(ruta_imagen):
+    """(ancho, alto, orientación EXIF) leídos del encabezado, sin decodificar; None si no se pudo."""
+    try:
+        with Image.open(ruta_imagen) as img:
+            return img.size[0], img.size[1], int(img.getexif().get(TAG_ORIENTACION, 1) or 1)
+    except Exception:
+        return None
+
+
+def cargar_disposiciones(ruta_disposicion=ARCHIVO_DISPOSICION):
+    """Devuelve {(ancho, alto, orientacion): (x0, y0, x1, y1, config, aciertos)}; vacío si no hay archivo."""
+    if not os.path.exists(ruta_disposicion):
+        return {}
+    try:
+        with open(ruta_disposicion, 'r', newline='', encoding='utf-8') as archivo_csv:
+            return {
+                (int(e['Ancho']), int(e['Alto']), int(e['Orientacion'])):
+                    (float(e['X0']), float(e['Y0']), float(e['X1']), float(e['Y1']), e['Config'], int(e['Aciertos']))
+                for e in csv.DictReader(archivo_csv)
+            }
+    except Exception as e:
+        print(f"⚠️ No se pudo leer la disposición de sellos '{ruta_disposicion}' ({e}). Se aprenderá de nuevo.")
+        return {}
+
+
+def guardar_disposiciones(disposiciones, ruta_disposicion=ARCHIVO_DISPOSICION):
+    """Reescribe el archivo de disposiciones (reemplazo atómico)."""
+    try:
+        ruta_temporal = ruta_disposicion + '.tmp'
+        with open(ruta_temporal, 'w', newline='', encoding='utf-8') as archivo_csv:
+            escritor = csv.writer(archivo_csv)
+            escritor.writerow(CAMPOS_DISPOSICION)
+            for (ancho, alto, orientacion), (x0, y0, x1, y1, config, aciertos) in sorted(disposiciones.items()):
+                escritor.writerow([ancho, alto, orientacion, f"{x0:.4f}", f"{y0:.4f}", f"{x1:.4f}", f"{y1:.4f}", config, aciertos])
+        os.replace(ruta_temporal, ruta_disposicion)
+        print(f"📐 Disposición de sellos actualizada: {len(disposiciones)} geometrías en '{ruta_disposicion}'.")
+    except Exception as e:
+        print(f"⚠️ No se pudo escribir la disposición de sellos '{ruta_disposicion}'. {e}")
+
+
+def caja_relativa(caja, forma_franja):
+    """Caja (x0, y0, x1, y1) en píxeles de la franja -> fracciones de la franja."""
+    alto, ancho = forma_franja[:2]
+    x0, y0, x1, y1 = caja
+    return x0 / ancho, y0 / alto, x1 / ancho, y1 / alto
+
+
+def recortar_aprendido(franja, disposicion):
+    """Recorte de la franja en la caja aprendida (con holgura); None si queda vacío."""
+    alto, ancho = franja.shape[:2]
+    x0, y0, x1, y1 = disposicion[:4]
+    x0 = max(0, int((x0 - MARGEN_APRENDIDO) * ancho))
+    y0 = max(0, int((y0 - MARGEN_APRENDIDO) * alto))
+    x1 = min(ancho, int(round((x1 + MARGEN_APRENDIDO) * ancho)))
+    y1 = min(alto, int(round((y1 + MARGEN_APRENDIDO) * alto)))
+    recorte = franja[y0:y1, x0:x1]
+    return recorte if recorte.size else None
+
+
+def aprender(disposiciones, clave, caja_rel, config):
+    """Registra (o reemplaza) la caja de la geometría 'clave'; si es la misma caja suma un acierto."""
+    anterior = disposiciones.get(clave)
+    aciertos = 1
+    if anterior is not None and anterior[4] == config and all(abs(a - b) < MARGEN_APRENDIDO for a, b in zip(anterior[:4], caja_rel)):
+        aciertos = anterior[5] + 1
+    disposiciones[clave] = tuple(caja_rel) + (config, aciertos)
@@ -0,0 +1,96 @@
+import queue
+import threading
+
+# =========================================================================
+# 📌 FLUJO POR ETAPAS CON COLAS ACOTADAS (lectura -> preprocesamiento -> OCR)
+# =========================================================================
+# En el modo secuencial cada foto se lee, se preprocesa y se reconoce antes de
+# empezar con la siguiente: mientras Tesseract trabaja el disco está quieto, y
+# mientras se decodifica una foto no corre ningún OCR.
+# Aquí cada etapa tiene sus propios hilos y se comunica con la siguiente por una
+# cola de tamaño fijo. Si el OCR va más lento, las colas se llenan y la lectura
+# se detiene sola (contrapresión): nunca hay más de
+#     etapas x tamano_cola + hilos en curso
+# imágenes decodificadas en memoria. La decodificación y OpenCV liberan el GIL y
+# el OCR corre fuera del intérprete, así que los hilos sí se solapan.
+# Los resultados se entregan en cuanto terminan, con el índice de su entrada.
+# Si una etapa falla (o quien consume deja de iterar) se activa 'detener': la entrada
+# deja de alimentar, los trabajadores descartan lo pendiente y el flujo se vacía hasta
+# que todos los hilos terminan; recién entonces se relanza el error.
+
+_FIN = object() # Marca de fin de la cola (una por hilo de la etapa siguiente)
+
+
+def _trabajador(funcion, entrada, salida, estado, hilos_siguiente, detener):
+    while True:
+        elemento = entrada.get()
+        if elemento is _FIN:
+            break
+        if detener.is_set():
+            continue # Flujo detenido: se vacía la cola sin procesar
+        indice, valor, error = elemento
+        if error is None:
+            try:
+                valor = funcion(valor)
+            except Exception as e:
+                valor, error = None, e
+        salida.put((indice, valor, error))
+    # El último hilo de la etapa en terminar avisa a todos los de la siguiente
+    with estado['candado']:
+        estado['activos'] -= 1
+        ultimo = estado['activos'] == 0
+    if ultimo:
+        for _ in range(hilos_siguiente):
+            salida.put(_FIN)
+
+
+def ejecutar_flujo(entradas, etapas, tamano_cola=8):
+    """
+    Pasa cada elemento de 'entradas' por las 'etapas' [(nombre, funcion, hilos)] y
+    entrega (indice, resultado) a medida que cada uno sale de la última etapa (no
+    necesariamente en orden). Si una etapa (o la lectura de 'entradas') lanza una
+    excepción, se detiene el flujo, se espera a que terminen sus hilos y se relanza aquí.
+    """
+    colas = [queue.Queue(maxsize=tamano_cola) for _ in etapas] + [queue.Queue()]
+    hilos_por_etapa = [max(1, hilos) for _, _, hilos in etapas]
+    detener = threading.Event()
+
+    def alimentar():
+        try:
+            for indice, valor in enumerate(entradas):
+                if detener.is_set():
+                    break
+                colas[0].put((indice, valor, None))
+        except Exception as e:
+            colas[0].put((None, None, e))
+        finally:
+            for _ in range(hilos_por_etapa[0]):
+                colas[0].put(_FIN)
+
+    hilos = [threading.Thread(target=alimentar, name='flujo_entrada', daemon=True)]
+    for k, (nombre, funcion, _) in enumerate(etapas):
+        estado = {'candado': threading.Lock(), 'activos': hilos_por_etapa[k]}
+        hilos_siguiente = hilos_por_etapa[k + 1] if k + 1 < len(etapas) else 1
+        for n in range(hilos_por_etapa[k]):
+            hilos.append(threading.Thread(target=_trabajador, name=f"flujo_{nombre}_{n}", daemon=True,
+                                          args=(funcion, colas[k], colas[k + 1], estado, hilos_siguiente, detener)))
+    for hilo in hilos:
+        hilo.start()
+
+    terminado = False
+    try:
+        while True:
+            elemento = colas[-1].get()
+            if elemento is _FIN:
+                terminado = True
+                return
+            indice, valor, error = elemento
+            if error is not None:
+                raise error
+            yield indice, valor
+    finally:
+        if not terminado:
+            # Error o consumidor que dejó de iterar: nadie queda bloqueado en una cola llena
+            detener.set()
+            while colas[-1].get() is not _FIN:
+                pass
@@ -0,0 +1,114 @@
+import cv2
+import numpy as np
+
+# =========================================================================
+# 📌 GRAFO DE PREPROCESAMIENTO POR IMAGEN (nodos calculados una sola vez)
+# =========================================================================
+# Las pasadas y estrategias de OCR repetían los mismos pasos intermedios sobre la
+# misma franja: cada una volvía a convertir a gris, a desenfocar o a aplicar CLAHE,
+# proceso2 reconstruía la imagen CLAHE + umbral adaptativo para cada PSM y
+# proceso3/proceso4 convertían a RGB y a gris por separado.
+# Aquí cada imagen tiene un "grafo": un diccionario {nodo: arreglo} que empieza
+# solo con la imagen BGR (o gris) y calcula cada nodo la primera vez que se pide,
+# a partir de su nodo de entrada (ver NODOS). Todas las pasadas y configuraciones
+# de OCR de esa imagen comparten los nodos ya calculados.
+# Las imágenes derivadas (una franja más baja, una escala reducida) son grafos
+# hijos guardados en el padre; la franja hija reutiliza el gris del padre, porque
+# la conversión a gris es píxel a píxel y recortar antes o después da lo mismo.
+
+
+def _gris(img_bgr):
+    return img_bgr if img_bgr.ndim == 2 else cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
+
+
+def _rgb(img_bgr):
+    return cv2.cvtColor(img_bgr, cv2.COLOR_GRAY2RGB if img_bgr.ndim == 2 else cv2.COLOR_BGR2RGB)
+
+
+def _desenfoque(gris):
+    return cv2.GaussianBlur(gris, (5, 5), 0)
+
+
+def _otsu_inv(gris):
+    _, binaria = cv2.threshold(gris, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    return binaria
+
+
+def _otsu(gris):
+    _, binaria = cv2.threshold(gris, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    return binaria
+
+
+def _umbral_simple_inv(gris):
+    _, binaria = cv2.threshold(gris, 127, 255, cv2.THRESH_BINARY_INV)
+    return binaria
+
+
+def _clahe(limite):
+    return lambda gris: cv2.createCLAHE(clipLimit=limite, tileGridSize=(8, 8)).apply(gris)
+
+
+def _adaptativo(gris):
+    return cv2.adaptiveThreshold(gris, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 15, 5)
+
+
+def _realce(gris):
+    kernel = np.array([[-1, -1, -1], [-1, 9, -1], [-1, -1, -1]])
+    return cv2.filter2D(gris, -1, kernel)
+
+
+# nodo -> (nodo de entrada, función). 'bgr' es la imagen con la que se crea el grafo.
+NODOS = {
+    'gris': ('bgr', _gris),
+    'rgb': ('bgr', _rgb),
+    'desenfoque': ('gris', _desenfoque),
+    'otsu_inv': ('gris', _otsu_inv), # proceso3/proceso4: preprocesar_otsu
+    'otsu_inv_desenfoque': ('desenfoque', _otsu_inv), # proceso1: pasada Otsu
+    'clahe_3': ('gris', _clahe(3.0)),
+    'clahe_3_desenfoque': ('clahe_3', _desenfoque),
+    'otsu_inv_clahe_3': ('clahe_3_desenfoque', _otsu_inv), # proceso1: pasada CLAHE
+    'umbral_simple_inv': ('gris', _umbral_simple_inv), # proceso1: pasada Simple
+    'clahe_2': ('gris', _clahe(2.0)),
+    'adaptativo_clahe_2': ('clahe_2', _adaptativo), # proceso2: inferior_optimizado
+    'realce': ('gris', _realce),
+    'otsu_realce': ('realce', _otsu), # proceso2: alto_contraste
+}
+
+
+def nuevo_grafo(imagen):
+    """Grafo de una imagen BGR (o ya en gris): solo guarda la imagen; los nodos se calculan al pedirlos."""
+    grafo = {'bgr': imagen}
+    if imagen is not None and imagen.ndim == 2:
+        grafo['gris'] = imagen
+    return grafo
+
+
+def nodo(grafo, nombre):
+    """Arreglo del nodo 'nombre', calculado (y guardado en el grafo) solo la primera vez."""
+    if nombre not in grafo:
+        entrada, funcion = NODOS[nombre]
+        grafo[nombre] = funcion(nodo(grafo, entrada))
+    return grafo[nombre]
+
+
+def derivar(grafo, clave, funcion):
+    """
+    Grafo hijo de la imagen funcion(bgr) (p. ej. una escala reducida), creado una sola
+    vez por 'clave'. None si la función no devuelve imagen.
+    """
+    derivados = grafo.setdefault('_derivados', {})
+    if clave not in derivados:
+        imagen = funcion(grafo['bgr'])
+        derivados[clave] = nuevo_grafo(imagen) if imagen is not None and imagen.size else None
+    return derivados[clave]
+
+
+def franja_inferior(grafo, filas):
+    """Grafo hijo de las últimas 'filas' filas de la imagen; comparte el gris del padre (vista, sin copiar)."""
+    if filas >= grafo['bgr'].shape[0]:
+        return grafo
+    hijo = derivar(grafo, ('franja', filas), lambda img: img[img.shape[0] - filas:, :])
+    if hijo is not None and 'gris' not in hijo:
+        gris = nodo(grafo, 'gris')
+        hijo['gris'] = gris[gris.shape[0] - filas:, :]
+    return hijo
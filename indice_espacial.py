@@ -0,0 +1,183 @@
+import os
+import numpy as np
+import pandas as pd
+
+# =========================================================================
+# 📌 ÍNDICE ESPACIAL DEL CATÁLOGO DE ELEMENTOS (vecino más cercano por nombre)
+# =========================================================================
+# proceso5 unía cada foto con TODAS las filas de elementos.csv del mismo nombre,
+# calculaba Haversine sobre ese producto y se quedaba con el mínimo: con muchos
+# elementos por nombre (o por segmento) la tabla intermedia crecía sin tope.
+# Aquí el catálogo se indexa una vez en una rejilla sobre radianes, con la clave
+#     (código del elemento, fila de la celda, columna de la celda)
+# ordenada para buscar con searchsorted. Cada foto revisa solo las 3 x 3 celdas
+# alrededor de la suya y solo las filas de su elemento; Haversine se calcula
+# sobre esos candidatos. El resultado es exacto: se acepta el más cercano solo si
+# está más cerca que la distancia mínima a cualquier punto fuera de esas 9 celdas
+# (cota equirrectangular); si no, la foto pasa al siguiente nivel de la rejilla
+# (celdas FACTOR_NIVEL veces más grandes) y, después del último, se compara con
+# todas las filas de su elemento. Las fotos se procesan en tandas de a lo más
+# MAX_PARES_TANDA pares foto-candidato, así que la memoria queda acotada.
+# Los empates se resuelven como antes: gana la fila del catálogo que aparece primero.
+# (Las celdas no dan la vuelta en el antimeridiano: el catálogo es de México.)
+
+RADIO_TIERRA = 6371000 # Metros (el mismo de proceso5.haversine)
+CELDA_GRADOS = 0.01 # Lado de la celda del primer nivel (~1.1 km de latitud)
+FACTOR_NIVEL = 4 # Cada nivel tiene celdas 4 veces más grandes
+NIVELES = 5 # 0.01°, 0.04°, 0.16°, 0.64°, 2.56°; después, todas las filas del elemento
+MAX_PARES_TANDA = 2000000 # Pares foto-candidato por tanda (~100 MB de arreglos temporales)
+_BASE_CELDA = 1 << 20 # Celdas por eje en la clave; alcanza para celdas de hasta ~6e-6 rad
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Haversine en metros (la misma fórmula de proceso5)."""
+    lat1_rad = np.radians(lat1); lon1_rad = np.radians(lon1)
+    lat2_rad = np.radians(lat2); lon2_rad = np.radians(lon2)
+    dlat = lat2_rad - lat1_rad; dlon = lon2_rad - lon1_rad
+    a = np.sin(dlat / 2.0)**2 + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(dlon / 2.0)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return RADIO_TIERRA * c
+
+
+def _celdas(lat_rad, lon_rad, lado):
+    return np.floor(lat_rad / lado).astype(np.int64), np.floor(lon_rad / lado).astype(np.int64)
+
+
+def _llave(codigos, fila_celda, columna_celda):
+    """Clave entera (código, fila, columna) que ordena por elemento y luego por celda."""
+    return (codigos * _BASE_CELDA + (fila_celda + _BASE_CELDA // 2)) * _BASE_CELDA + (columna_celda + _BASE_CELDA // 2)
+
+
+def construir_indice(nombres, latitudes, longitudes):
+    """
+    Índice del catálogo: 'nombres' es el elemento de cada fila y 'latitudes'/'longitudes'
+    sus grados. Las filas sin nombre o sin coordenadas no se indexan. Las posiciones que
+    devuelve vecinos_mas_cercanos son las de estas listas (0 .. n-1).
+    """
+    nombres = pd.Series(nombres).reset_index(drop=True)
+    latitudes = np.asarray(latitudes, dtype=float)
+    longitudes = np.asarray(longitudes, dtype=float)
+    validas = np.flatnonzero(nombres.notna().to_numpy() & ~np.isnan(latitudes) & ~np.isnan(longitudes))
+    codigos, catalogo_nombres = pd.factorize(nombres.iloc[validas], sort=False)
+    codigos = codigos.astype(np.int64)
+    lat, lon = latitudes[validas], longitudes[validas]
+    lat_rad, lon_rad = np.radians(lat), np.radians(lon)
+
+    niveles = []
+    lado = np.radians(CELDA_GRADOS)
+    for _ in range(NIVELES):
+        llaves = _llave(codigos, *_celdas(lat_rad, lon_rad, lado))
+        orden = np.argsort(llaves, kind='stable') # Estable: a igual celda, el orden del catálogo
+        niveles.append((lado, llaves[orden], orden))
+        lado *= FACTOR_NIVEL
+    orden_elemento = np.argsort(codigos, kind='stable')
+    return {
+        'nombres': catalogo_nombres, 'posiciones': validas, 'lat': lat, 'lon': lon,
+        'niveles': niveles, 'por_elemento': (codigos[orden_elemento], orden_elemento),
+    }
+
+
+def guardar_indice(indice, carpeta):
+    """Guarda los arreglos del índice en 'carpeta' (un .npy por arreglo, para abrirlos con mmap)."""
+    arreglos = {'posiciones': indice['posiciones'], 'lat': indice['lat'], 'lon': indice['lon'],
+                'codigos_elemento': indice['por_elemento'][0], 'orden_elemento': indice['por_elemento'][1],
+                'lados': np.array([lado for lado, _, _ in indice['niveles']])}
+    for n, (_, llaves, orden) in enumerate(indice['niveles']):
+        arreglos[f'llaves_{n}'], arreglos[f'orden_{n}'] = llaves, orden
+    for nombre, arreglo in arreglos.items():
+        np.save(os.path.join(carpeta, f'{nombre}.npy'), np.ascontiguousarray(arreglo))
+    np.save(os.path.join(carpeta, 'nombres.npy'), np.asarray(indice['nombres'], dtype=object), allow_pickle=True)
+
+
+def cargar_indice(carpeta):
+    """Índice guardado con guardar_indice; los arreglos numéricos quedan mapeados en memoria (solo lectura)."""
+    def cargar(nombre):
+        return np.load(os.path.join(carpeta, f'{nombre}.npy'), mmap_mode='r')
+    lados = cargar('lados')
+    return {
+        'nombres': pd.Index(np.load(os.path.join(carpeta, 'nombres.npy'), allow_pickle=True)),
+        'posiciones': cargar('posiciones'), 'lat': cargar('lat'), 'lon': cargar('lon'),
+        'niveles': [(float(lado), cargar(f'llaves_{n}'), cargar(f'orden_{n}')) for n, lado in enumerate(lados)],
+        'por_elemento': (cargar('codigos_elemento'), cargar('orden_elemento')),
+    }
+
+
+def _cota_fuera_de_bloque(lat_rad, lado):
+    """Distancia mínima (m) de la foto a cualquier punto fuera de las 3 x 3 celdas alrededor de la suya."""
+    # Fuera del bloque: o la latitud difiere en al menos 'lado', o la longitud difiere en al menos
+    # 'lado' con las dos latitudes a menos de 2 'lado' de la foto (cos acotado por abajo).
+    coseno = np.cos(np.minimum(np.abs(lat_rad) + 2 * lado, np.pi / 2))
+    por_longitud = 2 * RADIO_TIERRA * np.arcsin(np.minimum(1.0, coseno * np.sin(lado / 2)))
+    return np.minimum(RADIO_TIERRA * lado, por_longitud)
+
+
+def _mas_cercano_en_rangos(indice, orden, inicios, fines, lat, lon):
+    """
+    Para cada foto (fila de 'inicios'/'fines', rangos sobre 'orden'), el candidato más cercano:
+    devuelve (posición en el índice o -1, distancia o inf). Procesa en tandas de MAX_PARES_TANDA.
+    """
+    n = len(lat)
+    mejor = np.full(n, -1, dtype=np.int64)
+    distancia = np.full(n, np.inf)
+    conteos = fines - inicios
+    pares_por_foto = conteos.sum(axis=1)
+    acumulado = np.cumsum(pares_por_foto)
+    desde = 0
+    while desde < n:
+        base = acumulado[desde - 1] if desde else 0
+        hasta = max(desde + 1, int(np.searchsorted(acumulado, base + MAX_PARES_TANDA, side='right')))
+        cuentas = conteos[desde:hasta].ravel()
+        total = int(cuentas.sum())
+        if total:
+            fotos = np.repeat(np.repeat(np.arange(desde, hasta), conteos.shape[1]), cuentas)
+            desplazamiento = np.arange(total) - np.repeat(np.cumsum(cuentas) - cuentas, cuentas)
+            candidatos = orden[np.repeat(inicios[desde:hasta].ravel(), cuentas) + desplazamiento]
+            d = haversine(lat[fotos], lon[fotos], indice['lat'][candidatos], indice['lon'][candidatos])
+            # Por foto, la menor distancia; a igual distancia, la fila del catálogo que va primero
+            elegidos = np.lexsort((candidatos, d, fotos))
+            fotos_ordenadas = fotos[elegidos]
+            primeros = elegidos[np.r_[True, fotos_ordenadas[1:] != fotos_ordenadas[:-1]]]
+            mejor[fotos[primeros]] = candidatos[primeros]
+            distancia[fotos[primeros]] = d[primeros]
+        desde = hasta
+    return mejor, distancia
+
+
+def vecinos_mas_cercanos(indice, nombres, latitudes, longitudes):
+    """
+    Para cada foto (nombre del elemento y grados), la fila del catálogo más cercana con el
+    mismo nombre. Devuelve (posiciones, distancias): la posición en el catálogo que se indexó
+    (-1 si el elemento no está o la foto no tiene coordenadas) y la distancia en metros (NaN).
+    """
+    lat = np.asarray(latitudes, dtype=float)
+    lon = np.asarray(longitudes, dtype=float)
+    codigos = indice['nombres'].get_indexer(pd.Series(nombres)).astype(np.int64)
+    pendientes = np.flatnonzero((codigos >= 0) & ~np.isnan(lat) & ~np.isnan(lon))
+    mejor = np.full(len(lat), -1, dtype=np.int64)
+    distancia = np.full(len(lat), np.nan)
+    lat_rad, lon_rad = np.radians(lat), np.radians(lon)
+
+    for lado, llaves, orden in indice['niveles']:
+        if not len(pendientes):
+            break
+        fila_celda, columna_celda = _celdas(lat_rad[pendientes], lon_rad[pendientes], lado)
+        vecinas = [_llave(codigos[pendientes], fila_celda + df, columna_celda + dc) for df in (-1, 0, 1) for dc in (-1, 0, 1)]
+        vecinas = np.stack(vecinas, axis=1)
+        inicios = np.searchsorted(llaves, vecinas, side='left')
+        fines = np.searchsorted(llaves, vecinas, side='right')
+        encontrado, d = _mas_cercano_en_rangos(indice, orden, inicios, fines, lat[pendientes], lon[pendientes])
+        seguro = (encontrado >= 0) & (d < _cota_fuera_de_bloque(lat_rad[pendientes], lado))
+        mejor[pendientes[seguro]] = encontrado[seguro]
+        distancia[pendientes[seguro]] = d[seguro]
+        pendientes = pendientes[~seguro]
+
+    if len(pendientes): # Lejos de todo: se compara con todas las filas de su elemento
+        codigos_ordenados, orden = indice['por_elemento']
+        inicios = np.searchsorted(codigos_ordenados, codigos[pendientes], side='left')[:, None]
+        fines = np.searchsorted(codigos_ordenados, codigos[pendientes], side='right')[:, None]
+        encontrado, d = _mas_cercano_en_rangos(indice, orden, inicios, fines, lat[pendientes], lon[pendientes])
+        mejor[pendientes] = encontrado
+        distancia[pendientes] = np.where(encontrado >= 0, d, np.nan)
+
+    posiciones = np.where(mejor >= 0, indice['posiciones'][np.maximum(mejor, 0)], -1)
+    return posiciones, distancia
@@ -0,0 +1,63 @@
+import os
+import bisect
+
+# =========================================================================
+# 📌 ÍNDICE DE LA CARPETA DE FOTOS (búsqueda de la foto de cada falla)
+# =========================================================================
+# Las etapas de reintento buscaban la foto de cada falla probando os.path.exists
+# con varios nombres y extensiones, o recorriendo os.listdir(CARPETA_IMAGENES) y
+# normalizando cada nombre UNA VEZ POR FALLA (fallas x fotos). En carpetas de red
+# con decenas de miles de fotos esa búsqueda tardaba minutos.
+# Aquí la carpeta se lee una sola vez por ejecución y cada nombre se normaliza una
+# vez; la búsqueda exacta es un diccionario y la búsqueda por prefijo una
+# bisección sobre los nombres ordenados.
+
+EXTENSIONES_IMAGEN = ('.jpg', '.jpeg', '.png', '.tiff', '.webp') # En orden de preferencia
+
+
+def normalizar_nombre(nombre_base):
+    """Nombre comparable: mayúsculas, sin espacios ni guiones bajos."""
+    return nombre_base.upper().replace(' ', '').replace('_', '')
+
+
+def construir_indice(carpeta_path, extensiones=EXTENSIONES_IMAGEN):
+    """
+    Lee la carpeta una vez y devuelve el índice {'claves': [...], 'rutas': [...]}:
+    nombres normalizados (ordenados) y la ruta de cada uno. Si dos fotos normalizan
+    al mismo nombre va primero la de la extensión preferida.
+    """
+    entradas = []
+    try:
+        with os.scandir(carpeta_path) as iterador:
+            for entrada in iterador:
+                nombre_base, extension = os.path.splitext(entrada.name)
+                extension = extension.lower()
+                if extension in extensiones:
+                    entradas.append((normalizar_nombre(nombre_base), extensiones.index(extension), entrada.name))
+    except OSError as e:
+        print(f"⚠️ No se pudo leer la carpeta de fotos '{carpeta_path}'. {e}")
+    entradas.sort()
+    print(f"🗂️ Índice de fotos: {len(entradas)} imágenes en '{carpeta_path}'.")
+    return {
+        'claves': [clave for clave, _, _ in entradas],
+        'rutas': [os.path.join(carpeta_path, nombre) for _, _, nombre in entradas],
+    }
+
+
+def buscar_foto(indice, nombres_base, prefijo=True):
+    """
+    Ruta de la primera foto cuyo nombre normalizado es igual a alguno de 'nombres_base'
+    (en ese orden) o, con prefijo=True, empieza por el primero de ellos. None si no hay.
+    """
+    claves, rutas = indice['claves'], indice['rutas']
+    for nombre_base in nombres_base:
+        clave = normalizar_nombre(nombre_base)
+        posicion = bisect.bisect_left(claves, clave)
+        if posicion < len(claves) and claves[posicion] == clave:
+            return rutas[posicion]
+    if prefijo and nombres_base:
+        clave = normalizar_nombre(nombres_base[0])
+        posicion = bisect.bisect_left(claves, clave)
+        if posicion < len(claves) and claves[posicion].startswith(clave):
+            return rutas[posicion]
+    return None
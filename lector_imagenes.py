@@ -0,0 +1,49 @@
+import cv2
+
+# =========================================================================
+# 📌 LECTURA DE FOTOS (proceso1 ... proceso4)
+# =========================================================================
+# El sello GPS está en la franja inferior de la foto, y cada proceso solo usa
+# ese porcentaje (30% o 40%), a veces además reducido al 50%. Decodificar una
+# foto de 12 MP completa para quedarse con una sexta parte de los píxeles es lo
+# que más memoria y CPU consume al leer. Aquí:
+#   * la reducción de escala 1/2, 1/4 y 1/8 se hace dentro del decodificador JPEG
+#     (IMREAD_REDUCED_COLOR_N escala los coeficientes DCT: se calcula menos);
+#   * solo se conserva la franja inferior como arreglo propio, de modo que la
+#     foto completa se libera en cuanto termina la lectura.
+
+# Divisor de escala -> bandera de lectura reducida de OpenCV (de mayor a menor reducción)
+LECTURAS_REDUCIDAS = [
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+]
+
+
+def cargar_franja_inferior(ruta_imagen, porcentaje, escala=1.0):
+    """
+    Lee la franja inferior ('porcentaje' de la altura) de la foto, a la 'escala' pedida
+    (1.0 = resolución completa). Usa la lectura reducida más pequeña que no baje de esa
+    escala y completa el resto con cv2.resize. Devuelve None si la imagen no se pudo leer.
+    """
+    divisor, bandera = 1, cv2.IMREAD_COLOR
+    for divisor_dct, bandera_dct in LECTURAS_REDUCIDAS:
+        if escala * divisor_dct <= 1.0 + 1e-9:
+            divisor, bandera = divisor_dct, bandera_dct
+            break
+
+    img_cv = cv2.imread(ruta_imagen, bandera)
+    if img_cv is None:
+        return None
+
+    # .copy() deja solo la franja en memoria (la foto decodificada se libera)
+    alto = img_cv.shape[0]
+    franja = img_cv[int(alto * (1 - porcentaje)):alto, :].copy()
+    del img_cv
+
+    escala_restante = escala * divisor
+    if franja.size and escala_restante < 1.0 - 1e-9:
+        nuevo_ancho = max(1, int(franja.shape[1] * escala_restante))
+        nuevo_alto = max(1, int(franja.shape[0] * escala_restante))
+        franja = cv2.resize(franja, (nuevo_ancho, nuevo_alto), interpolation=cv2.INTER_LINEAR)
+    return franja
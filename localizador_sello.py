@@ -0,0 +1,77 @@
+import numpy as np
+
+# =========================================================================
+# 📌 LOCALIZADOR DEL SELLO GPS (perfiles de proyección)
+# =========================================================================
+# El OCR se hacía sobre toda la franja inferior (30% o 40% de la foto) o sobre
+# rectángulos fijos (ROI_LISTA), aunque el sello con las coordenadas ocupa solo
+# una o dos líneas de esa franja. El tiempo de Tesseract crece con el área, así
+# que aquí se busca el rectángulo ajustado del texto antes del OCR:
+#   * el texto quemado tiene muchos bordes verticales: la suma por fila de la
+#     diferencia horizontal de intensidad (perfil de filas) sube en sus líneas;
+#   * las filas por encima del umbral forman las líneas; las líneas separadas por
+#     poco espacio se unen en un bloque y se queda el bloque con más energía;
+#   * el perfil de columnas dentro de ese bloque da los extremos izquierdo y derecho.
+# Todo son operaciones vectorizadas de NumPy sobre la franja ya reducida de escala,
+# así que cuesta muy poco comparado con una llamada a Tesseract.
+
+FRACCION_UMBRAL = 0.35 # Umbral = mínimo + FRACCION_UMBRAL * (máximo - mínimo) del perfil
+ALTO_MINIMO_LINEA = 6 # Píxeles; bandas más delgadas se consideran ruido
+FRACCION_ALTO_MAXIMO = 0.60 # Si el "sello" ocupa más de esto de la franja, no hay sello claro
+MARGEN_RELATIVO = 0.35 # Margen alrededor del rectángulo, relativo al alto de línea
+
+
+def _suavizar(perfil, ventana):
+    if ventana <= 1 or perfil.size < ventana:
+        return perfil
+    return np.convolve(perfil, np.ones(ventana, np.float32) / ventana, mode='same')
+
+
+def _tramos(mascara):
+    """[(inicio, fin)] de los tramos consecutivos en True (fin exclusivo)."""
+    bordes = np.diff(np.concatenate(([0], mascara.astype(np.int8), [0])))
+    return list(zip(np.flatnonzero(bordes == 1), np.flatnonzero(bordes == -1)))
+
+
+def localizar_sello(gris):
+    """
+    Busca la línea (o bloque de líneas) del sello en la franja en escala de grises.
+    Devuelve (x0, y0, x1, y1, numero_lineas) o None si no hay un bloque de texto claro.
+    """
+    if gris is None or gris.ndim != 2 or gris.shape[0] < ALTO_MINIMO_LINEA or gris.shape[1] < 2:
+        return None
+    alto, ancho = gris.shape
+
+    bordes = np.abs(np.diff(gris.astype(np.int16), axis=1)) # Bordes verticales (alto, ancho - 1)
+    perfil_filas = _suavizar(bordes.mean(axis=1, dtype=np.float32), 3)
+    minimo, maximo = float(perfil_filas.min()), float(perfil_filas.max())
+    if maximo - minimo < 1.0:
+        return None # Franja sin contraste
+    lineas = [(y0, y1) for y0, y1 in _tramos(perfil_filas > minimo + FRACCION_UMBRAL * (maximo - minimo))
+              if y1 - y0 >= ALTO_MINIMO_LINEA]
+    if not lineas:
+        return None
+
+    # Unir las líneas separadas por menos de una línea de alto y quedarse con el bloque de más energía
+    bloques = [[lineas[0]]]
+    for y0, y1 in lineas[1:]:
+        anterior = bloques[-1][-1]
+        if y0 - anterior[1] <= anterior[1] - anterior[0]:
+            bloques[-1].append((y0, y1))
+        else:
+            bloques.append([(y0, y1)])
+    bloque = max(bloques, key=lambda b: float(perfil_filas[b[0][0]:b[-1][1]].sum()))
+    y0, y1 = bloque[0][0], bloque[-1][1]
+    if y1 - y0 > FRACCION_ALTO_MAXIMO * alto:
+        return None
+
+    perfil_columnas = _suavizar(bordes[y0:y1].mean(axis=0, dtype=np.float32), max(3, (y1 - y0) // 2))
+    minimo, maximo = float(perfil_columnas.min()), float(perfil_columnas.max())
+    columnas = np.flatnonzero(perfil_columnas > minimo + FRACCION_UMBRAL * (maximo - minimo))
+    if columnas.size == 0:
+        return None
+    x0, x1 = int(columnas[0]), int(columnas[-1]) + 2 # +2: diff acorta una columna
+
+    alto_linea = max(l1 - l0 for l0, l1 in bloque)
+    margen = max(2, int(alto_linea * MARGEN_RELATIVO))
+    return (max(0, x0 - margen), max(0, int(y0) - margen), min(ancho, x1 + margen), min(alto, int(y1) + margen), len(bloque))
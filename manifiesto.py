@@ -0,0 +1,174 @@
+import os
+import csv
+import almacen_resultados # Clave de fila (OT rellenada, Resto_Nombre)
+
+# =========================================================================
+# 📌 MANIFIESTO DE IMÁGENES (ejecuciones incrementales)
+# =========================================================================
+# Guarda, por cada foto de la carpeta, su tamaño y fecha de modificación junto
+# con el resultado FINAL de la extracción (después de los reintentos). En la siguiente
+# ejecución las fotos sin cambios reutilizan ese resultado sin decodificarse, y
+# solo las fotos nuevas o modificadas pasan por proceso1 y reintentos.
+#
+# El manifiesto lo escribe reintentos (o proceso4 suelto) al terminar, por ser la
+# última etapa de OCR; proceso1 lo usa para arrastrar las filas y las etapas de
+# reintento para no reintentar fallas que ya se reintentaron sobre la misma foto.
+#
+# La firma de cada foto se toma cuando proceso1 lista la carpeta (ANTES de leerla) y
+# se guarda en ARCHIVO_FIRMAS; el manifiesto se escribe con esa firma. Si la foto se
+# reemplaza durante la ejecución, su firma guardada ya no coincide y la siguiente
+# ejecución la vuelve a procesar en lugar de asociarle el resultado de la foto vieja.
+#
+# Cada entrada guarda también el rango de la ciudad con que se validó su resultado
+# (Rango_Ciudad, ver texto_rango). Una entrada solo se reutiliza si la ciudad de la
+# ejecución tiene el mismo rango: con otra ciudad la foto vuelve a pasar por el OCR
+# (proceso1 y reintentos), porque un CORRECTO o un NO ENCONTRADO con la caja de otra
+# ciudad no dice nada de la actual.
+
+ARCHIVO_MANIFIESTO = 'manifiesto_imagenes.csv'
+ARCHIVO_FIRMAS = 'firmas_imagenes.csv'
+CAMPOS_FILA = ['OT', 'Resto_Nombre', 'Latitud_Extraida', 'Longitud_Extraida', 'Latitud_Decimal', 'Longitud_Decimal', 'Estatus', 'Metodo_Extraccion']
+CAMPOS_FIRMAS = ['Archivo', 'Tamano', 'Mtime_ns']
+CAMPOS_MANIFIESTO = CAMPOS_FIRMAS + ['Rango_Ciudad'] + CAMPOS_FILA
+
+
+def texto_rango(rangos_ciudad):
+    """Rango de la ciudad (lat_min, lat_max, lon_min, lon_max) como texto; '' sin ciudad reconocida (rango de México)."""
+    if not rangos_ciudad:
+        return ''
+    return ';'.join(repr(float(valor)) for valor in rangos_ciudad)
+
+
+def _misma_validacion(entrada, firma, rango):
+    """La entrada corresponde a la foto con esa firma y se validó con el mismo rango de ciudad."""
+    return firma == (entrada['Tamano'], entrada['Mtime_ns']) and entrada.get('Rango_Ciudad') == rango
+
+
+def firma_archivo(ruta_imagen):
+    """Firma barata del archivo (tamaño, mtime en ns); None si no existe."""
+    try:
+        estado = os.stat(ruta_imagen)
+    except OSError:
+        return None
+    return str(estado.st_size), str(estado.st_mtime_ns)
+
+
+def clave_archivo(nombre_archivo_con_ext):
+    """(OT, Resto_Nombre) de la foto, con la misma separación por posición que proceso1."""
+    nombre_archivo_base = os.path.splitext(nombre_archivo_con_ext.strip())[0].strip()
+    return nombre_archivo_base[:8].strip(), nombre_archivo_base[8:].strip()
+
+
+def cargar_manifiesto(ruta_manifiesto=ARCHIVO_MANIFIESTO):
+    """Devuelve {nombre_archivo: entrada}; vacío si aún no hay manifiesto o no se puede leer."""
+    if not os.path.exists(ruta_manifiesto):
+        return {}
+    try:
+        with open(ruta_manifiesto, 'r', newline='', encoding='utf-8') as archivo_csv:
+            return {entrada['Archivo']: entrada for entrada in csv.DictReader(archivo_csv)}
+    except Exception as e:
+        print(f"⚠️ No se pudo leer el manifiesto '{ruta_manifiesto}' ({e}). Se procesarán todas las imágenes.")
+        return {}
+
+
+def firmas_carpeta(archivos, carpeta_path):
+    """{nombre_archivo: firma} de las fotos listadas (las que ya no existen se omiten)."""
+    firmas = {}
+    for nombre_archivo_con_ext in archivos:
+        firma = firma_archivo(os.path.join(carpeta_path, nombre_archivo_con_ext))
+        if firma is not None:
+            firmas[nombre_archivo_con_ext] = firma
+    return firmas
+
+
+def guardar_firmas(firmas, ruta_firmas=ARCHIVO_FIRMAS):
+    """Guarda las firmas tomadas por proceso1 al listar la carpeta (las usa actualizar_manifiesto)."""
+    try:
+        ruta_temporal = ruta_firmas + '.tmp'
+        with open(ruta_temporal, 'w', newline='', encoding='utf-8') as archivo_csv:
+            escritor = csv.writer(archivo_csv)
+            escritor.writerow(CAMPOS_FIRMAS)
+            escritor.writerows((nombre, tamano, mtime_ns) for nombre, (tamano, mtime_ns) in sorted(firmas.items()))
+        os.replace(ruta_temporal, ruta_firmas)
+    except Exception as e:
+        print(f"⚠️ No se pudieron guardar las firmas de las imágenes en '{ruta_firmas}'. {e}")
+
+
+def cargar_firmas(ruta_firmas=ARCHIVO_FIRMAS):
+    """{nombre_archivo: firma} guardado por proceso1; None si no hay archivo o no se puede leer."""
+    if not os.path.exists(ruta_firmas):
+        return None
+    try:
+        with open(ruta_firmas, 'r', newline='', encoding='utf-8') as archivo_csv:
+            return {fila['Archivo']: (fila['Tamano'], fila['Mtime_ns']) for fila in csv.DictReader(archivo_csv)}
+    except Exception as e:
+        print(f"⚠️ No se pudieron leer las firmas de las imágenes '{ruta_firmas}' ({e}).")
+        return None
+
+
+def filas_sin_cambios(firmas, manifiesto, rangos_ciudad):
+    """
+    {nombre_archivo: fila} con el resultado guardado de las fotos cuya firma (ver firmas_carpeta)
+    no cambió y que se validaron con el rango de 'rangos_ciudad' (None: rango de México).
+    """
+    rango = texto_rango(rangos_ciudad)
+    filas = {}
+    for nombre_archivo_con_ext, firma in firmas.items():
+        entrada = manifiesto.get(nombre_archivo_con_ext)
+        if entrada and _misma_validacion(entrada, firma, rango):
+            filas[nombre_archivo_con_ext] = {campo: entrada.get(campo, '') for campo in CAMPOS_FILA}
+    return filas
+
+
+def claves_sin_cambios(carpeta_path, rangos_ciudad, ruta_manifiesto=ARCHIVO_MANIFIESTO):
+    """
+    Conjunto de claves de fila (ver almacen_resultados.clave_fila) cuyo resultado final ya
+    está en el manifiesto, cuya foto no cambió y que se validó con el rango de 'rangos_ciudad'.
+    Las etapas de reintento omiten esas filas.
+    """
+    manifiesto = cargar_manifiesto(ruta_manifiesto)
+    rango = texto_rango(rangos_ciudad)
+    return {
+        almacen_resultados.clave_fila(entrada['OT'], entrada['Resto_Nombre'])
+        for nombre_archivo_con_ext, entrada in manifiesto.items()
+        if _misma_validacion(entrada, firma_archivo(os.path.join(carpeta_path, nombre_archivo_con_ext)), rango)
+    }
+
+
+def actualizar_manifiesto(filas, rangos_ciudad, ruta_manifiesto=ARCHIVO_MANIFIESTO, ruta_firmas=ARCHIVO_FIRMAS):
+    """
+    Reescribe el manifiesto con el resultado final de cada foto que listó proceso1, con
+    la firma que tenía la foto al listarse (ARCHIVO_FIRMAS), no la de este momento: una
+    foto reemplazada mientras corría el pipeline no coincide con su entrada y se vuelve
+    a procesar en la siguiente ejecución. Cada entrada lleva el rango de la ciudad con que
+    se validó ('rangos_ciudad'). Sin firmas guardadas el manifiesto no se toca.
+    """
+    firmas = cargar_firmas(ruta_firmas)
+    if firmas is None:
+        print(f"⚠️ No hay firmas de proceso1 ('{ruta_firmas}'): el manifiesto no se actualiza.")
+        return
+    filas_por_clave = almacen_resultados.indexar_filas(filas)
+    rango = texto_rango(rangos_ciudad)
+    entradas = []
+    for nombre_archivo_con_ext, firma in sorted(firmas.items()):
+        fila = filas_por_clave.get(almacen_resultados.clave_fila(*clave_archivo(nombre_archivo_con_ext)))
+        if fila is None:
+            continue
+        entrada = {campo: fila.get(campo, '') for campo in CAMPOS_FILA}
+        entrada.update({'Archivo': nombre_archivo_con_ext, 'Tamano': firma[0], 'Mtime_ns': firma[1], 'Rango_Ciudad': rango})
+        entradas.append(entrada)
+    guardar_entradas(entradas, ruta_manifiesto)
+
+
+def guardar_entradas(entradas, ruta_manifiesto=ARCHIVO_MANIFIESTO):
+    """Reescribe el manifiesto con 'entradas' tal cual (con su firma guardada)."""
+    try:
+        ruta_temporal = ruta_manifiesto + '.tmp'
+        with open(ruta_temporal, 'w', newline='', encoding='utf-8') as archivo_csv:
+            escritor = csv.DictWriter(archivo_csv, fieldnames=CAMPOS_MANIFIESTO)
+            escritor.writeheader()
+            escritor.writerows(entradas)
+        os.replace(ruta_temporal, ruta_manifiesto) # Reemplazo atómico: nunca queda un manifiesto a medias
+        print(f"🗂️ Manifiesto actualizado: {len(entradas)} imágenes en '{ruta_manifiesto}'.")
+    except Exception as e:
+        print(f"⚠️ No se pudo escribir el manifiesto '{ruta_manifiesto}'. {e}")
@@ -0,0 +1,616 @@
+import os
+import glob
+import shlex
+import ctypes
+import ctypes.util
+import bisect
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import subprocess
+import tempfile
+import numpy as np
+from PIL import Image
+import pytesseract
+import cache_ocr # Textos ya reconocidos (hash de los píxeles + configuración), persistentes entre ejecuciones
+
+# =========================================================================
+# 📌 MOTOR OCR COMPARTIDO (proceso1 ... proceso4)
+# =========================================================================
+# reconocer() es el punto único de OCR: usa el ejecutable tesseract (CLI) o, si
+# se eligió con seleccionar_motor('libtesseract'), la API C de Tesseract residente.
+#
+# En el motor CLI las imágenes viajan sin comprimir (PBM/PGM/PPM) por la entrada
+# estándar y el texto se lee de la salida estándar: ni PNG ni archivos temporales
+# por intento. Si el ejecutable no acepta 'stdin' se usa una carpeta en RAM.
+#
+# Cada llamada a pytesseract.image_to_string arranca un proceso 'tesseract'
+# nuevo y vuelve a cargar el modelo de idioma. Para los sellos GPS (una sola
+# línea de texto) ese costo fijo domina. reconocer_lote() reconoce muchas
+# imágenes en UNA sola invocación usando la entrada por lista de imágenes de
+# Tesseract (un archivo .txt con una ruta por línea): cada imagen es una página
+# y el texto de salida separa las páginas con un salto de página ('\f').
+#
+# Antes de cada llamada se consulta cache_ocr: una imagen con los mismos píxeles y
+# la misma configuración ya reconocida (en esta u otra ejecución) no vuelve a Tesseract.
+
+SEPARADOR_PAGINA = '\f'
+
+# Motores disponibles:
+#   'cli'          -> ejecutable tesseract (un proceso por llamada, E/S por tuberías)
+#   'libtesseract' -> la librería de Tesseract cargada con ctypes una sola vez por
+#                     proceso (o hilo); el modelo 'eng' queda residente en memoria y
+#                     las imágenes se entregan como buffers NumPy, sin archivos temporales.
+MOTORES_OCR = ('cli', 'libtesseract')
+MOTOR_OCR = os.environ.get('OCR_MOTOR', 'cli') # También se puede elegir con la variable de entorno OCR_MOTOR
+
+# Carpeta respaldada en RAM para los archivos que sí hacen falta (listas de lotes, respaldo sin stdin)
+CARPETA_RAM = '/dev/shm' if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK) else tempfile.gettempdir()
+
+# Se desactiva si el ejecutable de tesseract no acepta imágenes por la entrada estándar
+_entrada_stdin = True
+
+# Nombres con los que se busca la librería si ctypes.util.find_library no la encuentra
+NOMBRES_LIBTESSERACT = ['libtesseract.so.5', 'libtesseract.so.4', 'libtesseract.5.dylib', 'libtesseract.dylib']
+
+
+def _a_buffer(imagen):
+    """Convierte la imagen (PIL o NumPy) a un arreglo uint8 contiguo: gris, RGB o RGBA."""
+    if isinstance(imagen, Image.Image):
+        if imagen.mode not in ('L', 'RGB', 'RGBA'):
+            imagen = imagen.convert('L' if imagen.mode in ('1', 'I', 'F', 'I;16') else 'RGB')
+        imagen = np.asarray(imagen)
+    if imagen.dtype == np.bool_:
+        imagen = imagen.astype(np.uint8) * 255
+    return np.ascontiguousarray(imagen, dtype=np.uint8)
+
+
+def _argumentos_config(config_ocr):
+    """Separa la configuración ('--psm 6 ...') igual que pytesseract."""
+    return shlex.split(config_ocr, posix=os.name != 'nt') if config_ocr else []
+
+
+# -------------------------------------------------------------------------
+# MOTOR 'cli' (ejecutable tesseract con E/S por tuberías)
+# -------------------------------------------------------------------------
+
+def _codificar_pnm(imagen):
+    """
+    Codifica la imagen en formato Netpbm sin compresión: PBM (1 bit por píxel) si
+    es binaria (solo 0 y 255, como las pasadas umbralizadas), PGM si es gris y PPM
+    si es a color. Es solo un encabezado más los bytes crudos, sin costo de PNG.
+    """
+    buffer = _a_buffer(imagen)
+    alto, ancho = buffer.shape[:2]
+    if buffer.ndim == 3:
+        return b'P6\n%d %d\n255\n' % (ancho, alto) + np.ascontiguousarray(buffer[:, :, :3]).tobytes()
+    if not np.any((buffer != 0) & (buffer != 255)):
+        return b'P4\n%d %d\n' % (ancho, alto) + np.packbits(buffer == 0, axis=1).tobytes() # En PBM 1 = negro
+    return b'P5\n%d %d\n255\n' % (ancho, alto) + buffer.tobytes()
+
+
+def _ejecutar_tesseract(entrada, config_ocr, lang, datos_entrada=None):
+    """Ejecuta tesseract con salida a 'stdout' y devuelve el texto; lanza TesseractError si falla."""
+    comando = [pytesseract.pytesseract.tesseract_cmd, entrada, 'stdout', '-l', lang] + _argumentos_config(config_ocr)
+    resultado = subprocess.run(comando, input=datos_entrada, capture_output=True)
+    if resultado.returncode != 0:
+        raise pytesseract.TesseractError(resultado.returncode, resultado.stderr.decode('utf-8', errors='replace'))
+    return resultado.stdout.decode('utf-8', errors='replace')
+
+
+def _reconocer_cli(imagen, config_ocr, lang):
+    global _entrada_stdin
+    datos = _codificar_pnm(imagen)
+    if _entrada_stdin:
+        try:
+            return _ejecutar_tesseract('stdin', config_ocr, lang, datos_entrada=datos)
+        except pytesseract.TesseractError:
+            pass # Se confirma abajo con un archivo si el problema es la entrada estándar
+
+    # Respaldo: archivo PNM en la carpeta en RAM
+    descriptor, ruta = tempfile.mkstemp(suffix='.pnm', prefix='ocr_', dir=CARPETA_RAM)
+    try:
+        with os.fdopen(descriptor, 'wb') as archivo:
+            archivo.write(datos)
+        texto = _ejecutar_tesseract(ruta, config_ocr, lang)
+    finally:
+        os.remove(ruta)
+
+    if _entrada_stdin:
+        print("⚠️ Tesseract no acepta imágenes por la entrada estándar; se usarán archivos en "
+              f"'{CARPETA_RAM}'.")
+        _entrada_stdin = False
+    return texto
+
+
+# -------------------------------------------------------------------------
+# MOTOR 'libtesseract' (API C de Tesseract vía ctypes)
+# -------------------------------------------------------------------------
+
+_libtesseract = None
+_sesiones = threading.local() # TessBaseAPI de cada hilo: la API no es segura entre hilos
+MAX_SESIONES_POR_HILO = 4 # Combinaciones (idioma, variables -c) residentes por hilo; la más antigua se libera
+
+
+class _SesionesHilo(dict):
+    """Sesiones {(idioma, variables): api} de un hilo; se liberan cuando el hilo termina (y se borra su threading.local)."""
+
+    def __del__(self):
+        for api in self.values():
+            try:
+                _liberar_api(api)
+            except Exception:
+                pass # Cierre del intérprete: la librería puede ya no estar disponible
+
+
+def _rutas_libtesseract():
+    """Rutas candidatas de la librería: búsqueda del sistema y carpeta del ejecutable configurado."""
+    rutas = []
+    encontrada = ctypes.util.find_library('tesseract')
+    if encontrada:
+        rutas.append(encontrada)
+    carpeta_ejecutable = os.path.dirname(os.path.abspath(pytesseract.pytesseract.tesseract_cmd))
+    rutas.extend(sorted(glob.glob(os.path.join(carpeta_ejecutable, 'libtesseract*.dll')), reverse=True))
+    rutas.extend(NOMBRES_LIBTESSERACT)
+    return rutas
+
+
+def _cargar_libtesseract():
+    """Carga la librería una sola vez por proceso y declara las firmas de la API C que se usan."""
+    global _libtesseract
+    if _libtesseract is not None:
+        return _libtesseract
+
+    if os.name == 'nt' and hasattr(os, 'add_dll_directory'):
+        carpeta_ejecutable = os.path.dirname(os.path.abspath(pytesseract.pytesseract.tesseract_cmd))
+        if os.path.isdir(carpeta_ejecutable):
+            os.add_dll_directory(carpeta_ejecutable) # Dependencias (leptonica, etc.) junto al .exe
+
+    errores = []
+    for ruta in _rutas_libtesseract():
+        try:
+            lib = ctypes.CDLL(ruta)
+            break
+        except OSError as e:
+            errores.append(f"{ruta}: {e}")
+    else:
+        raise OSError("No se encontró libtesseract. " + "; ".join(errores))
+
+    lib.TessBaseAPICreate.restype = ctypes.c_void_p
+    lib.TessBaseAPIInit3.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p]
+    lib.TessBaseAPIInit3.restype = ctypes.c_int
+    lib.TessBaseAPISetPageSegMode.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    lib.TessBaseAPISetVariable.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p]
+    lib.TessBaseAPISetVariable.restype = ctypes.c_int
+    lib.TessBaseAPISetImage.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int]
+    lib.TessBaseAPIGetUTF8Text.argtypes = [ctypes.c_void_p]
+    lib.TessBaseAPIGetUTF8Text.restype = ctypes.c_void_p # Se libera con TessDeleteText
+    lib.TessBaseAPIGetTsvText.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    lib.TessBaseAPIGetTsvText.restype = ctypes.c_void_p # Se libera con TessDeleteText
+    lib.TessDeleteText.argtypes = [ctypes.c_void_p]
+    lib.TessBaseAPIClear.argtypes = [ctypes.c_void_p]
+    lib.TessBaseAPIEnd.argtypes = [ctypes.c_void_p]
+    lib.TessBaseAPIDelete.argtypes = [ctypes.c_void_p]
+    _libtesseract = lib
+    return lib
+
+
+def _carpeta_tessdata():
+    """Carpeta 'tessdata' junto al ejecutable (instalación de Windows); None usa TESSDATA_PREFIX o la ruta compilada."""
+    if os.environ.get('TESSDATA_PREFIX'):
+        return None
+    carpeta = os.path.join(os.path.dirname(os.path.abspath(pytesseract.pytesseract.tesseract_cmd)), 'tessdata')
+    return carpeta if os.path.isdir(carpeta) else None
+
+
+def _liberar_api(api):
+    """Termina y borra un TessBaseAPI (libera el modelo cargado)."""
+    lib = _cargar_libtesseract()
+    lib.TessBaseAPIEnd(api)
+    lib.TessBaseAPIDelete(api)
+
+
+def _opciones_libtesseract(config_ocr):
+    """(psm, variables) de la configuración: solo las opciones que usan los procesos, --psm N y -c variable=valor."""
+    argumentos = _argumentos_config(config_ocr)
+    psm, variables = 3, []
+    for i, argumento in enumerate(argumentos[:-1]):
+        if argumento == '--psm':
+            psm = int(argumentos[i + 1])
+        elif argumento == '-c' and '=' in argumentos[i + 1]:
+            variables.append(tuple(argumentos[i + 1].split('=', 1)))
+    return psm, tuple(variables)
+
+
+def _sesion_libtesseract(lang, variables=()):
+    """
+    Devuelve el TessBaseAPI del hilo actual para (idioma, variables -c), inicializándolo (y
+    cargando el modelo) solo la primera vez. Las variables quedan fijas en esa sesión, así
+    que una llamada con '-c' no cambia las siguientes que no lo traen. Si el hilo ya tiene
+    MAX_SESIONES_POR_HILO sesiones, la usada hace más tiempo se termina y se borra.
+    """
+    apis = getattr(_sesiones, 'apis', None)
+    if apis is None:
+        apis = _sesiones.apis = _SesionesHilo()
+    llave = (lang, variables)
+    api = apis.pop(llave, None)
+    if api is None:
+        lib = _cargar_libtesseract()
+        api = lib.TessBaseAPICreate()
+        tessdata = _carpeta_tessdata()
+        if lib.TessBaseAPIInit3(api, tessdata.encode('utf-8') if tessdata else None, lang.encode('utf-8')) != 0:
+            _liberar_api(api)
+            raise RuntimeError(f"libtesseract no pudo inicializar el idioma '{lang}'.")
+        for nombre, valor in variables:
+            lib.TessBaseAPISetVariable(api, nombre.encode('utf-8'), valor.encode('utf-8'))
+        while len(apis) >= MAX_SESIONES_POR_HILO:
+            _liberar_api(apis.pop(next(iter(apis))))
+    apis[llave] = api # Al final del diccionario: la más reciente
+    return api
+
+
+def _reconocer_libtesseract(imagen, config_ocr, lang, tsv=False):
+    lib = _cargar_libtesseract()
+    psm, variables = _opciones_libtesseract(config_ocr)
+    api = _sesion_libtesseract(lang, variables)
+    lib.TessBaseAPISetPageSegMode(api, psm)
+
+    buffer = _a_buffer(imagen)
+    alto, ancho = buffer.shape[:2]
+    bytes_por_pixel = 1 if buffer.ndim == 2 else buffer.shape[2]
+    lib.TessBaseAPISetImage(api, buffer.ctypes.data, ancho, alto, bytes_por_pixel, buffer.strides[0])
+
+    puntero_texto = lib.TessBaseAPIGetTsvText(api, 0) if tsv else lib.TessBaseAPIGetUTF8Text(api)
+    try:
+        texto = ctypes.string_at(puntero_texto).decode('utf-8', errors='replace') if puntero_texto else ''
+    finally:
+        if puntero_texto:
+            lib.TessDeleteText(puntero_texto)
+        lib.TessBaseAPIClear(api) # Libera la imagen y los resultados; el modelo sigue cargado
+    return texto
+
+
+def seleccionar_motor(nombre):
+    """
+    Elige el motor OCR para este proceso. Si 'libtesseract' no se puede cargar se
+    avisa y se continúa con 'cli'. Devuelve el motor que quedó activo.
+    """
+    global MOTOR_OCR
+    if nombre not in MOTORES_OCR:
+        raise ValueError(f"Motor OCR desconocido '{nombre}'. Opciones: {', '.join(MOTORES_OCR)}")
+    if nombre == 'libtesseract':
+        try:
+            _cargar_libtesseract()
+        except OSError as e:
+            print(f"⚠️ No se pudo cargar libtesseract ({e}). Se usa el motor 'cli'.")
+            nombre = 'cli'
+    MOTOR_OCR = nombre
+    return MOTOR_OCR
+
+
+def _reconocer_motor(buffer, config_ocr, lang):
+    if MOTOR_OCR == 'libtesseract':
+        return _reconocer_libtesseract(buffer, config_ocr, lang)
+    return _reconocer_cli(buffer, config_ocr, lang)
+
+
+def reconocer(imagen, config_ocr='--psm 6', lang='eng'):
+    """Reconoce una imagen (PIL o NumPy) con el motor seleccionado y devuelve el texto."""
+    buffer = _a_buffer(imagen)
+    return cache_ocr.reconocer_con_cache(buffer, config_ocr, lang, 'texto', MOTOR_OCR,
+                                         lambda: _reconocer_motor(buffer, config_ocr, lang))
+
+
+def reconocer_lote(imagenes, config_ocr='--psm 6', lang='eng'):
+    """
+    Reconoce una lista de imágenes con una sola ejecución de Tesseract y devuelve
+    la lista de textos en el mismo orden. Todas las imágenes del lote comparten la
+    misma configuración (PSM). Si la salida no se puede repartir página por página,
+    se recurre a una llamada individual por imagen.
+    """
+    if not imagenes:
+        return []
+    if len(imagenes) == 1 or MOTOR_OCR == 'libtesseract':
+        # Con la librería residente cada imagen ya es barata: sin archivos temporales ni procesos
+        return [reconocer(imagen, config_ocr=config_ocr, lang=lang) for imagen in imagenes]
+
+    # Solo van al lote las imágenes que no están en la caché
+    buffers = [_a_buffer(imagen) for imagen in imagenes]
+    if cache_ocr.USAR_CACHE_OCR:
+        claves = [cache_ocr.clave(buffer, config_ocr, lang, 'texto', MOTOR_OCR) for buffer in buffers]
+        en_cache = cache_ocr.buscar(claves)
+        if en_cache:
+            faltantes = [i for i, c in enumerate(claves) if c not in en_cache]
+            textos = [en_cache[c][0] if c in en_cache else None for c in claves]
+            cache_ocr.sumar_segundos(sum(segundos for _, segundos in en_cache.values())) # Costo original de los aciertos
+            for i, texto in zip(faltantes, reconocer_lote([buffers[i] for i in faltantes], config_ocr=config_ocr, lang=lang)):
+                textos[i] = texto
+            return textos
+    inicio = time.perf_counter()
+    paginas = _reconocer_lote_cli(buffers, config_ocr, lang)
+    segundos = time.perf_counter() - inicio
+    cache_ocr.sumar_segundos(segundos)
+    if paginas is None:
+        # Salida inesperada (imagen ilegible, versión distinta...): reconocer una por una
+        return [reconocer(buffer, config_ocr=config_ocr, lang=lang) for buffer in buffers]
+    if cache_ocr.USAR_CACHE_OCR:
+        cache_ocr.guardar({c: (pagina, segundos / len(paginas)) for c, pagina in zip(claves, paginas)})
+    return paginas
+
+
+def _reconocer_lote_cli(imagenes, config_ocr, lang):
+    """Una ejecución de tesseract para todas las imágenes; None si la salida no se puede repartir por página."""
+
+    # La lista de imágenes necesita archivos: PNM sin compresión en la carpeta en RAM
+    with tempfile.TemporaryDirectory(prefix='ocr_lote_', dir=CARPETA_RAM) as carpeta_temporal:
+        rutas = []
+        for i, imagen in enumerate(imagenes):
+            ruta = os.path.join(carpeta_temporal, f"img_{i:05d}.pnm")
+            with open(ruta, 'wb') as archivo_imagen:
+                archivo_imagen.write(_codificar_pnm(imagen))
+            rutas.append(ruta)
+
+        ruta_lista = os.path.join(carpeta_temporal, 'lista_imagenes.txt')
+        with open(ruta_lista, 'w', encoding='utf-8') as archivo_lista:
+            archivo_lista.write('\n'.join(rutas) + '\n')
+
+        comando = [pytesseract.pytesseract.tesseract_cmd, ruta_lista, 'stdout', '-l', lang] + _argumentos_config(config_ocr)
+        try:
+            resultado = subprocess.run(comando, capture_output=True, check=True)
+            paginas = resultado.stdout.decode('utf-8', errors='replace').split(SEPARADOR_PAGINA)
+        except (subprocess.CalledProcessError, OSError):
+            paginas = []
+
+    # Tesseract termina cada página con '\f', así que sobra un elemento final vacío
+    if len(paginas) == len(imagenes) + 1:
+        return paginas[:-1]
+    return None
+
+
+# Variantes reconocidas por reconocer_variantes con 'aceptar' y, de ellas, las que iban
+# después de la aceptada (OCR de más por ir en el mismo lote); ver informar_variantes_de_mas
+_conteo_variantes = {'reconocidas': 0, 'de_mas': 0}
+
+
+def reconocer_variantes(variantes, lang='eng', aceptar=None):
+    """
+    Reconoce una lista de variantes (imagen, config_ocr) de una misma foto y devuelve
+    los textos en el mismo orden. Las variantes que comparten configuración (PSM) se
+    agrupan en una sola llamada a Tesseract.
+
+    Con 'aceptar' (función (indice, texto) -> bool) se para en la primera variante aceptada
+    en el orden de la lista: cada llamada reconoce las pendientes con la configuración de la
+    primera variante pendiente, se revisan en orden las ya reconocidas y las que ya no hacen
+    falta quedan en None. Con libtesseract (sin costo fijo por llamada) va de una en una y no reconoce nada
+    de más; con el motor 'cli' las del lote posteriores a la aceptada sí se reconocen y se
+    cuentan en informar_variantes_de_mas.
+    """
+    textos = [None] * len(variantes)
+    indices_por_config = {}
+    for i, (_, config_ocr) in enumerate(variantes):
+        indices_por_config.setdefault(config_ocr, []).append(i)
+
+    if aceptar is None:
+        for config_ocr, indices in indices_por_config.items():
+            textos_config = reconocer_lote([variantes[i][0] for i in indices], config_ocr=config_ocr, lang=lang)
+            for i, texto in zip(indices, textos_config):
+                textos[i] = texto
+        return textos
+
+    siguiente, aceptada = 0, len(variantes)
+    while siguiente < aceptada:
+        config_ocr = variantes[siguiente][1]
+        indices = [i for i in indices_por_config[config_ocr] if siguiente <= i and textos[i] is None]
+        if MOTOR_OCR == 'libtesseract':
+            indices = indices[:1]
+        for i, texto in zip(indices, reconocer_lote([variantes[i][0] for i in indices], config_ocr=config_ocr, lang=lang)):
+            textos[i] = texto
+        while siguiente < aceptada and textos[siguiente] is not None:
+            if aceptar(siguiente, textos[siguiente]):
+                aceptada = siguiente
+            else:
+                siguiente += 1
+    _conteo_variantes['reconocidas'] += sum(texto is not None for texto in textos)
+    _conteo_variantes['de_mas'] += sum(texto is not None for texto in textos[aceptada + 1:])
+    return textos
+
+
+def informar_variantes_de_mas():
+    """Imprime (y reinicia) cuántas variantes se reconocieron en lote después de la que ya se había aceptado."""
+    reconocidas, de_mas = _conteo_variantes['reconocidas'], _conteo_variantes['de_mas']
+    if reconocidas:
+        print(f"🧮 Lotes de variantes: {reconocidas} variantes reconocidas, {de_mas} de ellas después de la aceptada "
+              f"({100 * de_mas / reconocidas:.1f}% de OCR de más).")
+    _conteo_variantes['reconocidas'] = _conteo_variantes['de_mas'] = 0
+
+
+# -------------------------------------------------------------------------
+# MOSAICO DE SELLOS (muchos recortes de una línea en una sola llamada)
+# -------------------------------------------------------------------------
+# Los recortes del sello son una o dos líneas de texto: en cada llamada pesa más
+# el costo fijo de Tesseract que el reconocimiento. Aquí los recortes de varias
+# fotos se apilan en una sola imagen (mosaico) separados por franjas blancas de
+# alto conocido; se reconoce el mosaico una vez con salida TSV (image_to_data) y
+# cada palabra vuelve al recorte que contiene el centro vertical de su caja.
+
+SEPARACION_MOSAICO = 24 # Píxeles blancos entre recortes (Tesseract no une líneas tan separadas)
+MARGEN_MOSAICO = 8 # Píxeles blancos a la izquierda de cada recorte y arriba / abajo del mosaico
+ALTO_MAXIMO_MOSAICO = 6000 # Si los recortes no caben, se arman varios mosaicos
+CONFIG_OCR_MOSAICO = '--psm 6' # Bloque de varias líneas
+
+
+def _gris_fondo_blanco(imagen):
+    """Recorte en gris con fondo blanco (los recortes binarizados pueden venir invertidos)."""
+    buffer = _a_buffer(imagen)
+    if buffer.ndim == 3:
+        buffer = buffer[:, :, :3].mean(axis=2).astype(np.uint8)
+    if np.median(buffer) < 128:
+        buffer = 255 - buffer
+    return buffer
+
+
+def armar_mosaico(imagenes):
+    """Apila los recortes en una imagen blanca. Devuelve (mosaico, [(y_inicio, y_fin)] de cada recorte)."""
+    recortes = [_gris_fondo_blanco(imagen) for imagen in imagenes]
+    ancho = max(recorte.shape[1] for recorte in recortes) + 2 * MARGEN_MOSAICO
+    alto = 2 * MARGEN_MOSAICO + sum(recorte.shape[0] for recorte in recortes) + SEPARACION_MOSAICO * (len(recortes) - 1)
+    mosaico = np.full((alto, ancho), 255, dtype=np.uint8)
+    franjas = []
+    y = MARGEN_MOSAICO
+    for recorte in recortes:
+        mosaico[y:y + recorte.shape[0], MARGEN_MOSAICO:MARGEN_MOSAICO + recorte.shape[1]] = recorte
+        franjas.append((y, y + recorte.shape[0]))
+        y += recorte.shape[0] + SEPARACION_MOSAICO
+    return mosaico, franjas
+
+
+def palabras_tsv(tsv):
+    """
+    Palabras de la salida TSV de Tesseract, en orden de lectura:
+    [(linea, izquierda, arriba, ancho, alto, confianza, texto)]; 'linea' es (página, bloque, párrafo, línea).
+    """
+    palabras = []
+    for renglon in tsv.splitlines()[1:]:
+        columnas = renglon.split('\t')
+        if len(columnas) < 12 or columnas[0] != '5' or not columnas[11].strip():
+            continue
+        try:
+            linea = tuple(int(valor) for valor in columnas[1:5])
+            izquierda, arriba, ancho, alto = (int(valor) for valor in columnas[6:10])
+            confianza = float(columnas[10])
+        except ValueError:
+            continue
+        palabras.append((linea, izquierda, arriba, ancho, alto, confianza, columnas[11].strip()))
+    return palabras
+
+
+def repartir_palabras(palabras, franjas):
+    """Texto de cada recorte: sus palabras unidas por espacios y sus líneas por saltos de línea."""
+    inicios = [y_inicio for y_inicio, _ in franjas]
+    lineas = [[] for _ in franjas] # por recorte: [[linea, [palabras]], ...]
+    for linea, _, arriba, _, alto, _, texto in palabras:
+        y_centro = arriba + alto / 2
+        k = max(0, bisect.bisect_right(inicios, y_centro) - 1)
+        if k + 1 < len(franjas) and y_centro - franjas[k][1] > franjas[k + 1][0] - y_centro:
+            k += 1 # Cae en la separación, más cerca del recorte de abajo
+        if not lineas[k] or lineas[k][-1][0] != linea:
+            lineas[k].append([linea, []])
+        lineas[k][-1][1].append(texto)
+    return ['\n'.join(' '.join(textos) for _, textos in lineas_recorte) for lineas_recorte in lineas]
+
+
+def reconocer_datos(imagen, config_ocr='--psm 6', lang='eng'):
+    """Salida TSV de Tesseract (como pytesseract.image_to_data): una fila por palabra con su caja."""
+    buffer = _a_buffer(imagen)
+    if MOTOR_OCR == 'libtesseract':
+        reconocer_tsv = lambda: _reconocer_libtesseract(buffer, config_ocr, lang, tsv=True)
+    else:
+        reconocer_tsv = lambda: _reconocer_cli(buffer, f"{config_ocr} tsv".strip(), lang)
+    return cache_ocr.reconocer_con_cache(buffer, config_ocr, lang, 'tsv', MOTOR_OCR, reconocer_tsv)
+
+
+def reconocer_palabras(imagen, config_ocr='--psm 6', lang='eng'):
+    """Palabras reconocidas con su caja y confianza (0 a 100), ver palabras_tsv."""
+    return palabras_tsv(reconocer_datos(imagen, config_ocr=config_ocr, lang=lang))
+
+
+def reconocer_mosaico(imagenes, config_ocr=CONFIG_OCR_MOSAICO, lang='eng'):
+    """
+    Reconoce los recortes en mosaicos (una llamada por mosaico) y devuelve el texto de
+    cada uno, en el mismo orden. Si un mosaico falla, sus recortes quedan con texto vacío.
+    """
+    grupos, alto_grupo = [[]], 0
+    for imagen in imagenes:
+        alto = _a_buffer(imagen).shape[0] + SEPARACION_MOSAICO
+        if grupos[-1] and alto_grupo + alto > ALTO_MAXIMO_MOSAICO:
+            grupos.append([])
+            alto_grupo = 0
+        grupos[-1].append(imagen)
+        alto_grupo += alto
+
+    textos = []
+    for grupo in grupos:
+        if not grupo:
+            continue
+        mosaico, franjas = armar_mosaico(grupo)
+        try:
+            tsv = reconocer_datos(mosaico, config_ocr=config_ocr, lang=lang)
+        except Exception:
+            tsv = ''
+        textos.extend(repartir_palabras(palabras_tsv(tsv), franjas))
+    return textos
+
+# -------------------------------------------------------------------------
+# MODO ESPECULATIVO (varias pasadas de una misma foto a la vez)
+# -------------------------------------------------------------------------
+# Los hilos del modo especulativo son de un solo pool por proceso, creado con el
+# tamaño de --especulativo la primera vez: así cada hilo reutiliza su sesión de
+# libtesseract foto tras foto en lugar de crear (y cargar el modelo) en cada una.
+
+_pool_especulativo = None # (ThreadPoolExecutor, hilos)
+_candado_pool = threading.Lock()
+
+
+def _pool(hilos):
+    """Pool del modo especulativo con al menos 'hilos' hilos (se crea o se agranda una sola vez)."""
+    global _pool_especulativo
+    with _candado_pool:
+        if _pool_especulativo is None or _pool_especulativo[1] < hilos:
+            if _pool_especulativo is not None:
+                _pool_especulativo[0].shutdown(wait=False) # Sus hilos terminan (y liberan sus sesiones) al vaciarse
+            _pool_especulativo = (ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='ocr_especulativo'), hilos)
+        return _pool_especulativo[0]
+
+
+def cerrar_pool_especulativo():
+    """Termina los hilos del modo especulativo; cada uno libera sus sesiones de libtesseract al salir."""
+    global _pool_especulativo
+    with _candado_pool:
+        pool, _pool_especulativo = _pool_especulativo, None
+    if pool is not None:
+        pool[0].shutdown(wait=True, cancel_futures=True)
+
+
+def _cronometrar(tarea):
+    """(resultado, segundos de OCR de la tarea); los aciertos de la caché cuentan con su costo original."""
+    inicio = cache_ocr.segundos_ocr()
+    resultado = tarea()
+    return resultado, cache_ocr.segundos_ocr() - inicio
+
+
+def primer_resultado(tareas, hilos=1):
+    """
+    Ejecuta las 'tareas' (funciones sin argumentos, en orden de prioridad) hasta la primera
+    que devuelve algo distinto de None. Devuelve (indice, resultado, segundos) o
+    (None, None, segundos); 'segundos' es el tiempo de OCR de cada tarea hasta la elegida
+    (cache_ocr.segundos_ocr: un texto de la caché cuenta con lo que costó reconocerlo).
+
+    Con hilos > 1 (modo especulativo) se lanzan hasta 'hilos' tareas a la vez en el pool del
+    proceso: el OCR corre fuera del intérprete (proceso tesseract o librería C, con una sesión
+    por hilo), así que el GIL no las frena. El resultado es el mismo que en secuencia: se
+    queda el de mayor prioridad, aunque una de menor prioridad termine antes. Al conocerlo
+    se cancelan las tareas que no han empezado y no se espera a las que siguen en curso.
+    """
+    segundos = []
+    if hilos <= 1 or len(tareas) <= 1:
+        for indice, tarea in enumerate(tareas):
+            resultado, duracion = _cronometrar(tarea)
+            segundos.append(duracion)
+            if resultado is not None:
+                return indice, resultado, segundos
+        return None, None, segundos
+
+    executor = _pool(hilos)
+    futuros = [executor.submit(_cronometrar, tarea) for tarea in tareas[:hilos]]
+    try:
+        for indice in range(len(tareas)):
+            resultado, duracion = futuros[indice].result()
+            segundos.append(duracion)
+            if resultado is not None:
+                return indice, resultado, segundos
+            if len(futuros) < len(tareas): # Se liberó un lugar: entra la siguiente en prioridad
+                futuros.append(executor.submit(_cronometrar, tareas[len(futuros)]))
+        return None, None, segundos
+    finally:
+        for futuro in futuros:
+            futuro.cancel() # Solo cancela las que no han empezado; el pool sigue vivo para la siguiente foto
@@ -0,0 +1,137 @@
+import os
+import sys
+import time
+import pytesseract
+import ocr_motor
+
+import proceso1
+import reintentos
+import proceso4
+import proceso5
+import revalidacion
+
+# =========================================================================
+# 📌 PIPELINE EN PROCESO
+# =========================================================================
+# Ejecuta proceso1, reintentos y proceso5 como funciones dentro del mismo intérprete:
+# las librerías (cv2, numpy, PIL, pytesseract, pandas) se importan una sola vez
+# y las filas de resultados pasan de una etapa a la siguiente en memoria.
+# El CSV de resultados se escribe UNA sola vez al final (más las instantáneas
+# opcionales por etapa).
+
+CARPETA_SNAPSHOTS = 'snapshots_etapas'
+CSV_SALIDA = 'resultados_coordenadas.csv'
+
+
+def etapa_proceso1(ciudad, opciones):
+    """Etapa 1: OCR (o GPS en EXIF) de toda la carpeta de fotos; no recibe filas previas."""
+    return proceso1.procesar_carpeta(proceso1.CARPETA_IMAGENES, proceso1.PORCENTAJE_RECORTE, ciudad, exportar=False,
+                                     workers=opciones.workers, lote=opciones.lote,
+                                     usar_exif=not opciones.sin_exif, verificar_exif=opciones.verificar_exif,
+                                     incremental=not opciones.completo, hilos_especulativos=max(1, opciones.especulativo),
+                                     hilos_flujo=opciones.flujo)
+
+
+# Formato: (nombre_de_la_etapa, función que recibe (filas, ciudad, opciones) y devuelve las filas actualizadas)
+# 'opciones' son las opciones adicionales de proceso1 (ver proceso1.leer_opciones).
+ETAPAS = [
+    ("proceso1", lambda filas, ciudad, opciones: etapa_proceso1(ciudad, opciones)),
+    ("reintentos", lambda filas, ciudad, opciones: reintentos.procesar_fallas_csv(ciudad, filas=filas, exportar=False,
+                                                                                 estrategias=opciones.estrategias)),
+]
+
+
+def guardar_snapshot(filas, nombre_etapa):
+    """Guarda una instantánea CSV de las filas tal como quedaron al terminar la etapa."""
+    if not os.path.exists(CARPETA_SNAPSHOTS):
+        os.makedirs(CARPETA_SNAPSHOTS)
+    ruta_snapshot = os.path.join(CARPETA_SNAPSHOTS, f"resultados_{nombre_etapa}.csv")
+    proceso4.exportar_a_csv(filas, ruta_snapshot)
+
+
+def ejecutar_pipeline(ciudad, tesseract_path, snapshots=False, argumentos_proceso1=None):
+    """
+    Ejecuta todas las etapas en memoria. Devuelve True si terminó correctamente
+    y False si alguna etapa no pudo completarse. 'argumentos_proceso1' son las
+    opciones adicionales de proceso1 en formato de línea de comandos (ej. ['--workers', '8']).
+    """
+    opciones = proceso1.leer_opciones(argumentos_proceso1 or [])
+
+    # Configurar Tesseract y el motor OCR una sola vez para todas las etapas
+    pytesseract.pytesseract.tesseract_cmd = tesseract_path
+    print(f"[pipeline] Motor OCR: '{ocr_motor.seleccionar_motor(opciones.motor)}'")
+
+    if not os.path.exists('diagnostico_ocr'):
+        os.makedirs('diagnostico_ocr')
+
+    filas = None
+    for nombre_etapa, etapa in ETAPAS:
+        print(f"\n============================================================")
+        print(f"[{nombre_etapa}] >> INICIANDO EJECUCIÓN EN PROCESO...")
+        print(f"============================================================")
+
+        inicio = time.perf_counter()
+        filas = etapa(filas, ciudad, opciones)
+        if filas is None:
+            print(f"ERROR: [{nombre_etapa}] FALLÓ. Deteniendo el pipeline.")
+            return False
+
+        print(f"============================================================")
+        print(f"[{nombre_etapa}] >> EJECUCIÓN COMPLETADA en {time.perf_counter() - inicio:.1f} s ({len(filas)} registros)")
+
+        if snapshots:
+            guardar_snapshot(filas, nombre_etapa)
+
+    # ÚNICA ESCRITURA DEL CSV DE RESULTADOS
+    proceso4.exportar_a_csv(filas, CSV_SALIDA)
+
+    print(f"\n============================================================")
+    print(f"[proceso5] >> INICIANDO EJECUCIÓN EN PROCESO...")
+    print(f"============================================================")
+    if proceso5.procesar_archivos(filas_origen=filas) is None:
+        print("ERROR: [proceso5] FALLÓ. Deteniendo el pipeline.")
+        return False
+
+    return True
+
+
+def ejecutar_revalidacion(ciudad):
+    """
+    Modo --revalidar: sin OCR ni imágenes. Revalida las lecturas guardadas con las reglas y
+    rangos actuales (revalidacion.py) y vuelve a calcular las distancias (proceso5).
+    """
+    print(f"\n============================================================")
+    print(f"[revalidacion] >> REVALIDANDO LECTURAS GUARDADAS (sin OCR)...")
+    print(f"============================================================")
+    filas = revalidacion.revalidar(ciudad)
+    if filas is None:
+        print("ERROR: [revalidacion] FALLÓ. Deteniendo el pipeline.")
+        return False
+    if proceso5.procesar_archivos(filas_origen=filas) is None:
+        print("ERROR: [proceso5] FALLÓ. Deteniendo el pipeline.")
+        return False
+    return True
+
+
+if __name__ == '__main__':
+    try:
+        # sys.argv[1] es la Ciudad (Argumento 1)
+        # sys.argv[2] es la Ruta de Tesseract (Argumento 2)
+        # --snapshots (opcional) guarda el CSV intermedio de cada etapa
+        # El resto de opciones se entregan a proceso1 (ej. --workers N)
+        if len(sys.argv) < 3:
+            raise IndexError("Se esperaban los argumentos de CIUDAD y RUTA TESSERACT.")
+
+        ciudad_input = sys.argv[1].upper()
+        tesseract_path = sys.argv[2]
+        con_snapshots = '--snapshots' in sys.argv[3:]
+        argumentos_proceso1 = [arg for arg in sys.argv[3:] if arg != '--snapshots']
+
+        # Ejecutar desde el directorio de los scripts (igual que el orquestador)
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+        if not ejecutar_pipeline(ciudad_input, tesseract_path, snapshots=con_snapshots, argumentos_proceso1=argumentos_proceso1):
+            sys.exit(1)
+    except IndexError as e:
+        print(f"[pipeline.py] ERROR: {e}")
+        sys.exit(1)
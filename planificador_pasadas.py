@@ -0,0 +1,104 @@
+import os
+import csv
+import random
+
+# =========================================================================
+# 📌 ORDEN ADAPTATIVO DE PASADAS / ESTRATEGIAS
+# =========================================================================
+# Las pasadas de proceso1 (Otsu, CLAHE, Simple) y las estrategias de reintentos
+# se probaban siempre en el mismo orden, aunque en nuestras fotos unas aciertan
+# mucho más que otras y algunas cuestan el doble de OCR. Aquí se lleva, por
+# grupo y pasada, cuántas veces se intentó, cuántas veces fue la que dio las
+# coordenadas válidas (la que queda en Metodo_Extraccion) y el tiempo de OCR
+# acumulado. El orden se calcula por aciertos esperados por segundo de OCR:
+#     tasa = (exitos + PREVIO_EXITOS) / (intentos + PREVIO_INTENTOS) / costo_medio
+# Las pasadas sin historia toman la tasa y el costo previos, así que no quedan
+# enterradas. Con probabilidad EXPLORACION una pasada al azar se adelanta al
+# frente, para que las estadísticas de todas sigan al día.
+#
+# Como la primera extracción válida detiene la cascada, el orden solo cambia
+# cuántas llamadas a Tesseract se hacen por foto, no qué fotos se resuelven.
+
+ARCHIVO_ESTADISTICAS = 'estadisticas_pasadas.csv'
+CAMPOS_ESTADISTICAS = ['Grupo', 'Pasada', 'Intentos', 'Exitos', 'Segundos']
+PREVIO_EXITOS = 1.0 # Suavizado (Laplace) de la tasa de acierto
+PREVIO_INTENTOS = 2.0
+COSTO_PREVIO = 1.0 # Segundos de OCR supuestos para una pasada sin historia
+EXPLORACION = 0.10 # Fracción de fotos (o lotes) que adelantan una pasada al azar
+SEMILLA_EXPLORACION = 2024
+
+
+def cargar_estadisticas(ruta_estadisticas=ARCHIVO_ESTADISTICAS):
+    """Devuelve {(grupo, pasada): [intentos, exitos, segundos]}; vacío si no hay archivo."""
+    if not os.path.exists(ruta_estadisticas):
+        return {}
+    try:
+        with open(ruta_estadisticas, 'r', newline='', encoding='utf-8') as archivo_csv:
+            return {
+                (e['Grupo'], e['Pasada']): [int(e['Intentos']), int(e['Exitos']), float(e['Segundos'])]
+                for e in csv.DictReader(archivo_csv)
+            }
+    except Exception as e:
+        print(f"⚠️ No se pudieron leer las estadísticas de pasadas '{ruta_estadisticas}' ({e}). Se usará el orden fijo.")
+        return {}
+
+
+def guardar_estadisticas(estadisticas, ruta_estadisticas=ARCHIVO_ESTADISTICAS):
+    """Reescribe el archivo de estadísticas (reemplazo atómico)."""
+    try:
+        ruta_temporal = ruta_estadisticas + '.tmp'
+        with open(ruta_temporal, 'w', newline='', encoding='utf-8') as archivo_csv:
+            escritor = csv.writer(archivo_csv)
+            escritor.writerow(CAMPOS_ESTADISTICAS)
+            for (grupo, pasada), (intentos, exitos, segundos) in sorted(estadisticas.items()):
+                escritor.writerow([grupo, pasada, intentos, exitos, f"{segundos:.4f}"])
+        os.replace(ruta_temporal, ruta_estadisticas)
+    except Exception as e:
+        print(f"⚠️ No se pudieron escribir las estadísticas de pasadas '{ruta_estadisticas}'. {e}")
+
+
+def registrar(estadisticas, grupo, pasada, exito, segundos):
+    """Suma un intento de 'pasada' (y un acierto si fue la que dio las coordenadas válidas)."""
+    acumulado = estadisticas.setdefault((grupo, pasada), [0, 0, 0.0])
+    acumulado[0] += 1
+    acumulado[1] += 1 if exito else 0
+    acumulado[2] += segundos
+
+
+def sembrar_desde_historial(estadisticas, grupo, nombres, metodos):
+    """
+    Si el grupo aún no tiene estadísticas, toma los aciertos de los valores de
+    Metodo_Extraccion ya guardados (cada método termina con el nombre de la pasada
+    ganadora). Los intentos se suponen iguales al total de métodos reconocidos.
+    """
+    if any(clave[0] == grupo for clave in estadisticas):
+        return
+    aciertos = dict.fromkeys(nombres, 0)
+    for metodo in metodos:
+        for nombre in nombres:
+            if metodo and (metodo == nombre or metodo.endswith('_' + nombre)):
+                aciertos[nombre] += 1
+                break
+    total = sum(aciertos.values())
+    if total:
+        for nombre, exitos in aciertos.items():
+            estadisticas[(grupo, nombre)] = [total, exitos, total * COSTO_PREVIO]
+
+
+def tasa_esperada(estadisticas, grupo, pasada):
+    """Aciertos esperados por segundo de OCR de la pasada."""
+    intentos, exitos, segundos = estadisticas.get((grupo, pasada), (0, 0, 0.0))
+    costo_medio = segundos / intentos if intentos and segundos > 0 else COSTO_PREVIO
+    return (exitos + PREVIO_EXITOS) / (intentos + PREVIO_INTENTOS) / costo_medio
+
+
+def ordenar(grupo, nombres, estadisticas, semilla=None):
+    """
+    Devuelve 'nombres' ordenados por aciertos por segundo (los empates conservan el
+    orden original). 'semilla' hace reproducible la exploración de cada foto o lote.
+    """
+    orden = sorted(nombres, key=lambda nombre: -tasa_esperada(estadisticas or {}, grupo, nombre))
+    aleatorio = random.Random(f"{SEMILLA_EXPLORACION}:{semilla}")
+    if len(orden) > 1 and aleatorio.random() < EXPLORACION:
+        orden.insert(0, orden.pop(aleatorio.randrange(1, len(orden))))
+    return orden
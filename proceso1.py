@@ -5,8 +5,25 @@ import cv2
 import numpy as np 
 from PIL import Image
 import pytesseract
+import lector_imagenes # Lectura reducida de la franja inferior de cada foto
+import localizador_sello # Rectángulo ajustado del sello dentro de la franja (perfiles de proyección)
+import disposicion_sellos # Caja del sello aprendida por (ancho, alto, orientación) de la foto
+import planificador_pasadas # Orden de las pasadas por aciertos por segundo de OCR (historial)
+import grafo_preproceso # Pasos intermedios (gris, desenfoque, CLAHE...) calculados una vez por imagen
+import flujo_imagenes # Lectura, preprocesamiento y OCR solapados con colas acotadas (--flujo)
+import manifiesto # Ejecuciones incrementales: resultados de fotos sin cambios
+import almacen_resultados # Almacén SQLite de resultados (proceso2 ... proceso4 leen solo las fallas)
+import revalidacion # Coordenadas crudas del OCR por foto (revalidación sin OCR)
+import coordenadas_ocr # Lector único de coordenadas en el texto OCR (candidatos ordenados)
+import ocr_motor # Motor OCR compartido (pytesseract o libtesseract residente, lotes de imágenes --lote)
+import cache_ocr # Tiempo de OCR de cada pasada (con el costo original de los textos de la caché)
 from tqdm import tqdm # Importamos la librería tqdm para la barra de progreso
 import sys # 🛑 Necesario para leer argumentos de línea de comandos
+import random # Muestra para la verificación EXIF vs OCR
+import threading # Aprendizaje compartido entre los hilos de OCR del modo --flujo
+import argparse # Opciones adicionales (--workers, ...) después de CIUDAD y RUTA TESSERACT
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 
 # =========================================================================
 # 🛑 CONFIGURACIÓN DE TESSERACT OCR
@@ -52,6 +69,21 @@ RANGOS_CIUDADES = {
     'TOLUCA': (18.5, 20.5, -100.5, -98.5) 	 	 	 	
 }
 
+# =========================================================================
+# 📌 GPS EN EXIF (atajo antes del OCR)
+# =========================================================================
+# Muchas fotos traen la posición GPS en los metadatos EXIF además del sello.
+# Leer el encabezado EXIF toma microsegundos; si las coordenadas pasan la misma
+# validación que el OCR, la foto se marca CORRECTO sin hacer OCR.
+METODO_EXIF = 'EXIF_GPS' # Valor de Metodo_Extraccion para las filas resueltas por EXIF
+TAG_GPS_IFD = 0x8825 # GPSInfo
+TOLERANCIA_EXIF_OCR = 0.001 # Diferencia máxima (grados) para considerar que EXIF y OCR coinciden
+SEMILLA_MUESTRA_EXIF = 2024 # Muestra reproducible para --verificar-exif
+
+# 🛑 Rangos de magnitud de Longitud de México para la corrección W.
+LON_MIN_MEX_MAG = min(abs(LON_MIN_ESPERADA), abs(LON_MAX_ESPERADA)) # 86.0
+LON_MAX_MEX_MAG = max(abs(LON_MIN_ESPERADA), abs(LON_MAX_ESPERADA)) # 119.0
+
 def obtener_rangos_por_ciudad(ciudad):
     """Devuelve los rangos específicos para la ciudad."""
     return RANGOS_CIUDADES.get(ciudad.upper())
@@ -136,10 +168,10 @@ def validar_rango_proximidad(lat_dec, lon_dec, lat_min, lat_max, lon_min, lon_ma
 
 def exportar_a_csv(datos, nombre_archivo='resultados_coordenadas.csv'):
     """Exporta los resultados a un archivo CSV."""
-    campos = ['OT', 'Resto_Nombre', 'Latitud_Extraida', 'Longitud_Extraida', 'Latitud_Decimal', 'Longitud_Decimal', 'Estatus']
+    campos = ['OT', 'Resto_Nombre', 'Latitud_Extraida', 'Longitud_Extraida', 'Latitud_Decimal', 'Longitud_Decimal', 'Estatus', 'Metodo_Extraccion']
     try:
         with open(nombre_archivo, 'w', newline='', encoding='utf-8') as archivo_csv:
-            escritor = csv.DictWriter(archivo_csv, fieldnames=campos)
+            escritor = csv.DictWriter(archivo_csv, fieldnames=campos, restval='')
             escritor.writeheader()
             escritor.writerows(datos)
         print(f"\n✅ EXPORTACIÓN EXITOSA: Los resultados se guardaron en {nombre_archivo}")
@@ -158,136 +190,876 @@ def verificar_e_instalar_librerias():
         print(f"Ocurrió un error durante la verificación: {e}")
     print("--- Fin de la verificación ---\n")
 
-def reducir_escala_cv(img_cv, factor_escala):
+# --------------------------------------------------------------------------
+# II. LÓGICA DE EXTRACCIÓN Y PREPROCESAMIENTO
+# --------------------------------------------------------------------------
+
+# Aceptación por confianza: el OCR devuelve cada palabra con su caja y su confianza
+# (ocr_motor.reconocer_palabras, la misma llamada que el texto plano). Si las palabras de
+# las coordenadas son confiables se aceptan tal cual; si alguna está por debajo de
+# CONFIANZA_MINIMA_PALABRA se relee solo esa palabra (recorte ampliado, PSM de una palabra)
+# y la relectura se usa si cae en el rango de México, en lugar de seguir con las demás
+# pasadas o dejar la foto para reintentos. Si no hubo par de coordenadas solo se releen
+# las palabras con dígitos junto a una coordenada suelta (las únicas que pueden completar
+# el par); sin ninguna coordenada suelta no se relee nada.
+USAR_CONFIANZA_OCR = True
+CONFIANZA_MINIMA_PALABRA = 70.0 # Confianza de Tesseract (0 a 100)
+MAX_PALABRAS_RELECTURA = 4 # Tope de relecturas por imagen
+CONFIG_OCR_RELECTURA = '--psm 8'
+ESCALA_RELECTURA = 2.0
+MARGEN_RELECTURA = 4 # Píxeles alrededor de la caja de la palabra
+
+def reconocer_y_extraer(img_pil, config_ocr):
     """
-    Realiza una reducción de escala (downsampling) en la imagen. 
-    Esto mejora la velocidad y puede funcionar como filtro de ruido para el OCR.
+    Aplica OCR y el lector de coordenadas al objeto de imagen PIL. Devuelve (lat, lon, texto):
+    'texto' es el texto OCR del que se leyeron (se guarda para revalidar, ver revalidacion).
+    """
+    if USAR_CONFIANZA_OCR:
+        return reconocer_con_confianza(img_pil, config_ocr)
+    texto_extraido = ocr_motor.reconocer(img_pil, config_ocr=config_ocr)
+    return extraer_coordenadas_texto(texto_extraido) + (texto_extraido,)
+
+def extraer_coordenadas_texto(texto_extraido):
+    """
+    Coordenadas del texto devuelto por el OCR: el candidato más creíble (rango de México) de
+    coordenadas_ocr, que revisa en una pasada todos los formatos (decimal, signo, cardinal, DMS).
+    """
+    candidato = coordenadas_ocr.mejor_candidato(texto_extraido)
+    if candidato is None:
+        return None, None
+    return candidato[0], candidato[1]
+
+def extraer_coordenadas_palabras(textos):
+    """
+    Aplica el lector de coordenadas al texto de las palabras unidas con espacios. Devuelve
+    (lat, lon, indices): 'indices' son las palabras que forman las coordenadas (vacío si no hubo).
+    """
+    candidato = coordenadas_ocr.mejor_candidato(' '.join(textos))
+    if candidato is None:
+        return None, None, []
+    return candidato[0], candidato[1], palabras_en_tramos(textos, candidato[4])
+
+def palabras_en_tramos(textos, tramos):
+    """Índices de las palabras (unidas con espacios) que tocan alguno de los 'tramos' (inicio, fin) del texto."""
+    indices, inicio = [], 0
+    for k, texto in enumerate(textos):
+        fin = inicio + len(texto)
+        if any(inicio < fin_tramo and inicio_tramo < fin for inicio_tramo, fin_tramo in tramos):
+            indices.append(k)
+        inicio = fin + 1
+    return indices
+
+def palabras_para_completar(textos):
+    """
+    Sin par de coordenadas: las palabras con dígitos justo antes o después de una coordenada
+    suelta, que son las que al releerse pueden completar el par. Vacío si no hay ninguna suelta.
+    """
+    sueltas = set(palabras_en_tramos(textos, coordenadas_ocr.tramos_coordenadas(' '.join(textos))))
+    vecinas = {k + paso for k in sueltas for paso in (-1, 1)}
+    return [k for k in sorted(vecinas - sueltas) if 0 <= k < len(textos) and any(c.isdigit() for c in textos[k])]
+
+def en_rango_esperado(lat_ext, lon_ext):
+    """Aceptación rápida: latitud en el rango de México y magnitud de la longitud también (con o sin W)."""
+    lat_dec = convertir_a_decimal(lat_ext)
+    lon_dec = convertir_a_decimal(lon_ext)
+    if lat_dec is None or lon_dec is None:
+        return False
+    return LAT_MIN_ESPERADA <= lat_dec <= LAT_MAX_ESPERADA and LON_MIN_MEX_MAG <= abs(lon_dec) <= LON_MAX_MEX_MAG
+
+def releer_palabra(img, palabra):
+    """Vuelve a reconocer solo la caja de una palabra (ampliada); devuelve (texto, confianza)."""
+    _, izquierda, arriba, ancho, alto, confianza, texto = palabra
+    alto_img, ancho_img = img.shape[:2]
+    recorte = img[max(0, arriba - MARGEN_RELECTURA):min(alto_img, arriba + alto + MARGEN_RELECTURA),
+                  max(0, izquierda - MARGEN_RELECTURA):min(ancho_img, izquierda + ancho + MARGEN_RELECTURA)]
+    if not recorte.size:
+        return texto, confianza
+    recorte = cv2.resize(recorte, None, fx=ESCALA_RELECTURA, fy=ESCALA_RELECTURA, interpolation=cv2.INTER_CUBIC)
+    relectura = ocr_motor.reconocer_palabras(Image.fromarray(recorte), config_ocr=CONFIG_OCR_RELECTURA)
+    if not relectura:
+        return texto, confianza
+    return ''.join(p[6] for p in relectura), min(p[5] for p in relectura)
+
+def reconocer_con_confianza(img_pil, config_ocr):
+    """
+    OCR con datos por palabra. Si todas las palabras de las coordenadas son confiables se
+    aceptan sin más llamadas; si no, relee solo las palabras dudosas (las de las coordenadas
+    o, si no hubo par, las que pueden completarlo: ver palabras_para_completar) y se queda
+    con la nueva lectura si cae en el rango esperado (o si antes no había coordenadas).
+    Devuelve (lat, lon, texto), con 'texto' las palabras (releídas o no) de las que salieron.
+    """
+    palabras = ocr_motor.reconocer_palabras(img_pil, config_ocr=config_ocr)
+    textos = [p[6] for p in palabras]
+    lat, lon, indices = extraer_coordenadas_palabras(textos)
+    if lat is None:
+        indices = palabras_para_completar(textos)
+    dudosas = [k for k in indices if palabras[k][5] < CONFIANZA_MINIMA_PALABRA][:MAX_PALABRAS_RELECTURA]
+    if not dudosas:
+        return lat, lon, ' '.join(textos) # Sin palabras dudosas no hay nada que releer
+
+    img = np.asarray(img_pil)
+    texto_original = ' '.join(textos)
+    for k in dudosas:
+        texto, confianza = releer_palabra(img, palabras[k])
+        if confianza > palabras[k][5]:
+            textos[k] = texto
+    lat_releida, lon_releida, _ = extraer_coordenadas_palabras(textos)
+    if lat_releida is not None and (lat is None or en_rango_esperado(lat_releida, lon_releida)):
+        return lat_releida, lon_releida, ' '.join(textos)
+    return lat, lon, texto_original
+
+# Pasadas del Intento 1, en orden: (nombre, nodo de grafo_preproceso). Los nodos se piden
+# al grafo de la imagen en gris ya reducida de escala (la reducción se hace al leer la
+# foto, ver cargar_recorte), así que el gris y sus pasos intermedios se calculan una vez.
+PASADAS_INTENTO1 = [
+    ('Otsu', 'otsu_inv_desenfoque'), # PASO 1: Procesamiento Estándar (desenfoque + Otsu)
+    ('CLAHE', 'otsu_inv_clahe_3'), # PASO 2: Alto Contraste (CLAHE + desenfoque + Otsu)
+    ('Simple', 'umbral_simple_inv'), # PASO 3: Umbralización Simple
+]
+
+# Intento 0: el recorte del sello se binariza con el nodo de la pasada Otsu
+NODO_SELLO = 'otsu_inv_desenfoque'
+
+# El orden real lo decide planificador_pasadas con el historial de aciertos y costo de cada pasada
+GRUPO_PASADAS = 'proceso1'
+NOMBRES_PASADAS_INTENTO1 = [nombre for nombre, _ in PASADAS_INTENTO1]
+CONFIG_OCR_INTENTO1 = '--psm 3'
+CONFIG_OCR_INTENTO2 = '--psm 8'
+
+# Intento 0: solo el rectángulo del sello (ver localizador_sello), con PSM de una línea.
+# Si el bloque tiene varias líneas se usa PSM 6 (bloque uniforme de texto).
+USAR_LOCALIZADOR_SELLO = True
+# Modo --lote: los recortes del sello de todo el lote se reconocen en un mosaico (una sola llamada,
+# ver ocr_motor.reconocer_mosaico); los que no dan coordenadas se reconocen aparte como antes.
+USAR_MOSAICO_SELLOS = True
+CONFIG_OCR_SELLO_LINEA = '--psm 7'
+CONFIG_OCR_SELLO_BLOQUE = '--psm 6'
+# Campo interno de la fila con la caja del sello que dio coordenadas válidas: (geometría, caja, config).
+# analizar_imagenes lo retira de la fila y lo aprende en disposicion_sellos.
+CAMPO_SELLO = '_sello'
+# Campo interno con las pasadas del Intento 1 probadas: [(nombre, segundos_ocr, exito)].
+# analizar_imagenes lo retira de la fila y lo suma en planificador_pasadas.
+CAMPO_PASADAS = '_pasadas'
+# Campo interno con las coordenadas crudas del OCR (antes de corrección y W) y los textos OCR
+# probados en orden: (lat, lon, metodo, [(intento, texto)]); '' en las coordenadas si ningún
+# texto dio un par. analizar_imagenes lo retira de la fila y lo guarda en las lecturas de revalidacion.
+CAMPO_LECTURA = '_lectura'
+
+# Modo --flujo: imágenes que caben en cada cola entre etapas (lectura -> preprocesamiento -> OCR).
+# Con la contrapresión nunca hay más de 2 x TAMANO_COLA_FLUJO + hilos imágenes decodificadas en memoria.
+TAMANO_COLA_FLUJO = 8
+
+def preparar_sello(gris, disposicion=None):
+    """
+    Intento 0: recorte del sello binarizado (Otsu), su configuración de OCR y su caja
+    relativa a la franja. Con 'disposicion' (aprendida para la geometría de la foto) se
+    usa esa caja; si no, se localiza. Devuelve (None, None, None) si no hay sello claro.
+    """
+    if disposicion is not None:
+        recorte = disposicion_sellos.recortar_aprendido(gris, disposicion)
+        if recorte is None:
+            return None, None, None
+        return grafo_preproceso.nodo({'gris': recorte}, NODO_SELLO), disposicion[4], disposicion[:4]
+    if not USAR_LOCALIZADOR_SELLO:
+        return None, None, None
+    caja = localizador_sello.localizar_sello(gris)
+    if caja is None:
+        return None, None, None
+    x0, y0, x1, y1, numero_lineas = caja
+    config_ocr = CONFIG_OCR_SELLO_LINEA if numero_lineas == 1 else CONFIG_OCR_SELLO_BLOQUE
+    return grafo_preproceso.nodo({'gris': gris[y0:y1, x0:x1]}, NODO_SELLO), config_ocr, disposicion_sellos.caja_relativa((x0, y0, x1, y1), gris.shape)
+
+def preparar_sellos(gris, disposicion=None):
+    """
+    Recortes del Intento 0 en orden de prueba: la caja aprendida para la geometría de la
+    foto (si hay) y el sello localizado. Lista de (img_sello, config, caja_relativa).
+    """
+    sellos = []
+    for disposicion_intento in ([disposicion, None] if disposicion is not None else [None]):
+        img_sello, config_sello, caja_rel = preparar_sello(gris, disposicion_intento)
+        if img_sello is not None:
+            sellos.append((img_sello, config_sello, caja_rel))
+    return sellos
+
+def textos_hasta(probados, segundos):
+    """Textos [(intento, texto)] de las tareas hasta la elegida por primer_resultado (tantas como 'segundos'), en orden."""
+    return [probados[posicion] for posicion in range(len(segundos)) if posicion in probados]
+
+def tarea_sello(img_sello, config_sello, caja_rel, probados=None, posicion=0):
+    """
+    Tarea del Intento 0: (lat, lon, (caja_relativa, config)) si el sello dio coordenadas, si no
+    None. El texto OCR queda en probados[posicion] (ver textos_hasta).
+    """
+    def tarea():
+        lat, lon, texto = reconocer_y_extraer(Image.fromarray(img_sello), config_ocr=config_sello)
+        if probados is not None:
+            probados[posicion] = ('Sello', texto)
+        return (lat, lon, (caja_rel, config_sello)) if lat and lon else None
+    return tarea
+
+def tarea_pasada(grafo, nombre_pasada, probados=None, posicion=0):
+    """Tarea del Intento 1: (lat, lon, None) si la pasada dio coordenadas, si no None (texto en probados[posicion])."""
+    def tarea():
+        img_pil = Image.fromarray(grafo_preproceso.nodo(grafo, dict(PASADAS_INTENTO1)[nombre_pasada]))
+        lat, lon, texto = reconocer_y_extraer(img_pil, config_ocr=CONFIG_OCR_INTENTO1)
+        if probados is not None:
+            probados[posicion] = (nombre_pasada, texto)
+        return (lat, lon, None) if lat and lon else None
+    return tarea
+
+def intento1_multiple_passes(img_cv_escalada, disposicion=None, orden_pasadas=None, hilos_especulativos=1, grafo=None, sellos=None,
+                             textos=None):
+    """
+    Intenta la extracción con múltiples técnicas de preprocesamiento sobre el
+    recorte ya reducido de escala (FACTOR_ESCALA_OCR). Devuelve (lat, lon, sello, intentos):
+    'sello' es (caja_relativa, config) si las coordenadas salieron del recorte del sello e
+    'intentos' la lista [(pasada, segundos)] de las pasadas probadas, en el orden
+    'orden_pasadas' (por defecto el de PASADAS_INTENTO1); la última es la que extrajo.
+    Con hilos_especulativos > 1 las pasadas del Intento 1 se prueban varias a la vez (ver
+    ocr_motor.primer_resultado); el Intento 0 sigue en secuencia porque es un solo OCR barato
+    que resuelve la mayoría de las fotos: solo las difíciles pagan la CPU extra.
+    'grafo' y 'sellos' son los que ya dejó listos la etapa de preprocesamiento (preprocesar_imagen).
+    A la lista 'textos' (si se da) se agregan los textos OCR probados [(intento, texto)], en orden.
     """
-    if img_cv is None or img_cv.size == 0:
-        return None
-    
-    nuevo_ancho = int(img_cv.shape[1] * factor_escala)
-    nuevo_alto = int(img_cv.shape[0] * factor_escala)
     
-    img_redimensionada = cv2.resize(img_cv, (nuevo_ancho, nuevo_alto), interpolation=cv2.INTER_LINEAR)
+    # 1. CONVERSIÓN A GRIS (la reducción de escala ya se hizo al decodificar); los pasos
+    # intermedios de las pasadas quedan en el grafo de la imagen
+    if grafo is None:
+        grafo = grafo_preproceso.nuevo_grafo(img_cv_escalada)
+    if sellos is None:
+        sellos = preparar_sellos(grafo_preproceso.nodo(grafo, 'gris'), disposicion)
+
+    # 2. INTENTO 0: solo el sello (caja aprendida para esta geometría y, si falla, localizada)
+    probados = {}
+    _, resultado, segundos = ocr_motor.primer_resultado([tarea_sello(*sello, probados, k) for k, sello in enumerate(sellos)])
+    if textos is not None:
+        textos.extend(textos_hasta(probados, segundos))
+    if resultado is not None:
+        return resultado + ([],)
+
+    # 3. INTENTO 1: las pasadas completas, en el orden del planificador
+    nombres_pasadas = list(orden_pasadas or NOMBRES_PASADAS_INTENTO1)
+    probados = {}
+    _, resultado, segundos = ocr_motor.primer_resultado([tarea_pasada(grafo, nombre_pasada, probados, k)
+                                                         for k, nombre_pasada in enumerate(nombres_pasadas)], hilos_especulativos)
+    if textos is not None:
+        textos.extend(textos_hasta(probados, segundos))
+    intentos = list(zip(nombres_pasadas, segundos))
+    if resultado is None:
+        return None, None, None, intentos
+    return resultado + (intentos,)
+
+def preparar_roi_detallado(img_cv, roi_coords):
+    """Recorta un ROI (ajustado al tamaño de la imagen) y aplica el preprocesamiento AVANZADO."""
+    x_start, y_start, x_end, y_end = roi_coords
+
+    # Asegura que las coordenadas del ROI sean válidas para la imagen recortada
+    height, width = img_cv.shape[:2]
+    x_start = min(x_start, width)
+    x_end = min(x_end, width)
+    y_start = min(y_start, height)
+    y_end = min(y_end, height)
     
-    return img_redimensionada
+    # Recorte
+    img_recortada = img_cv[y_start:y_end, x_start:x_end] 
+
+    # Preprocesamiento AVANZADO
+    gris = cv2.cvtColor(img_recortada, cv2.COLOR_BGR2GRAY)
+    clahe = cv2.createCLAHE(clipLimit=4.0, tileGridSize=(8,8)) 
+    contraste_mejorado = clahe.apply(gris)
+    desenfoque = cv2.GaussianBlur(contraste_mejorado, (5, 5), 0)
+    img_binaria = cv2.adaptiveThreshold(desenfoque, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
+                                        cv2.THRESH_BINARY_INV, 11, 2)
+    kernel = np.ones((1,1), np.uint8) 
+    return cv2.dilate(img_binaria, kernel, iterations=1)
+
+def guardar_diagnostico_fallo(ruta_imagen, img_pil):
+    """Guarda la última imagen procesada de una foto sin coordenadas en 'diagnostico_ocr'."""
+    try:
+        ruta_salida = os.path.join('diagnostico_ocr', f"FALLO_FINAL_{os.path.basename(ruta_imagen)}")
+        img_pil.save(ruta_salida)
+    except Exception as save_err:
+        pass
+
+
+def intento2_fallback_detallado(ruta_imagen, img_cv, hilos_especulativos=1, textos=None):
+    """
+    Prueba múltiples ROIs *sin* reducción de escala, en la imagen recortada.
+    Con hilos_especulativos > 1 se prueban varios a la vez (ver ocr_motor.primer_resultado).
+    A la lista 'textos' (si se da) se agregan los textos OCR probados [(intento, texto)], en orden.
+    """
+    imagenes_roi = {} # indice -> imagen enviada al OCR (la del último ROI es el diagnóstico)
+    probados = {} # indice -> (intento, texto OCR)
+
+    def tarea_roi(i, roi_coords):
+        def tarea():
+            try:
+                img_binaria = preparar_roi_detallado(img_cv, roi_coords)
+                imagenes_roi[i] = img_pil = Image.fromarray(img_binaria)
+                lat, lon, texto = reconocer_y_extraer(img_pil, config_ocr=CONFIG_OCR_INTENTO2)
+                probados[i] = (f"ROI{i + 1}", texto)
+            except Exception as e:
+                return None
+            return (lat, lon) if lat and lon else None
+        return tarea
+
+    _, resultado, segundos = ocr_motor.primer_resultado([tarea_roi(i, roi) for i, roi in enumerate(ROI_LISTA)], hilos_especulativos)
+    if textos is not None:
+        textos.extend(textos_hasta(probados, segundos))
+    if resultado is not None:
+        return resultado
+
+    if len(ROI_LISTA) - 1 in imagenes_roi:
+        guardar_diagnostico_fallo(ruta_imagen, imagenes_roi[len(ROI_LISTA) - 1])
+    return None, None
 
 # --------------------------------------------------------------------------
-# II. LÓGICA DE EXTRACCIÓN Y PREPROCESAMIENTO
+# III. FUNCIÓN PRINCIPAL DE EJECUCIÓN (CON RECORTE DINÁMICO)
 # --------------------------------------------------------------------------
 
-def reconocer_y_extraer(img_pil, config_ocr):
-    """Aplica OCR y la Regex flexible al objeto de imagen PIL."""
-    texto_extraido = pytesseract.image_to_string(img_pil, lang='eng', config=config_ocr)
-    
-    patron_coordenadas = re.compile(
-        r'(-?\d{1,2}[.,]\d{1,}[NWSE]?)[\s,-]*(-?\d{1,3}[.,]\d{1,}[NWSE]?)', 
-        re.IGNORECASE 
-    )
+def fila_no_encontrada(ot, resto_nombre):
+    """Fila de CSV para una imagen sin coordenadas (error de lectura o fallo de OCR)."""
+    return {
+        'OT': ot, 'Resto_Nombre': resto_nombre, 'Latitud_Extraida': 'FALLO', 
+        'Longitud_Extraida': 'FALLO', 'Latitud_Decimal': '', 
+        'Longitud_Decimal': '', 'Estatus': "NO ENCONTRADO"
+    }
+
+def cargar_recorte(nombre_archivo_con_ext, carpeta_path, recorte_porcentaje, escala=1.0):
+    """
+    Lee solo el recorte dinámico del porcentaje inferior, decodificado a la 'escala' pedida.
+    Devuelve (ot, resto_nombre, ruta_completa, img_cv_recortada); el recorte es None
+    si la imagen no se pudo cargar o quedó vacía (el fallo ya se reportó en consola).
+    """
+    ruta_completa = os.path.join(carpeta_path, nombre_archivo_con_ext)
+    nombre_archivo_base = os.path.splitext(nombre_archivo_con_ext)[0]
     
-    texto_limpio = texto_extraido.replace('\n', ' ').strip()
-    match = patron_coordenadas.search(texto_limpio)
+    ot, resto_nombre = separar_por_posicion(nombre_archivo_base.strip())
     
-    if match:
-        lat = match.group(1).replace(',', '.')
-        lon = match.group(2).replace(',', '.')
-        return lat.upper(), lon.upper()
-    else:
-        return None, None
+    try:
+        # RECORTE DINÁMICO (30% inferior), decodificado a escala reducida si se pide
+        img_cv_recortada = lector_imagenes.cargar_franja_inferior(ruta_completa, recorte_porcentaje, escala=escala)
+        if img_cv_recortada is None:
+            # 🛑 ERROR DE LECTURA CRÍTICO
+            tqdm.write(f"❌ Error de lectura en {nombre_archivo_con_ext}: No se pudo cargar la imagen.")
+            raise FileNotFoundError("No se pudo cargar la imagen.")
+    except Exception as e:
+        # Ya se escribió el error, solo se añade el registro de fallo
+        # 🛑 REGISTRO DE FALLO EN CONSOLA (Error de lectura)
+        tqdm.write(f"❌ Fallo OCR: OT:{ot} Elem:{resto_nombre}: Error al cargar la imagen.")
+        return ot, resto_nombre, ruta_completa, None
+
+    if img_cv_recortada.size == 0:
+        tqdm.write(f"⚠️ {ot} La imagen recortada está vacía. Saltando.")
+        return ot, resto_nombre, ruta_completa, None
+
+    return ot, resto_nombre, ruta_completa, img_cv_recortada
 
-def intento1_multiple_passes(img_cv_original):
+def construir_fila(ot, resto_nombre, lat_ext, lon_ext, rangos_especificos, rango_proximidad, textos=()):
     """
-    Intenta la extracción con múltiples técnicas de preprocesamiento,
-    aplicando primero la reducción de escala.
+    Aplica la corrección heurística, el ajuste W y la validación contextual, y arma la fila del CSV.
+    'textos' son los textos OCR probados [(intento, texto)]; van con la lectura (CAMPO_LECTURA).
     """
+    lat_min, lat_max, lon_min, lon_max = rango_proximidad
+
+    # -------------------------------------------------------------
+    # PREPARACIÓN DE DATOS PARA CSV Y VALIDACIÓN CONTEXTUAL
+    # -------------------------------------------------------------
     
-    # 1. APLICAR REDUCCIÓN DE ESCALA
-    img_cv = reducir_escala_cv(img_cv_original, FACTOR_ESCALA_OCR)
-    if img_cv is None: return None, None
+    estado = "NO ENCONTRADO"
+    lat_dec_guardar = ''
+    lon_dec_guardar = ''
+
+    if not (lat_ext and lon_ext):
+        # Estatus si NO SE DETECTÓ nada
+        # 🛑 REGISTRO DE FALLO EN CONSOLA (Fallo de Detección OCR)
+        tqdm.write(f"❌ Fallo OCR: OT:{ot} Elem:{resto_nombre}: No se detectaron coordenadas.")
+        fila = fila_no_encontrada(ot, resto_nombre)
+        if textos:
+            fila[CAMPO_LECTURA] = ('', '', '', list(textos)) # Sin par, pero con texto que revalidar
+        return fila
+    lectura = (lat_ext, lon_ext, '', list(textos))
+        
+    # APLICAR CORRECCIÓN HEURÍSTICA (dígito inicial)
+    lat_ext, lon_ext = corregir_latitud_ocr(lat_ext, lon_ext, rangos_especificos)
     
-    gris = cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY)
+    # 🛑 INICIO: LÓGICA DE AJUSTE DE LONGITUD (W) 🛑
+    # Usamos el rango amplio de México para forzar W si falta el signo
+    lon_temp = lon_ext.strip().upper()
+    lon_str_check = re.sub(r'[^0-9.]', '', lon_temp.replace(',', '.')).strip()
     
-    # PASO 1: Procesamiento Estándar (Otsu)
-    desenfoque = cv2.GaussianBlur(gris, (5, 5), 0)
-    _, img_binaria_otsu = cv2.threshold(desenfoque, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
-    img_pil_otsu = Image.fromarray(img_binaria_otsu)
-    lat, lon = reconocer_y_extraer(img_pil_otsu, config_ocr='--psm 3')
-    if lat and lon: return lat, lon
-
-    # PASO 2: Procesamiento de Alto Contraste (CLAHE)
-    clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
-    contraste_mejorado = clahe.apply(gris) 
-    desenfoque_clahe = cv2.GaussianBlur(contraste_mejorado, (5, 5), 0)
-    _, img_binaria_clahe = cv2.threshold(desenfoque_clahe, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
-    img_pil_clahe = Image.fromarray(img_binaria_clahe)
-    lat, lon = reconocer_y_extraer(img_pil_clahe, config_ocr='--psm 3')
-    if lat and lon: return lat, lon
+    if lon_str_check and not re.search(r'[NWSE-]', lon_temp):
+        try:
+            valor_lon = float(lon_str_check)
+            
+            # USAR RANGO GLOBAL DE MÉXICO PARA EL CONTEXTO W
+            if LON_MIN_MEX_MAG <= valor_lon <= LON_MAX_MEX_MAG: 
+                lon_ext += 'W' # Agregamos W para forzar la conversión a negativo
+                tqdm.write(f" 	⚙️ AJUSTE DE CONTEXTO GLOBAL: Longitud '{lon_temp}' ajustada a '{lon_ext}' (W forzada, magnitud en rango México).")
+        except ValueError:
+            pass
+    # 🛑 FIN: LÓGICA DE AJUSTE 🛑
+
+    lat_dec = convertir_a_decimal(lat_ext)
+    lon_dec = convertir_a_decimal(lon_ext)
     
-    # PASO 3: Umbralización Simple
-    _, img_binaria_simple = cv2.threshold(gris, 127, 255, cv2.THRESH_BINARY_INV)
-    img_pil_simple = Image.fromarray(img_binaria_simple)
-    lat, lon = reconocer_y_extraer(img_pil_simple, config_ocr='--psm 3')
-    if lat and lon: return lat, lon
+    # VALIDACIÓN 1: Rango Geográfico Estándar & Rango de Proximidad
+    es_valido = validar_rango_geografico(lat_dec, lon_dec)
+    es_proximo = validar_rango_proximidad(lat_dec, lon_dec, lat_min, lat_max, lon_min, lon_max)
+    
+
+    if es_valido and es_proximo:
         
-    return None, None
+        # CORRECTO: Pasó todas las validaciones (MUNDIAL + PROXIMIDAD)
+        estado = "CORRECTO" 
+        lat_dec_guardar = lat_dec
+        lon_dec_guardar = lon_dec
+        
+    else:
+        # Fallo en Validación (No es mundialmente válido o NO es próximo a la ciudad)
+        # 🛑 REGISTRO DE FALLO EN CONSOLA (Fallo de Validación)
+        tqdm.write(f"❌ Fallo Valid: OT:{ot} Elem:{resto_nombre}: {lat_ext}, {lon_ext} (Fuera de Rango/Proximidad)")
+        # Si falla, no guardamos los decimales para que sean reprocesados
+        
+    return {
+        'OT': ot,
+        'Resto_Nombre': resto_nombre,
+        'Latitud_Extraida': lat_ext,
+        'Longitud_Extraida': lon_ext,
+        'Latitud_Decimal': lat_dec_guardar,
+        'Longitud_Decimal': lon_dec_guardar,
+        'Estatus': estado,
+        CAMPO_LECTURA: lectura
+    }
 
+def anotar_sello(fila, geometria, sello):
+    """Deja en la fila (CAMPO_SELLO) la caja del sello si dio coordenadas válidas, para aprenderla."""
+    if sello is not None and geometria is not None and fila['Estatus'] == "CORRECTO":
+        fila[CAMPO_SELLO] = (geometria, sello[0], sello[1])
+    return fila
 
-def intento2_fallback_detallado(ruta_imagen, img_cv):
+def anotar_pasadas(fila, intentos, extrajo):
     """
-    Prueba múltiples ROIs *sin* reducción de escala, en la imagen recortada.
+    Deja en la fila (CAMPO_PASADAS) las pasadas probadas; cuenta como acierto la última
+    solo si fue la que extrajo y la fila quedó CORRECTO (es la que se habría registrado como método).
+    """
+    if intentos:
+        exito_final = extrajo and fila['Estatus'] == "CORRECTO"
+        fila[CAMPO_PASADAS] = [(nombre, segundos, exito_final and n == len(intentos) - 1)
+                               for n, (nombre, segundos) in enumerate(intentos)]
+    return fila
+
+# --- Etapas de una imagen: lectura (disco) -> preprocesamiento (OpenCV) -> OCR (Tesseract) ---
+# procesar_imagen las encadena; el modo --flujo (flujo_imagenes) las ejecuta solapadas.
+
+def leer_imagen(nombre_archivo_con_ext, carpeta_path, recorte_porcentaje):
+    """
+    Etapa de lectura: decodifica el recorte ya reducido de escala y lee la geometría del
+    encabezado. Devuelve (nombre, ot, resto_nombre, ruta_completa, img_cv_escalada, geometria);
+    la imagen es None si no se pudo cargar.
+    """
+    ot, resto_nombre, ruta_completa, img_cv_escalada = cargar_recorte(nombre_archivo_con_ext, carpeta_path, recorte_porcentaje,
+                                                                      escala=FACTOR_ESCALA_OCR)
+    geometria = disposicion_sellos.geometria_imagen(ruta_completa) if img_cv_escalada is not None else None
+    return nombre_archivo_con_ext, ot, resto_nombre, ruta_completa, img_cv_escalada, geometria
+
+def preprocesar_imagen(leida, disposiciones=None):
+    """
+    Etapa de preprocesamiento: grafo de la imagen con su gris y los recortes del sello
+    del Intento 0 (caja aprendida y sello localizado). Devuelve 'leida' + (grafo, sellos,
+    disposicion); las pasadas del Intento 1 se calculan en la etapa de OCR solo si hacen falta.
+    """
+    img_cv_escalada, geometria = leida[4], leida[5]
+    if img_cv_escalada is None:
+        return leida + (None, None, None)
+    grafo = grafo_preproceso.nuevo_grafo(img_cv_escalada)
+    disposicion = (disposiciones or {}).get(geometria)
+    return leida + (grafo, preparar_sellos(grafo_preproceso.nodo(grafo, 'gris'), disposicion), disposicion)
+
+def reconocer_imagen(preprocesada, recorte_porcentaje, rangos_especificos, rango_proximidad, disposiciones=None, estadisticas=None,
+                     hilos_especulativos=1):
+    """
+    Etapa de OCR: los intentos en cascada y la validación contextual. Devuelve la fila para el CSV.
+    Si mientras la imagen esperaba en la cola se aprendió otra caja del sello para su geometría
+    (modo --flujo), los recortes del sello se rehacen con ella.
     """
+    nombre_archivo_con_ext, ot, resto_nombre, ruta_completa, img_cv_escalada, geometria, grafo, sellos, disposicion = preprocesada
+    if img_cv_escalada is None:
+        return fila_no_encontrada(ot, resto_nombre)
+    disposicion_actual = (disposiciones or {}).get(geometria)
+    if disposicion_actual is not None and disposicion_actual != disposicion:
+        sellos = preparar_sellos(grafo_preproceso.nodo(grafo, 'gris'), disposicion_actual)
+
+    # INTENTO 0 + INTENTO 1: sello (aprendido o localizado) y Multi-Pass con Reducción de Escala
+    orden_pasadas = planificador_pasadas.ordenar(GRUPO_PASADAS, NOMBRES_PASADAS_INTENTO1, estadisticas, semilla=nombre_archivo_con_ext)
+    textos = [] # Textos OCR probados, en orden (se guardan para revalidar)
+    lat_ext, lon_ext, sello, intentos = intento1_multiple_passes(img_cv_escalada, orden_pasadas=orden_pasadas,
+                                                                 hilos_especulativos=hilos_especulativos, grafo=grafo, sellos=sellos,
+                                                                 textos=textos)
+    extrajo_intento1 = lat_ext is not None
     
-    for i, roi_coords in enumerate(ROI_LISTA):
-        x_start, y_start, x_end, y_end = roi_coords
-        
-        try:
-            # Asegura que las coordenadas del ROI sean válidas para la imagen recortada
-            height, width = img_cv.shape[:2]
-            x_start = min(x_start, width)
-            x_end = min(x_end, width)
-            y_start = min(y_start, height)
-            y_end = min(y_end, height)
-            
-            # Recorte
-            img_recortada = img_cv[y_start:y_end, x_start:x_end] 
-
-            # Preprocesamiento AVANZADO
-            gris = cv2.cvtColor(img_recortada, cv2.COLOR_BGR2GRAY)
-            clahe = cv2.createCLAHE(clipLimit=4.0, tileGridSize=(8,8)) 
-            contraste_mejorado = clahe.apply(gris)
-            desenfoque = cv2.GaussianBlur(contraste_mejorado, (5, 5), 0)
-            img_binaria = cv2.adaptiveThreshold(desenfoque, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                                                cv2.THRESH_BINARY_INV, 11, 2)
-            kernel = np.ones((1,1), np.uint8) 
-            img_binaria = cv2.dilate(img_binaria, kernel, iterations=1)
-
-            img_pil = Image.fromarray(img_binaria)
-            
-            lat, lon = reconocer_y_extraer(img_pil, config_ocr='--psm 8')
+    # INTENTO 2: Fallback con ROIs predefinidos (a resolución completa: solo ahora se decodifica)
+    if lat_ext is None:
+        img_cv_recortada = lector_imagenes.cargar_franja_inferior(ruta_completa, recorte_porcentaje)
+        if img_cv_recortada is not None:
+            lat_ext, lon_ext = intento2_fallback_detallado(ruta_completa, img_cv_recortada, hilos_especulativos, textos)
+
+    fila = construir_fila(ot, resto_nombre, lat_ext, lon_ext, rangos_especificos, rango_proximidad, textos)
+    return anotar_pasadas(anotar_sello(fila, geometria, sello), intentos, extrajo_intento1)
+
+def procesar_imagen(nombre_archivo_con_ext, carpeta_path, recorte_porcentaje, rangos_especificos, rango_proximidad, disposiciones=None,
+                    estadisticas=None, hilos_especulativos=1):
+    """
+    Procesa UNA imagen (lectura, recorte dinámico, dos intentos y validación contextual)
+    y devuelve su fila para el CSV. Es una función de módulo para poder ejecutarse tanto
+    en el bucle secuencial como en los procesos trabajadores (--workers).
+    'disposiciones' son las cajas de sello aprendidas (ver disposicion_sellos) y 'estadisticas'
+    el historial de las pasadas que decide su orden (ver planificador_pasadas). Con
+    hilos_especulativos > 1 las pasadas de cada intento se lanzan varias a la vez (--especulativo).
+    """
+    leida = leer_imagen(nombre_archivo_con_ext, carpeta_path, recorte_porcentaje)
+    return reconocer_imagen(preprocesar_imagen(leida, disposiciones), recorte_porcentaje, rangos_especificos, rango_proximidad,
+                            disposiciones, estadisticas, hilos_especulativos)
+
+def procesar_lote_imagenes(nombres_archivos, carpeta_path, recorte_porcentaje, rangos_especificos, rango_proximidad, disposiciones=None,
+                           estadisticas=None):
+    """
+    Modo --lote: procesa un grupo de imágenes pasada por pasada. En cada pasada se
+    reúnen las imágenes que siguen sin coordenadas y se reconocen con UNA sola llamada
+    a Tesseract (ocr_motor.reconocer_lote). La cascada y sus resultados son los mismos
+    que en procesar_imagen; solo cambia el número de procesos de Tesseract lanzados.
+    """
+    filas = [None] * len(nombres_archivos)
+    pendientes = {} # indice -> (ot, resto_nombre, ruta_completa, gris_escalado)
+    grafos = {} # indice -> grafo_preproceso de la imagen escalada
+    extraidas = {}  # indice -> (lat_ext, lon_ext)
+    geometrias = {} # indice -> (ancho, alto, orientación) de la foto
+    sellos_validos = {} # indice -> (caja_relativa, config) del sello que dio las coordenadas
+    intentos = {} # indice -> [(pasada, segundos_ocr)] del Intento 1
+    textos_probados = {} # indice -> [(intento, texto OCR)] en orden (se guardan para revalidar)
+
+    for i, nombre_archivo_con_ext in enumerate(nombres_archivos):
+        ot, resto_nombre, ruta_completa, img_cv_escalada = cargar_recorte(nombre_archivo_con_ext, carpeta_path, recorte_porcentaje,
+                                                                          escala=FACTOR_ESCALA_OCR)
+        if img_cv_escalada is None:
+            filas[i] = fila_no_encontrada(ot, resto_nombre)
+            continue
+        grafos[i] = grafo_preproceso.nuevo_grafo(img_cv_escalada)
+        pendientes[i] = (ot, resto_nombre, ruta_completa, grafo_preproceso.nodo(grafos[i], 'gris'))
+        geometrias[i] = disposicion_sellos.geometria_imagen(ruta_completa)
 
+    # INTENTO 0: primero la caja aprendida para la geometría de cada foto y luego el sello
+    # localizado. En cada ronda todos los recortes van en un mosaico (una llamada) y los que
+    # no dieron coordenadas, en una llamada por configuración (una línea / bloque)
+    for aprendida in (True, False):
+        sellos = {} # configuración -> [(indice, imagen, caja_relativa)]
+        for i, (_, _, _, gris) in pendientes.items():
+            if i in extraidas:
+                continue
+            disposicion = (disposiciones or {}).get(geometrias[i]) if aprendida else None
+            if aprendida and disposicion is None:
+                continue
+            img_sello, config_sello, caja_rel = preparar_sello(gris, disposicion)
+            if img_sello is not None:
+                sellos.setdefault(config_sello, []).append((i, img_sello, caja_rel))
+        if USAR_MOSAICO_SELLOS and sum(len(imagenes_sello) for imagenes_sello in sellos.values()) > 1:
+            en_mosaico = [(config_sello, sello) for config_sello, imagenes_sello in sellos.items() for sello in imagenes_sello]
+            textos = ocr_motor.reconocer_mosaico([img for _, (_, img, _) in en_mosaico])
+            for (config_sello, (i, _, caja_rel)), texto in zip(en_mosaico, textos):
+                textos_probados.setdefault(i, []).append(('Sello', texto))
+                lat, lon = extraer_coordenadas_texto(texto)
+                if lat and lon:
+                    extraidas[i] = (lat, lon)
+                    sellos_validos[i] = (caja_rel, config_sello)
+        for config_sello, imagenes_sello in sellos.items():
+            imagenes_sello = [sello for sello in imagenes_sello if sello[0] not in extraidas]
+            textos = ocr_motor.reconocer_lote([img for _, img, _ in imagenes_sello], config_ocr=config_sello)
+            for (i, _, caja_rel), texto in zip(imagenes_sello, textos):
+                textos_probados.setdefault(i, []).append(('Sello', texto))
+                lat, lon = extraer_coordenadas_texto(texto)
+                if lat and lon:
+                    extraidas[i] = (lat, lon)
+                    sellos_validos[i] = (caja_rel, config_sello)
+
+    # INTENTO 1: una llamada por pasada para todo el lote, en el orden del planificador
+    # (el costo de la llamada se reparte entre las imágenes del lote)
+    pasadas = dict(PASADAS_INTENTO1)
+    extraidas_intento0 = set(extraidas)
+    for nombre_pasada in planificador_pasadas.ordenar(GRUPO_PASADAS, NOMBRES_PASADAS_INTENTO1, estadisticas, semilla=nombres_archivos[0]):
+        indices = [i for i in pendientes if i not in extraidas]
+        if not indices:
+            break
+        preparadas = [grafo_preproceso.nodo(grafos[i], pasadas[nombre_pasada]) for i in indices]
+        inicio = cache_ocr.segundos_ocr()
+        textos = ocr_motor.reconocer_lote(preparadas, config_ocr=CONFIG_OCR_INTENTO1)
+        segundos_por_imagen = (cache_ocr.segundos_ocr() - inicio) / len(indices)
+        for i, texto in zip(indices, textos):
+            intentos.setdefault(i, []).append((nombre_pasada, segundos_por_imagen))
+            textos_probados.setdefault(i, []).append((nombre_pasada, texto))
+            lat, lon = extraer_coordenadas_texto(texto)
             if lat and lon:
-                return lat, lon
-            
-            if i == len(ROI_LISTA) - 1:
-                try:
-                    ruta_salida = os.path.join('diagnostico_ocr', f"FALLO_FINAL_{os.path.basename(ruta_imagen)}")
-                    img_pil.save(ruta_salida)
-                except Exception as save_err:
-                    pass
-
-        except Exception as e:
-            pass
-            
-    return None, None
+                extraidas[i] = (lat, lon)
+    extraidas_intento1 = set(extraidas) - extraidas_intento0
 
-# --------------------------------------------------------------------------
-# III. FUNCIÓN PRINCIPAL DE EJECUCIÓN (CON RECORTE DINÁMICO)
-# --------------------------------------------------------------------------
+    # INTENTO 2: una llamada por ROI para todo el lote. Solo las fotos que siguen
+    # sin coordenadas se decodifican a resolución completa.
+    recortes_completos = {}
+    for i, (_, _, ruta_completa, _) in pendientes.items():
+        if i not in extraidas:
+            img_cv_recortada = lector_imagenes.cargar_franja_inferior(ruta_completa, recorte_porcentaje)
+            if img_cv_recortada is not None:
+                recortes_completos[i] = img_cv_recortada
+
+    ultima_imagen_roi = {} # Diagnóstico: imagen del último ROI de las fotos que fallan
+    for indice_roi, roi_coords in enumerate(ROI_LISTA):
+        indices, preparadas = [], []
+        for i, img_cv_recortada in recortes_completos.items():
+            if i in extraidas:
+                continue
+            try:
+                preparadas.append(preparar_roi_detallado(img_cv_recortada, roi_coords))
+                indices.append(i)
+            except Exception:
+                pass
+        if not indices:
+            continue
+        textos = ocr_motor.reconocer_lote(preparadas, config_ocr=CONFIG_OCR_INTENTO2)
+        for i, img_binaria, texto in zip(indices, preparadas, textos):
+            textos_probados.setdefault(i, []).append((f"ROI{indice_roi + 1}", texto))
+            lat, lon = extraer_coordenadas_texto(texto)
+            if lat and lon:
+                extraidas[i] = (lat, lon)
+            elif indice_roi == len(ROI_LISTA) - 1:
+                ultima_imagen_roi[i] = img_binaria
+
+    # VALIDACIÓN Y FILAS (en el orden original)
+    for i, (ot, resto_nombre, ruta_completa, _) in pendientes.items():
+        if i not in extraidas and i in ultima_imagen_roi:
+            guardar_diagnostico_fallo(ruta_completa, Image.fromarray(ultima_imagen_roi[i]))
+        lat_ext, lon_ext = extraidas.get(i, (None, None))
+        fila = anotar_sello(construir_fila(ot, resto_nombre, lat_ext, lon_ext, rangos_especificos, rango_proximidad,
+                                           textos_probados.get(i, ())), geometrias[i], sellos_validos.get(i))
+        filas[i] = anotar_pasadas(fila, intentos.get(i), i in extraidas_intento1)
+
+    return filas
+
+def racional_a_float(valor):
+    """Convierte un valor EXIF (IFDRational o tupla numerador/denominador) a float."""
+    if isinstance(valor, tuple):
+        return valor[0] / valor[1] if valor[1] else 0.0
+    return float(valor)
+
+def leer_gps_exif(ruta_imagen):
+    """
+    Lee SOLO el encabezado EXIF (Image.open no decodifica los píxeles) y devuelve
+    (lat_dec, lon_dec) a partir de GPSLatitude/GPSLongitude, o (None, None) si no hay GPS.
+    """
+    try:
+        with Image.open(ruta_imagen) as img:
+            gps = img.getexif().get_ifd(TAG_GPS_IFD)
+        if not gps or 2 not in gps or 4 not in gps:
+            return None, None
+
+        grados = []
+        for tag_valor in (2, 4): # GPSLatitude, GPSLongitude: (grados, minutos, segundos)
+            g, m, sg = (racional_a_float(v) for v in gps[tag_valor])
+            grados.append(g + m / 60.0 + sg / 3600.0)
+        lat_dec, lon_dec = grados
+
+        if str(gps.get(1, 'N')).strip().upper().startswith('S'): lat_dec = -lat_dec
+        ref_lon = str(gps.get(3, '')).strip().upper()
+        # Sin referencia E/W se aplica el mismo contexto que en el OCR: magnitud de México -> W
+        if ref_lon.startswith('W') or (not ref_lon and LON_MIN_MEX_MAG <= lon_dec <= LON_MAX_MEX_MAG):
+            lon_dec = -lon_dec
+        return lat_dec, lon_dec
+    except Exception:
+        return None, None
+
+def buscar_gps_exif(archivos_a_procesar, carpeta_path, rango_proximidad):
+    """
+    Paso previo al OCR: devuelve {nombre_archivo: fila CORRECTO} para las fotos cuyo GPS
+    en EXIF pasa validar_rango_geografico y validar_rango_proximidad.
+    """
+    lat_min, lat_max, lon_min, lon_max = rango_proximidad
+    filas_exif = {}
+    for nombre_archivo_con_ext in archivos_a_procesar:
+        lat_dec, lon_dec = leer_gps_exif(os.path.join(carpeta_path, nombre_archivo_con_ext))
+        if lat_dec is None:
+            continue
+        if not (validar_rango_geografico(lat_dec, lon_dec) and validar_rango_proximidad(lat_dec, lon_dec, lat_min, lat_max, lon_min, lon_max)):
+            continue
+
+        ot, resto_nombre = separar_por_posicion(os.path.splitext(nombre_archivo_con_ext)[0].strip())
+        lat_dec, lon_dec = round(lat_dec, 6), round(lon_dec, 6)
+        filas_exif[nombre_archivo_con_ext] = {
+            'OT': ot,
+            'Resto_Nombre': resto_nombre,
+            'Latitud_Extraida': f"{abs(lat_dec):.6f}{'N' if lat_dec >= 0 else 'S'}",
+            'Longitud_Extraida': f"{abs(lon_dec):.6f}{'E' if lon_dec >= 0 else 'W'}",
+            'Latitud_Decimal': lat_dec,
+            'Longitud_Decimal': lon_dec,
+            'Estatus': "CORRECTO",
+            'Metodo_Extraccion': METODO_EXIF
+        }
+    return filas_exif
+
+def verificar_exif_con_ocr(filas_exif, tamano_muestra, analizar):
+    """
+    Verificación cruzada: hace OCR sobre una muestra de las fotos resueltas por EXIF
+    ('analizar' recibe la lista de archivos y devuelve sus filas) y reporta cuántas
+    coinciden dentro de TOLERANCIA_EXIF_OCR. Las filas EXIF no se modifican.
+    """
+    muestra = random.Random(SEMILLA_MUESTRA_EXIF).sample(sorted(filas_exif), min(tamano_muestra, len(filas_exif)))
+    print(f"🔎 Verificando EXIF contra OCR en una muestra de {len(muestra)} imágenes...")
+
+    coinciden, sin_ocr, difieren = 0, 0, 0
+    for nombre_archivo, fila_ocr in zip(muestra, analizar(muestra)):
+        fila_exif = filas_exif[nombre_archivo]
+        if fila_ocr['Estatus'] != "CORRECTO":
+            sin_ocr += 1
+            continue
+        diferencia = max(abs(fila_ocr['Latitud_Decimal'] - fila_exif['Latitud_Decimal']),
+                         abs(fila_ocr['Longitud_Decimal'] - fila_exif['Longitud_Decimal']))
+        if diferencia <= TOLERANCIA_EXIF_OCR:
+            coinciden += 1
+        else:
+            difieren += 1
+            tqdm.write(f" 	⚠️ EXIF vs OCR: {nombre_archivo}: EXIF {fila_exif['Latitud_Decimal']}, {fila_exif['Longitud_Decimal']} / "
+                       f"OCR {fila_ocr['Latitud_Decimal']}, {fila_ocr['Longitud_Decimal']} (diferencia {diferencia:.5f}°)")
+
+    print(f"🔎 Verificación EXIF/OCR: {coinciden} coinciden, {difieren} difieren, {sin_ocr} sin lectura OCR válida.")
+    return coinciden, difieren, sin_ocr
+
+def inicializar_trabajador(tesseract_cmd, motor_ocr='cli'):
+    """
+    Inicializa cada proceso trabajador: configura la ruta de Tesseract y el motor OCR
+    (con 'libtesseract' cada trabajador carga su propia copia del modelo la primera vez)
+    y limita el paralelismo interno de OpenCV y de Tesseract (OpenMP) a un hilo, para
+    que N trabajadores ocupen N núcleos sin sobre-suscripción.
+    """
+    pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    os.environ['OMP_THREAD_LIMIT'] = '1' # Lo hereda cada subproceso de tesseract (y lo lee libtesseract al cargarse)
+    cv2.setNumThreads(1)
+    ocr_motor.seleccionar_motor(motor_ocr)
+
+def retirar_campos_internos(fila, disposiciones=None, estadisticas=None, lecturas=None):
+    """Quita de la fila los campos internos (CAMPO_SELLO, CAMPO_PASADAS, CAMPO_LECTURA) y los aprende / suma / guarda."""
+    lectura = fila.pop(CAMPO_LECTURA, None)
+    if lecturas is not None:
+        # La foto se volvió a leer: la lectura de reintentos de la versión anterior ya no vale
+        revalidacion.registrar_lectura(lecturas, fila['OT'], fila['Resto_Nombre'], revalidacion.ETAPA_PROCESO1, lectura)
+        revalidacion.registrar_lectura(lecturas, fila['OT'], fila['Resto_Nombre'], revalidacion.ETAPA_REINTENTOS, None)
+    sello = fila.pop(CAMPO_SELLO, None)
+    if sello is not None and disposiciones is not None:
+        disposicion_sellos.aprender(disposiciones, *sello)
+    for nombre_pasada, segundos, exito in fila.pop(CAMPO_PASADAS, []):
+        if estadisticas is not None:
+            planificador_pasadas.registrar(estadisticas, GRUPO_PASADAS, nombre_pasada, exito, segundos)
+    return fila
+
+def analizar_en_flujo(archivos_a_procesar, carpeta_path, recorte_porcentaje, rangos_especificos, rango_proximidad, hilos_flujo,
+                      disposiciones=None, estadisticas=None, hilos_especulativos=1, lecturas=None):
+    """
+    Modo --flujo: lectura, preprocesamiento y OCR en etapas solapadas, cada una con sus
+    hilos (hilos_flujo = (lectura, preprocesamiento, ocr)) y colas acotadas entre ellas
+    (ver flujo_imagenes). Las filas se aprenden en el mismo hilo de OCR en cuanto terminan
+    (las fotos que siguen ya usan lo aprendido) y se devuelven en el orden de 'archivos_a_procesar'.
+    """
+    hilos_lectura, hilos_preproceso, hilos_ocr = hilos_flujo
+    reconocer = partial(reconocer_imagen, recorte_porcentaje=recorte_porcentaje, rangos_especificos=rangos_especificos,
+                        rango_proximidad=rango_proximidad, disposiciones=disposiciones, estadisticas=estadisticas,
+                        hilos_especulativos=hilos_especulativos)
+    candado_aprendizaje = threading.Lock()
+
+    def reconocer_y_aprender(preprocesada):
+        fila = reconocer(preprocesada)
+        with candado_aprendizaje:
+            return retirar_campos_internos(fila, disposiciones, estadisticas, lecturas)
+
+    etapas = [
+        ('lectura', partial(leer_imagen, carpeta_path=carpeta_path, recorte_porcentaje=recorte_porcentaje), hilos_lectura),
+        ('preproceso', partial(preprocesar_imagen, disposiciones=disposiciones), hilos_preproceso),
+        ('ocr', reconocer_y_aprender, hilos_ocr),
+    ]
+    print(f"🚰 Modo flujo: {hilos_lectura} hilos de lectura, {hilos_preproceso} de preprocesamiento y {hilos_ocr} de OCR "
+          f"(colas de {TAMANO_COLA_FLUJO} imágenes).")
+
+    datos_para_csv = [None] * len(archivos_a_procesar)
+    with tqdm(total=len(archivos_a_procesar), desc="Análisis OCR", unit="img") as barra:
+        for indice, fila in flujo_imagenes.ejecutar_flujo(archivos_a_procesar, etapas, TAMANO_COLA_FLUJO):
+            datos_para_csv[indice] = fila
+            barra.update(1)
+    return datos_para_csv
+
+def analizar_imagenes(archivos_a_procesar, carpeta_path, recorte_porcentaje, rangos_especificos, rango_proximidad, workers=1, lote=0,
+                      disposiciones=None, estadisticas=None, hilos_especulativos=1, hilos_flujo=None, lecturas=None):
+    """
+    Ejecuta el análisis de todas las imágenes y devuelve las filas en el orden de
+    'archivos_a_procesar'. Con lote > 0 las imágenes se agrupan (procesar_lote_imagenes);
+    con workers > 1 las imágenes o lotes se reparten entre varios procesos. executor.map
+    conserva el orden de entrada, así que las filas salen igual que en el modo secuencial.
+    Las cajas de sello que dieron coordenadas válidas se aprenden en 'disposiciones'
+    (aquí, en el proceso principal, para que también cuenten las de los trabajadores; en
+    modo secuencial las fotos siguientes de la misma ejecución ya las usan). Igual con los
+    intentos de cada pasada, que se suman en 'estadisticas' (ver planificador_pasadas), y con
+    las coordenadas crudas de cada foto, que se guardan en 'lecturas' (ver revalidacion).
+    El modo especulativo (hilos_especulativos > 1) solo aplica sin lotes: en un lote cada
+    pasada ya es una sola llamada a Tesseract para todas las imágenes. Con 'hilos_flujo'
+    (y sin lotes) las etapas de cada imagen se solapan en hilos (analizar_en_flujo) en
+    lugar de repartir imágenes completas entre procesos.
+    """
+    if hilos_flujo and lote == 0:
+        return analizar_en_flujo(archivos_a_procesar, carpeta_path, recorte_porcentaje, rangos_especificos, rango_proximidad,
+                                 hilos_flujo, disposiciones, estadisticas, hilos_especulativos, lecturas)
+
+    contexto = dict(carpeta_path=carpeta_path, recorte_porcentaje=recorte_porcentaje,
+                    rangos_especificos=rangos_especificos, rango_proximidad=rango_proximidad,
+                    disposiciones=disposiciones, estadisticas=estadisticas)
+    if lote > 0:
+        unidades = [archivos_a_procesar[i:i + lote] for i in range(0, len(archivos_a_procesar), lote)]
+        tarea = partial(procesar_lote_imagenes, **contexto)
+        print(f"📦 Modo por lotes: {len(unidades)} lotes de hasta {lote} imágenes por llamada a Tesseract.")
+    else:
+        unidades = archivos_a_procesar
+        tarea = partial(procesar_imagen, hilos_especulativos=hilos_especulativos, **contexto)
+        if hilos_especulativos > 1:
+            print(f"🏁 Modo especulativo: hasta {hilos_especulativos} pasadas de cada foto a la vez.")
+
+    datos_para_csv = []
+    with tqdm(total=len(archivos_a_procesar), desc="Análisis OCR", unit="img") as barra:
+        def agregar(resultado):
+            filas = resultado if lote > 0 else [resultado]
+            for fila in filas:
+                retirar_campos_internos(fila, disposiciones, estadisticas, lecturas)
+            datos_para_csv.extend(filas)
+            barra.update(len(filas))
+
+        if workers > 1 and len(unidades) > 1:
+            # Envíos pequeños: reparto equilibrado sin pagar un viaje entre procesos por cada imagen
+            tamano_envio = 1 if lote > 0 else max(1, min(16, len(unidades) // (workers * 8)))
+            print(f"🧵 Modo paralelo: {workers} procesos trabajadores.")
+            with ProcessPoolExecutor(max_workers=workers, initializer=inicializar_trabajador,
+                                     initargs=(pytesseract.pytesseract.tesseract_cmd, ocr_motor.MOTOR_OCR)) as executor:
+                for resultado in executor.map(tarea, unidades, chunksize=tamano_envio):
+                    agregar(resultado)
+        else:
+            for unidad in unidades:
+                agregar(tarea(unidad))
+
+    return datos_para_csv
 
 # 🛑 Acepta 'ciudad_seleccionada' como argumento
-def procesar_carpeta(carpeta_path, recorte_porcentaje, ciudad_seleccionada):
-    """Recorre la carpeta, aplica el recorte dinámico, la lógica de dos intentos y exporta a CSV."""
+def procesar_carpeta(carpeta_path, recorte_porcentaje, ciudad_seleccionada, exportar=True, workers=1, lote=0,
+                     usar_exif=True, verificar_exif=0, incremental=True, hilos_especulativos=1, hilos_flujo=None):
+    """
+    Recorre la carpeta, aplica el recorte dinámico, la lógica de dos intentos y exporta a CSV.
+    Devuelve la lista de filas generadas (None si la carpeta no existe). Con exportar=False
+    no se escribe el CSV: el pipeline en proceso (pipeline.py) recibe las filas en memoria.
+    Con workers > 1 las imágenes se reparten entre varios procesos y con lote > 0
+    cada pasada de OCR se ejecuta una sola vez para un grupo de 'lote' imágenes.
+    Con hilos_especulativos > 1 las pasadas de una misma foto se lanzan varias a la vez y con
+    hilos_flujo = (lectura, preprocesamiento, ocr) las etapas de las fotos se solapan en hilos.
+    """
     
     verificar_e_instalar_librerias()
     
@@ -308,13 +1080,13 @@ def procesar_carpeta(carpeta_path, recorte_porcentaje, ciudad_seleccionada):
     print(f"\n📂 Procesando imágenes en la carpeta: {carpeta_path}")
     print(f"✂️ Aplicando Recorte Inicial del {int(recorte_porcentaje*100)}% Inferior.")
     print(f"⚙️ Primer Intento: Recorte del 30% + Reducción de Escala al {int(FACTOR_ESCALA_OCR*100)}%")
+    if USAR_LOCALIZADOR_SELLO:
+        print(f"⚙️ Intento 0: solo la línea del sello localizada ({CONFIG_OCR_SELLO_LINEA})")
 
     if not os.path.isdir(carpeta_path):
         print(f"❌ Error: La carpeta '{carpeta_path}' no existe.")
         return
 
-    datos_para_csv = []
-    
     # --- PREPARAR LISTA DE ARCHIVOS ---
     archivos_a_procesar = [
         nombre_archivo_con_ext.strip()
@@ -322,145 +1094,76 @@ def procesar_carpeta(carpeta_path, recorte_porcentaje, ciudad_seleccionada):
         if nombre_archivo_con_ext.strip().lower().endswith(('.png', '.jpg', '.jpeg', '.tiff'))
     ]
 
-    # --- INICIO DE CONTADORES ---
-    correctas_contadas = 0
-    no_encontradas_contadas = 0
-    
-    # 🛑 NUEVO: Definir rangos de magnitud de Longitud de México para la corrección W.
-    LON_MIN_MEX_MAG = min(abs(LON_MIN_ESPERADA), abs(LON_MAX_ESPERADA)) # 86.0
-    LON_MAX_MEX_MAG = max(abs(LON_MIN_ESPERADA), abs(LON_MAX_ESPERADA)) # 119.0
-    
     # --- INICIO DEL BUCLE CON BARRA DE PROGRESO (tqdm) ---
     total_archivos = len(archivos_a_procesar)
+    rango_proximidad = (lat_min, lat_max, lon_min, lon_max)
     
-    for nombre_archivo_con_ext in tqdm(archivos_a_procesar, desc="Análisis OCR", unit="img"):
-        
-        ruta_completa = os.path.join(carpeta_path, nombre_archivo_con_ext)
-        nombre_archivo_base = os.path.splitext(nombre_archivo_con_ext)[0]
-        
-        ot, resto_nombre = separar_por_posicion(nombre_archivo_base.strip())
-        
-        try:
-            img_cv_original = cv2.imread(ruta_completa)
-            if img_cv_original is None:
-                # 🛑 ERROR DE LECTURA CRÍTICO
-                tqdm.write(f"❌ Error de lectura en {nombre_archivo_con_ext}: No se pudo cargar la imagen.")
-                raise FileNotFoundError("No se pudo cargar la imagen.")
-        except Exception as e:
-            # Ya se escribió el error, solo se añade el registro de fallo
-            no_encontradas_contadas += 1
-            # 🛑 REGISTRO DE FALLO EN CONSOLA (Error de lectura)
-            tqdm.write(f"❌ Fallo OCR: OT:{ot} Elem:{resto_nombre}: Error al cargar la imagen.")
-
-            datos_para_csv.append({
-                'OT': ot, 'Resto_Nombre': resto_nombre, 'Latitud_Extraida': 'FALLO', 
-                'Longitud_Extraida': 'FALLO', 'Latitud_Decimal': '', 
-                'Longitud_Decimal': '', 'Estatus': "NO ENCONTRADO"
-            })
-            continue
+    # Cajas del sello aprendidas en ejecuciones anteriores (por geometría de foto)
+    disposiciones = disposicion_sellos.cargar_disposiciones()
+    disposiciones_iniciales = dict(disposiciones)
+    print(f"📐 Disposición de sellos: {len(disposiciones)} geometrías aprendidas.")
+    # Historial de aciertos y costo de las pasadas: decide su orden (ver planificador_pasadas)
+    estadisticas = planificador_pasadas.cargar_estadisticas()
+    print(f"📈 Orden de pasadas: {', '.join(planificador_pasadas.ordenar(GRUPO_PASADAS, NOMBRES_PASADAS_INTENTO1, estadisticas))}")
+    # Coordenadas crudas del OCR de cada foto, para revalidar sin OCR (ver revalidacion)
+    lecturas = revalidacion.cargar_lecturas()
 
-        # RECORTE DINÁMICO (30% inferior)
-        alto_total = img_cv_original.shape[0]
-        y_inicio_recorte = int(alto_total * (1 - recorte_porcentaje)) 
-        img_cv_recortada = img_cv_original[y_inicio_recorte:alto_total, 0:img_cv_original.shape[1]]
-        
-        if img_cv_recortada.size == 0:
-              tqdm.write(f"⚠️ {ot} La imagen recortada está vacía. Saltando.")
-              no_encontradas_contadas += 1
-              datos_para_csv.append({
-                'OT': ot, 'Resto_Nombre': resto_nombre, 'Latitud_Extraida': 'FALLO', 
-                'Longitud_Extraida': 'FALLO', 'Latitud_Decimal': '', 
-                'Longitud_Decimal': '', 'Estatus': "NO ENCONTRADO"
-            })
-              continue
-
-        # INTENTO 1: Multi-Pass con Reducción de Escala
-        lat_ext, lon_ext = intento1_multiple_passes(img_cv_recortada)
-        
-        # INTENTO 2: Fallback con ROIs predefinidos
-        if lat_ext is None:
-            lat_ext, lon_ext = intento2_fallback_detallado(ruta_completa, img_cv_recortada)
-        
-        # -------------------------------------------------------------
-        # PREPARACIÓN DE DATOS PARA CSV Y VALIDACIÓN CONTEXTUAL
-        # -------------------------------------------------------------
-        
-        estado = "NO ENCONTRADO"
-        lat_dec_guardar = ''
-        lon_dec_guardar = ''
+    analizar = partial(analizar_imagenes, carpeta_path=carpeta_path, recorte_porcentaje=recorte_porcentaje,
+                       rangos_especificos=rangos_especificos, rango_proximidad=rango_proximidad, workers=workers, lote=lote,
+                       disposiciones=disposiciones, estadisticas=estadisticas, hilos_especulativos=hilos_especulativos,
+                       hilos_flujo=hilos_flujo, lecturas=lecturas)
 
-        if lat_ext and lon_ext:
-            
-            # APLICAR CORRECCIÓN HEURÍSTICA (dígito inicial)
-            lat_ext, lon_ext = corregir_latitud_ocr(lat_ext, lon_ext, rangos_especificos)
-            
-            # 🛑 INICIO: LÓGICA DE AJUSTE DE LONGITUD (W) 🛑
-            # Usamos el rango amplio de México para forzar W si falta el signo
-            lon_temp = lon_ext.strip().upper()
-            lon_str_check = re.sub(r'[^0-9.]', '', lon_temp.replace(',', '.')).strip()
-            
-            if lon_str_check and not re.search(r'[NWSE-]', lon_temp):
-                try:
-                    valor_lon = float(lon_str_check)
-                    
-                    # USAR RANGO GLOBAL DE MÉXICO PARA EL CONTEXTO W
-                    if LON_MIN_MEX_MAG <= valor_lon <= LON_MAX_MEX_MAG: 
-                        lon_ext += 'W' # Agregamos W para forzar la conversión a negativo
-                        tqdm.write(f" 	⚙️ AJUSTE DE CONTEXTO GLOBAL: Longitud '{lon_temp}' ajustada a '{lon_ext}' (W forzada, magnitud en rango México).")
-                except ValueError:
-                    pass
-            # 🛑 FIN: LÓGICA DE AJUSTE 🛑
-
-            lat_dec = convertir_a_decimal(lat_ext)
-            lon_dec = convertir_a_decimal(lon_ext)
-            
-            # VALIDACIÓN 1: Rango Geográfico Estándar & Rango de Proximidad
-            es_valido = validar_rango_geografico(lat_dec, lon_dec)
-            es_proximo = validar_rango_proximidad(lat_dec, lon_dec, lat_min, lat_max, lon_min, lon_max)
-            
+    # Firma de cada foto al listarla (antes de leerla): es la que se guarda en el manifiesto
+    firmas = manifiesto.firmas_carpeta(archivos_a_procesar, carpeta_path)
+    manifiesto.guardar_firmas(firmas)
+
+    # EJECUCIÓN INCREMENTAL: las fotos sin cambios desde la última ejecución (y validadas con la
+    # misma ciudad) conservan su resultado final
+    if incremental:
+        filas_previas = manifiesto.filas_sin_cambios(firmas, manifiesto.cargar_manifiesto(), rangos_especificos)
+        print(f"🗂️ Manifiesto: {len(filas_previas)} de {total_archivos} imágenes sin cambios; se reutiliza su resultado.")
+    else:
+        # Reproceso completo: sin manifiesto, tampoco las etapas de reintento omiten filas
+        filas_previas = {}
+        if os.path.exists(manifiesto.ARCHIVO_MANIFIESTO):
+            os.remove(manifiesto.ARCHIVO_MANIFIESTO)
+    archivos_nuevos = [nombre for nombre in archivos_a_procesar if nombre not in filas_previas]
+
+    # ATAJO EXIF: las fotos con GPS válido en sus metadatos no pasan por el OCR
+    filas_exif = buscar_gps_exif(archivos_nuevos, carpeta_path, rango_proximidad) if usar_exif else {}
+    if usar_exif:
+        print(f"🛰️ GPS en EXIF: {len(filas_exif)} de {len(archivos_nuevos)} imágenes resueltas sin OCR ({METODO_EXIF}).")
 
-            if es_valido and es_proximo:
-                
-                # CORRECTO: Pasó todas las validaciones (MUNDIAL + PROXIMIDAD)
-                estado = "CORRECTO" 
-                correctas_contadas += 1
-                lat_dec_guardar = lat_dec
-                lon_dec_guardar = lon_dec
-                
-            else:
-                # Fallo en Validación (No es mundialmente válido o NO es próximo a la ciudad)
-                no_encontradas_contadas += 1
-                # 🛑 REGISTRO DE FALLO EN CONSOLA (Fallo de Validación)
-                tqdm.write(f"❌ Fallo Valid: OT:{ot} Elem:{resto_nombre}: {lat_ext}, {lon_ext} (Fuera de Rango/Proximidad)")
-                # Si falla, no guardamos los decimales para que sean reprocesados
-                
-            datos_para_csv.append({
-                'OT': ot,
-                'Resto_Nombre': resto_nombre,
-                'Latitud_Extraida': lat_ext,
-                'Longitud_Extraida': lon_ext,
-                'Latitud_Decimal': lat_dec_guardar,
-                'Longitud_Decimal': lon_dec_guardar,
-                'Estatus': estado 
-            })
+    filas_ocr = iter(analizar([nombre for nombre in archivos_nuevos if nombre not in filas_exif]))
+    datos_para_csv = []
+    for nombre in archivos_a_procesar:
+        if nombre in filas_previas:
+            datos_para_csv.append(filas_previas[nombre])
+        elif nombre in filas_exif:
+            datos_para_csv.append(filas_exif[nombre])
         else:
-            # Estatus si NO SE DETECTÓ nada
-            no_encontradas_contadas += 1
-            # 🛑 REGISTRO DE FALLO EN CONSOLA (Fallo de Detección OCR)
-            tqdm.write(f"❌ Fallo OCR: OT:{ot} Elem:{resto_nombre}: No se detectaron coordenadas.")
-
-            datos_para_csv.append({
-                'OT': ot,
-                'Resto_Nombre': resto_nombre,
-                'Latitud_Extraida': 'FALLO',
-                'Longitud_Extraida': 'FALLO',
-                'Latitud_Decimal': '',
-                'Longitud_Decimal': '',
-                'Estatus': "NO ENCONTRADO" 
-            })
-
-    # EXPORTACIÓN FINAL
-    exportar_a_csv(datos_para_csv)
+            datos_para_csv.append(next(filas_ocr))
+
+    if verificar_exif > 0 and filas_exif:
+        # Las lecturas de la verificación no se guardan: esas fotos quedan resueltas por EXIF
+        verificar_exif_con_ocr(filas_exif, verificar_exif, partial(analizar, lecturas=None))
+    ocr_motor.cerrar_pool_especulativo() # Sin más OCR: los hilos especulativos liberan sus sesiones
+
+    if disposiciones != disposiciones_iniciales:
+        disposicion_sellos.guardar_disposiciones(disposiciones)
+    planificador_pasadas.guardar_estadisticas(estadisticas)
+    for fila_exif in filas_exif.values(): # Resueltas por EXIF: no queda lectura OCR que revalidar
+        for etapa in (revalidacion.ETAPA_PROCESO1, revalidacion.ETAPA_REINTENTOS):
+            revalidacion.registrar_lectura(lecturas, fila_exif['OT'], fila_exif['Resto_Nombre'], etapa, None)
+    revalidacion.guardar_lecturas(lecturas)
+
+    # --- CONTADORES ---
+    correctas_contadas = sum(1 for fila in datos_para_csv if fila['Estatus'] == "CORRECTO")
+    no_encontradas_contadas = total_archivos - correctas_contadas
+
+    # EXPORTACIÓN FINAL (al almacén; el CSV se exporta en proceso4 o con 'python almacen_resultados.py')
+    if exportar:
+        almacen_resultados.guardar_filas(datos_para_csv)
 
     # --- RESUMEN FINAL DE ESTATUS ---
     print("\n" + "="*50)
@@ -471,6 +1174,8 @@ def procesar_carpeta(carpeta_path, recorte_porcentaje, ciudad_seleccionada):
     print(f"❌ Registros NO ENCONTRADOS (Fallo OCR/Validación): {no_encontradas_contadas}")
     print("="*50 + "\n")
 
+    return datos_para_csv
+
 
 # --------------------------------------------------------------------------
 # IV. CONFIGURACIÓN DE EJECUCIÓN (MODIFICADA PARA RECIBIR ARGUMENTOS)
@@ -478,6 +1183,53 @@ def procesar_carpeta(carpeta_path, recorte_porcentaje, ciudad_seleccionada):
 
 CARPETA_IMAGENES = 'fotos' 
 
+def leer_hilos_flujo(texto):
+    """'L,P,O' -> (L, P, O) hilos de lectura, preprocesamiento y OCR (opción --flujo)."""
+    try:
+        hilos = tuple(int(parte) for parte in texto.split(','))
+    except ValueError:
+        hilos = ()
+    if len(hilos) != 3 or min(hilos) < 1:
+        raise argparse.ArgumentTypeError(f"--flujo espera tres enteros positivos 'L,P,O', no '{texto}'.")
+    return hilos
+
+def leer_opciones(argumentos):
+    """
+    Lee las opciones adicionales de proceso1 (las que siguen a CIUDAD y RUTA TESSERACT).
+    --workers N : número de procesos para el OCR en paralelo (1 = secuencial, 0 = todos los núcleos).
+    --lote N    : agrupa N imágenes por llamada a Tesseract en cada pasada (0 = una llamada por imagen).
+    --motor M   : motor OCR, 'cli' (pytesseract) o 'libtesseract' (librería residente vía ctypes).
+    --sin-exif  : no usar el GPS de los metadatos EXIF (todas las fotos pasan por OCR).
+    --verificar-exif N : hace además OCR a N fotos resueltas por EXIF y compara resultados.
+    --completo  : ignora y borra el manifiesto de ejecuciones anteriores (reprocesa todas las fotos).
+    --estrategias A,B,... : estrategias de reintento y su orden (ver reintentos.ESTRATEGIAS).
+    --especulativo K : prueba hasta K pasadas de cada foto a la vez en hilos (0 = cascada secuencial).
+    --flujo L,P,O : solapa lectura, preprocesamiento y OCR con L, P y O hilos (sin --lote; reemplaza a --workers).
+    """
+    parser = argparse.ArgumentParser(prog='proceso1.py', description="Opciones adicionales de proceso1.")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Procesos trabajadores para el OCR (1 = secuencial, 0 = todos los núcleos).")
+    parser.add_argument('--lote', type=int, default=0,
+                        help="Imágenes por llamada a Tesseract en cada pasada (0 = una llamada por imagen).")
+    parser.add_argument('--motor', choices=ocr_motor.MOTORES_OCR, default=ocr_motor.MOTOR_OCR,
+                        help="Motor OCR: 'cli' (pytesseract) o 'libtesseract' (modelo residente en memoria).")
+    parser.add_argument('--sin-exif', action='store_true',
+                        help="No usar el GPS de los metadatos EXIF; todas las fotos pasan por OCR.")
+    parser.add_argument('--verificar-exif', type=int, default=0, metavar='N',
+                        help="Verifica el GPS de EXIF contra el OCR en una muestra de N fotos (0 = no verificar).")
+    parser.add_argument('--completo', action='store_true',
+                        help="Reprocesa todas las fotos ignorando el manifiesto de ejecuciones anteriores.")
+    parser.add_argument('--estrategias', default=None, metavar='A,B,...',
+                        help="Estrategias de reintento de las fallas, en orden (por defecto todas, ver reintentos.py).")
+    parser.add_argument('--especulativo', type=int, default=0, metavar='K',
+                        help="Pasadas de una misma foto que se prueban a la vez (0 = cascada secuencial).")
+    parser.add_argument('--flujo', type=leer_hilos_flujo, default=None, metavar='L,P,O',
+                        help="Hilos de lectura, preprocesamiento y OCR del modo por etapas solapadas (ej. 2,2,4).")
+    opciones = parser.parse_args(argumentos)
+    if opciones.workers <= 0:
+        opciones.workers = os.cpu_count() or 1
+    return opciones
+
 if __name__ == '__main__':
     # 🛑 Cambiamos la llamada a procesar_carpeta para usar sys.argv
     try:
@@ -488,13 +1240,18 @@ if __name__ == '__main__':
             
         ciudad_input = sys.argv[1].upper() 
         tesseract_path = sys.argv[2] # Nuevo argumento
+        opciones = leer_opciones(sys.argv[3:]) # Opciones adicionales (--workers N, --lote N, --motor M)
         
         # Configurar Tesseract con la ruta dinámica
         pytesseract.pytesseract.tesseract_cmd = tesseract_path
         print(f"[proceso1.py] Configurando Tesseract con la ruta dinámica: '{tesseract_path}'")
+        print(f"[proceso1.py] Motor OCR: '{ocr_motor.seleccionar_motor(opciones.motor)}'")
         
         print(f"[proceso1.py] Recibida CIUDAD desde el orquestador: '{ciudad_input}'")
-        procesar_carpeta(CARPETA_IMAGENES, PORCENTAJE_RECORTE, ciudad_input)
+        procesar_carpeta(CARPETA_IMAGENES, PORCENTAJE_RECORTE, ciudad_input, workers=opciones.workers, lote=opciones.lote,
+                         usar_exif=not opciones.sin_exif, verificar_exif=opciones.verificar_exif,
+                         incremental=not opciones.completo, hilos_especulativos=max(1, opciones.especulativo),
+                         hilos_flujo=opciones.flujo)
     except IndexError as e:
         print(f"ERROR: {e} Se esperaba el argumento de la CIUDAD y la RUTA TESSERACT desde 'app.py'.")
         sys.exit(1)
@@ -1,10 +1,16 @@
 import os
-import re
 import csv
 import cv2 
 import numpy as np 
 from PIL import Image
 import pytesseract
+import lector_imagenes # Lectura de la franja inferior de cada foto
+import indice_fotos # Índice de la carpeta de fotos (una sola lectura por ejecución)
+import manifiesto # Resultados de ejecuciones anteriores (fotos sin cambios)
+import almacen_resultados # Almacén SQLite: solo se leen y escriben las filas con fallo
+import ocr_motor # Motor OCR compartido (pytesseract o libtesseract residente, lotes de variantes)
+import grafo_preproceso # Pasos intermedios (gris, CLAHE, umbrales...) calculados una vez por imagen
+import coordenadas_ocr # Lector único de coordenadas en el texto OCR (candidatos ordenados)
 from collections import Counter
 from tqdm import tqdm 
 import sys # 🛑 Necesario para leer argumentos de línea de comandos
@@ -20,45 +26,14 @@ CSV_ENTRADA = 'resultados_coordenadas.csv'
 # 🛑 Ajustado para sobrescribir el archivo principal de resultados, siguiendo el flujo iterativo
 CSV_SALIDA = 'resultados_coordenadas.csv' 
 ESTATUS_FALLO = 'NO ENCONTRADO' 
+# Las variantes de una foto que comparten PSM se reconocen en una sola llamada a Tesseract
+OCR_POR_LOTES = True
+RECORTE_PORCENTAJE = 0.30 # 30% inferior
 
 # --------------------------------------------------------------------------
 # I. FUNCIONES AUXILIARES Y LÓGICA DE ANÁLISIS
 # --------------------------------------------------------------------------
 
-def extraer_solo_numeros_flexibles(texto):
-    """
-    Último recurso: Busca cualquier par de números largos que se parezcan a coordenadas.
-    Asume N y W para asignar cardinales.
-    """
-    # 1. Limpiar el texto de caracteres no numéricos o de punto/coma, dejando solo números
-    texto_limpio = re.sub(r'[^\d.,]', ' ', texto)
-    
-    # 2. Buscar números decimales largos (al menos 2 dígitos decimales)
-    patron_decimal = re.compile(r'(\d{1,3}[.,]\d{2,})', re.IGNORECASE)
-    numeros_encontrados = patron_decimal.findall(texto_limpio)
-    
-    if len(numeros_encontrados) >= 2:
-        lat_str = numeros_encontrados[0].replace(',', '.')
-        lon_str = numeros_encontrados[1].replace(',', '.')
-        
-        # Asumir cardinales N y W si no tienen, basado en el contexto geográfico
-        if not lat_str[-1].isalpha():
-            lat_str += 'N'
-        if not lon_str[-1].isalpha():
-            lon_str += 'W'
-
-        # Verificar que el resultado sea válido (ej., no queremos 1.234N)
-        # Reutilizamos convertir_a_decimal para la validación interna
-        lat_dec = convertir_a_decimal(lat_str)
-        lon_dec = convertir_a_decimal(lon_str)
-
-        # Usamos una heurística simple para filtrar coordenadas muy pequeñas o no representativas de Long/Lat
-        if lat_dec is not None and abs(lat_dec) > 10 and abs(lon_dec) > 70: 
-            return lat_str, lon_str, "Patron_5_Numerico_Flexible"
-            
-    return None, None, None
-
-
 def separar_por_posicion(nombre_archivo_base):
     """Separa el nombre del archivo en OT (primeros 8 caracteres) y el resto."""
     ot = nombre_archivo_base[:8]
@@ -100,67 +75,101 @@ def exportar_a_csv(datos, nombre_archivo):
 def reconocer_y_extraer_mejorado(img_pil, config_ocr='--psm 6'):
     """Aplica OCR y usa patrones específicos de coordenadas."""
     try:
-        texto_extraido = pytesseract.image_to_string(img_pil, lang='eng', config=config_ocr)
-        
-        # 1. Intento de patrones específicos
-        patron_coordenadas = re.compile(r'(\d{1,3}[.,]\d{1,}[NS])\s*[\s,-]?\s*(\d{1,3}[.,]\d{1,}[WE])', re.IGNORECASE)
-        match = patron_coordenadas.search(texto_extraido)
-        
-        if match:
-              lat, lon = match.groups()
-              return lat, lon, "Patron_Exacto"
-        
-        # 2. Intento de patrones flexibles
-        return extraer_solo_numeros_flexibles(texto_extraido)
+        texto_extraido = ocr_motor.reconocer(img_pil, config_ocr=config_ocr)
+        return extraer_coordenadas_mejorado(texto_extraido)
 
     except Exception:
         return None, None, None
 
-def preprocesar_imagen_optimizada(img_cv, metodo='inferior_optimizado'):
-    """Aplica técnicas de preprocesamiento avanzadas."""
-    gris = cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY)
-    
-    if metodo == 'inferior_optimizado':
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        gris = clahe.apply(gris)
-        binaria = cv2.adaptiveThreshold(gris, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                                        cv2.THRESH_BINARY, 15, 5)
-    else: # Alto Contraste
-        kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
-        gris = cv2.filter2D(gris, -1, kernel)
-        _, binaria = cv2.threshold(gris, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        
-    return binaria
+# Método según el formato del candidato de coordenadas_ocr (los nombres de siempre)
+METODOS_FORMATO = {'cardinal': "Patron_Exacto", 'dms': "Patron_Sexagesimal"}
+METODO_FLEXIBLE = "Patron_5_Numerico_Flexible"
 
-def estrategia_30pct_inferior_intensiva(ruta_imagen, img_cv_original):
-    """Estrategia intensiva que prueba múltiples preprocesamientos en el 30% inferior."""
-    
-    # 1. Recorte al 30% inferior
-    height, width = img_cv_original.shape[:2]
-    y_start = int(height * 0.70)
-    img_30pct = img_cv_original[y_start:height, 0:width]
+def extraer_coordenadas_mejorado(texto_extraido, rango=None):
+    """
+    Candidato más creíble del texto del OCR (ver coordenadas_ocr; 'rango' es el de la ciudad).
+    Como en los patrones flexibles, se asumen N y W donde falta el signo o el cardinal.
+    """
+    try:
+        candidato = coordenadas_ocr.mejor_candidato(texto_extraido, rango)
+        if candidato is None:
+            return None, None, None
+        lat, lon = coordenadas_ocr.completar_cardinales(candidato[0], candidato[1])
+        return lat, lon, METODOS_FORMATO.get(candidato[2], METODO_FLEXIBLE)
+
+    except Exception:
+        return None, None, None
+
+# Nodo de grafo_preproceso de cada preprocesamiento:
+#   inferior_optimizado: CLAHE (2.0) + umbral adaptativo gaussiano
+#   alto_contraste: filtro de realce + Otsu
+NODOS_PREPROCESAMIENTO = {
+    'inferior_optimizado': 'adaptativo_clahe_2',
+    'alto_contraste': 'otsu_realce',
+}
+
+def preprocesar_imagen_optimizada(img_cv, metodo='inferior_optimizado', grafo=None):
+    """
+    Aplica técnicas de preprocesamiento avanzadas. Con 'grafo' (el de img_cv, ver
+    grafo_preproceso) se reutilizan el gris y los pasos ya calculados para esa imagen.
+    """
+    if grafo is None:
+        grafo = grafo_preproceso.nuevo_grafo(img_cv)
+    return grafo_preproceso.nodo(grafo, NODOS_PREPROCESAMIENTO.get(metodo, 'otsu_realce'))
+
+def estrategia_30pct_inferior_intensiva(ruta_imagen, img_30pct):
+    """
+    Estrategia intensiva que prueba múltiples preprocesamientos en el 30% inferior
+    (el recorte ya viene hecho desde la lectura, ver lector_imagenes).
+    """
     
     if img_30pct.size == 0:
         return None, None, "Fallo_Recorte_Vacio"
     
     preprocesamientos = ['inferior_optimizado', 'alto_contraste']
     config_ocr_options = ['--psm 3', '--psm 6'] # Usar PSM 3 y 6
+    # Cada preprocesamiento se calcula una sola vez y lo comparten los dos PSM (y el diagnóstico)
+    grafo = grafo_preproceso.nuevo_grafo(img_30pct)
     
-    for preproc in preprocesamientos:
-        for config in config_ocr_options:
+    if OCR_POR_LOTES:
+        # Se preparan todas las variantes y se reconocen con una llamada por PSM, hasta la
+        # primera que da coordenadas; el resultado se elige en el mismo orden que el bucle secuencial.
+        def aceptar(_, texto):
+            lat, lon, _ = extraer_coordenadas_mejorado(texto)
+            return bool(lat and lon)
+        try:
+            variantes = []
+            for preproc in preprocesamientos:
+                img_pil = Image.fromarray(preprocesar_imagen_optimizada(img_30pct, preproc, grafo))
+                for config in config_ocr_options:
+                    variantes.append((preproc, config, img_pil))
+            textos = ocr_motor.reconocer_variantes([(img_pil, config) for _, config, img_pil in variantes], aceptar=aceptar)
+        except Exception:
+            variantes, textos = [], []
+        for (preproc, config, _), texto in zip(variantes, textos):
+            if texto is None:
+                break # Después de la aceptada ya no se reconoció
+            lat, lon, metodo = extraer_coordenadas_mejorado(texto)
+            if lat and lon:
+                return lat, lon, f"Intensivo_{preproc}_{config.replace('--psm ', 'PSM')}_{metodo}"
+    else:
+        for preproc in preprocesamientos:
             try:
-                img_procesada = preprocesar_imagen_optimizada(img_30pct, preproc)
-                img_pil = Image.fromarray(img_procesada)
-                lat, lon, metodo = reconocer_y_extraer_mejorado(img_pil, config)
-                
-                if lat and lon:
-                    return lat, lon, f"Intensivo_{preproc}_{config.replace('--psm ', 'PSM')}_{metodo}"
+                img_pil = Image.fromarray(preprocesar_imagen_optimizada(img_30pct, preproc, grafo))
             except Exception:
                 continue
+            for config in config_ocr_options:
+                try:
+                    lat, lon, metodo = reconocer_y_extraer_mejorado(img_pil, config)
+                    
+                    if lat and lon:
+                        return lat, lon, f"Intensivo_{preproc}_{config.replace('--psm ', 'PSM')}_{metodo}"
+                except Exception:
+                    continue
     
     # Fallo total: Guardar el diagnóstico
     try:
-        img_diagnostico = preprocesar_imagen_optimizada(img_30pct, 'inferior_optimizado')
+        img_diagnostico = preprocesar_imagen_optimizada(img_30pct, 'inferior_optimizado', grafo)
         ruta_salida = os.path.join('diagnostico_ocr', f"FALLO_FINAL_{os.path.basename(ruta_imagen)}")
         Image.fromarray(img_diagnostico).save(ruta_salida)
     except Exception:
@@ -172,45 +181,50 @@ def estrategia_30pct_inferior_intensiva(ruta_imagen, img_cv_original):
 # II. FUNCIÓN PRINCIPAL DE PROCESAMIENTO DE FALLAS
 # --------------------------------------------------------------------------
 
-def procesar_fallas_csv():
-    """Lee el CSV, identifica fallas y re-procesa las imágenes correspondientes."""
+def procesar_fallas_csv(filas=None, exportar=True):
+    """
+    Identifica las fallas y re-procesa las imágenes correspondientes.
+    Si se reciben 'filas' (pipeline en proceso) se trabaja sobre ellas en memoria; si no,
+    se consultan del almacén SOLO las filas con fallo y al final se actualizan solo esas
+    (con exportar=False no se tocan el almacén ni el CSV; las imágenes de diagnóstico se
+    escriben siempre). Devuelve la lista completa de filas actualizada.
+    """
     
     print("--- Iniciando Reprocesamiento de Fallas (Intensivo y Flexible) ---")
     
-    filas_originales = []
+    # 1. FILAS RECIBIDAS EN MEMORIA, o solo las fallas del almacén (consulta indexada por Estatus)
+    ordenes_almacen = None
+    if filas is not None:
+        filas_originales = filas
+    else:
+        ordenes_almacen, filas_originales = almacen_resultados.fallas_para_reproceso(ESTATUS_FALLO, CSV_ENTRADA)
+    if filas_originales is None:
+        return None
+
+    # Fallas ya reintentadas en una ejecución anterior sobre la misma foto (ver manifiesto.py)
+    claves_previas = manifiesto.claves_sin_cambios(CARPETA_IMAGENES, None) # proceso2 no recibe ciudad: solo las validadas sin ciudad reconocida
+
     archivos_a_reprocesar = []
-    
-    # 1. LEER CSV
-    try:
-        # Aseguramos que se lea el archivo de resultados actual
-        with open(CSV_ENTRADA, 'r', encoding='utf-8') as archivo_csv:
-            # Intentamos leer con DictReader, que es más seguro para archivos existentes
-            try:
-                lector = csv.DictReader(archivo_csv)
-            except Exception as e:
-                tqdm.write(f"Advertencia: No se pudo iniciar DictReader. {e}")
-                return # Detiene si no se puede leer
-                
-            for fila in lector:
-                # Aseguramos que el Metodo_Extraccion exista para evitar KeyError en P3/P4
-                if 'Metodo_Extraccion' not in fila:
-                    fila['Metodo_Extraccion'] = '' 
-                    
-                filas_originales.append(fila)
-                # Verifica si la fila tiene el estatus de fallo
-                if fila.get('Estatus') == ESTATUS_FALLO:
-                    archivos_a_reprocesar.append(fila)
-    except FileNotFoundError:
-        print(f"❌ Error: El archivo de entrada '{CSV_ENTRADA}' no se encontró. No hay fallas que reprocesar.")
-        return
-    except Exception as e:
-        print(f"❌ Error crítico leyendo CSV: {e}")
-        return
+    omitidas_manifiesto = 0
+    for fila in filas_originales:
+        # Aseguramos que el Metodo_Extraccion exista para evitar KeyError en P3/P4
+        if 'Metodo_Extraccion' not in fila:
+            fila['Metodo_Extraccion'] = '' 
+        # Verifica si la fila tiene el estatus de fallo
+        if fila.get('Estatus') == ESTATUS_FALLO:
+            if almacen_resultados.clave_fila(fila.get('OT', ''), fila.get('Resto_Nombre', '')) in claves_previas:
+                omitidas_manifiesto += 1
+                continue
+            archivos_a_reprocesar.append(fila)
 
-    print(f"📊 Total registros: {len(filas_originales)} | Fallas a revisar: {len(archivos_a_reprocesar)}")
+    print(f"📊 Total registros: {len(filas_originales)} | Fallas a revisar: {len(archivos_a_reprocesar)} | Sin cambios (manifiesto): {omitidas_manifiesto}")
     
     exitos = 0
     total_fallas = len(archivos_a_reprocesar)
+    # Índice por (OT rellenada, Resto_Nombre): cada actualización es una consulta, no un recorrido de todas las filas
+    filas_por_clave = almacen_resultados.indexar_filas(filas_originales)
+    # La carpeta de fotos se lee una sola vez para todas las búsquedas
+    indice = indice_fotos.construir_indice(CARPETA_IMAGENES) if archivos_a_reprocesar else None
 
     # 2. PROCESAR FALLAS CON BARRA DE PROGRESO
     # ----------------------------------------------------------------------
@@ -222,69 +236,64 @@ def procesar_fallas_csv():
         
         # Generar candidatos de nombre de archivo
         ot_pad = ot_raw.zfill(8) 
+        clave = almacen_resultados.clave_fila(ot_raw, resto)
         posibles_nombres_base = [ot_pad + resto, "00" + ot_raw + resto]
 
-        ruta_imagen_encontrada = None
         nombre_archivo_debug = ot_pad + resto # Nombre base para mensajes y debug
         
-        # Buscar la imagen en el disco
-        for nombre_base in posibles_nombres_base:
-            for ext in ('.jpg', '.jpeg', '.png', '.tiff'):
-                ruta_candidata = os.path.join(CARPETA_IMAGENES, nombre_base + ext)
-                if os.path.exists(ruta_candidata):
-                    ruta_imagen_encontrada = ruta_candidata
-                    break
-            if ruta_imagen_encontrada:
-                break
+        # Buscar la imagen en el índice de la carpeta
+        ruta_imagen_encontrada = indice_fotos.buscar_foto(indice, posibles_nombres_base, prefijo=False)
         
         if not ruta_imagen_encontrada:
             continue 
             
         try:
-            img_cv_original = cv2.imread(ruta_imagen_encontrada)
-            if img_cv_original is None: continue
+            # Recorte al 30% inferior (solo se conserva la franja)
+            img_30pct = lector_imagenes.cargar_franja_inferior(ruta_imagen_encontrada, RECORTE_PORCENTAJE)
+            if img_30pct is None: continue
 
             # EJECUTAR ANÁLISIS INTENSIVO
-            lat_ext, lon_ext, metodo = estrategia_30pct_inferior_intensiva(ruta_imagen_encontrada, img_cv_original)
+            lat_ext, lon_ext, metodo = estrategia_30pct_inferior_intensiva(ruta_imagen_encontrada, img_30pct)
 
             if lat_ext and lon_ext:
                 lat_dec = convertir_a_decimal(lat_ext)
                 lon_dec = convertir_a_decimal(lon_ext)
                 
-                # Buscamos la fila original en la lista completa para actualizarla
-                # Esto es crucial ya que el bucle itera sobre una sublista de fallas
-                for original_row in filas_originales:
-                    if original_row['OT'] == ot_raw and original_row['Resto_Nombre'] == resto:
-                        original_row['OT'] = ot_pad 
-                        original_row['Latitud_Extraida'] = lat_ext
-                        original_row['Longitud_Extraida'] = lon_ext
-                        original_row['Latitud_Decimal'] = lat_dec if lat_dec is not None else ''
-                        original_row['Longitud_Decimal'] = lon_dec if lon_dec is not None else ''
-                        original_row['Estatus'] = 'CORRECTO'
-                        original_row['Metodo_Extraccion'] = metodo
-                        
-                        exitos += 1
-                        tqdm.write(f"✔️ ¡ÉXITO! Coordenadas encontradas para {nombre_archivo_debug} (Método: {metodo})")
-                        break
+                # Buscamos la fila original en el índice para actualizarla
+                # (la clave no cambia aunque aquí se reescriba la OT rellenada)
+                original_row = filas_por_clave.get(clave)
+                if original_row is not None:
+                    original_row['OT'] = ot_pad 
+                    original_row['Latitud_Extraida'] = lat_ext
+                    original_row['Longitud_Extraida'] = lon_ext
+                    original_row['Latitud_Decimal'] = lat_dec if lat_dec is not None else ''
+                    original_row['Longitud_Decimal'] = lon_dec if lon_dec is not None else ''
+                    original_row['Estatus'] = 'CORRECTO'
+                    original_row['Metodo_Extraccion'] = metodo
+                    
+                    exitos += 1
+                    tqdm.write(f"✔️ ¡ÉXITO! Coordenadas encontradas para {nombre_archivo_debug} (Método: {metodo})")
             else:
                 # Si falló el reprocesamiento intensivo, actualizamos el método de extracción
-                for original_row in filas_originales:
-                    if original_row['OT'] == ot_raw and original_row['Resto_Nombre'] == resto and original_row['Estatus'] == ESTATUS_FALLO:
-                        original_row['Metodo_Extraccion'] = metodo
-                        break
+                original_row = filas_por_clave.get(clave)
+                if original_row is not None and original_row['Estatus'] == ESTATUS_FALLO:
+                    original_row['Metodo_Extraccion'] = metodo
 
 
         except Exception as e:
             # Si hay un error crítico durante el procesamiento de esta fila
-            for original_row in filas_originales:
-                if original_row['OT'] == ot_raw and original_row['Resto_Nombre'] == resto:
-                    original_row['Metodo_Extraccion'] = f'ERROR_CRITICO: {e}'
-                    tqdm.write(f"❌ Error en el procesamiento de {nombre_archivo_debug}: {e}")
-                    break
+            original_row = filas_por_clave.get(clave)
+            if original_row is not None:
+                original_row['Metodo_Extraccion'] = f'ERROR_CRITICO: {e}'
+                tqdm.write(f"❌ Error en el procesamiento de {nombre_archivo_debug}: {e}")
 
     # 3. GUARDAR
-    # Exportamos la lista completa de filas_originales (ya actualizadas)
-    exportar_a_csv(filas_originales, CSV_SALIDA)
+    # Con el almacén solo se reescriben las filas reprocesadas (upsert por posición)
+    if exportar:
+        if ordenes_almacen is not None:
+            almacen_resultados.actualizar_filas(ordenes_almacen, filas_originales)
+        else:
+            almacen_resultados.guardar_filas(filas_originales)
 
     # Contar los registros que todavía están en fallo después del reprocesamiento
     fallas_restantes = total_fallas - exitos
@@ -295,8 +304,11 @@ def procesar_fallas_csv():
     print(f"📊 Total de Fallas Revisadas: {total_fallas}")
     print(f"✅ Coordenadas Recuperadas: {exitos}")
     print(f"❌ Fallos Persistentes: {fallas_restantes}")
+    ocr_motor.informar_variantes_de_mas()
     print("="*50 + "\n")
 
+    return filas_originales if ordenes_almacen is None else almacen_resultados.leer_filas()
+
 
 # --------------------------------------------------------------------------
 # III. CONFIGURACIÓN DE EJECUCIÓN (MODIFICADA PARA RECIBIR ARGUMENTOS)
@@ -320,6 +332,7 @@ def main():
         # Configurar Tesseract con la ruta dinámica
         pytesseract.pytesseract.tesseract_cmd = tesseract_path
         print(f"[proceso2.py] Configurando Tesseract con la ruta dinámica: '{tesseract_path}'")
+        print(f"[proceso2.py] Motor OCR (variable OCR_MOTOR): '{ocr_motor.seleccionar_motor(ocr_motor.MOTOR_OCR)}'")
         
         procesar_fallas_csv()
     except IndexError as e:
@@ -5,6 +5,13 @@ import cv2
 import numpy as np 
 from PIL import Image, ImageDraw, ImageFont # Módulos para dibujar en imágenes
 import pytesseract
+import lector_imagenes # Lectura de la franja inferior de cada foto
+import indice_fotos # Índice de la carpeta de fotos (una sola lectura por ejecución)
+import manifiesto # Resultados de ejecuciones anteriores (fotos sin cambios)
+import almacen_resultados # Almacén SQLite: solo se leen y escriben las filas con fallo
+import ocr_motor # Motor OCR compartido (pytesseract o libtesseract residente, lotes de variantes)
+import grafo_preproceso # Pasos intermedios (gris, CLAHE, umbrales...) calculados una vez por imagen
+import coordenadas_ocr # Lector único de coordenadas en el texto OCR (candidatos ordenados)
 from collections import Counter 
 import sys # 🛑 Importado para leer argumentos de línea de comandos
 
@@ -18,6 +25,8 @@ CARPETA_IMAGENES = 'fotos'
 CSV_ENTRADA = 'resultados_coordenadas.csv' 
 CSV_SALIDA = 'resultados_coordenadas.csv' 
 ESTATUS_FALLO = 'NO ENCONTRADO' 
+# Las variantes de una foto que comparten PSM se reconocen en una sola llamada a Tesseract
+OCR_POR_LOTES = True
 ESTATUS_EXITO = 'CORRECTO' # Definir el estado de éxito
 
 # =========================================================================
@@ -40,10 +49,6 @@ RANGOS_CIUDADES = {
     'SAN LUIS POTOSI': (21.0, 23.0, -102.0, -100.0), 'TOLUCA': (18.5, 20.5, -100.5, -98.5) 
 }
 
-# --- PATRONES ROBUSTOS ---
-PATRON_DMS_ROBUSTO = r'(\d{1,2}°\d{1,2}\'\d{1,2}\")[\s,\-\/]*(-?\d{1,3}°\d{1,2}\'\d{1,2}\")'
-PATRON_DECIMAL_ROBUSTO = r'(-?\d{1,3}\.\d+[NS])[\s,\-\/]*(-?\d{1,3}\.\d+[WE])' 
-
 def obtener_rangos_por_ciudad(ciudad):
     """Devuelve los rangos específicos para la ciudad."""
     return RANGOS_CIUDADES.get(ciudad.upper())
@@ -140,30 +145,56 @@ def reducir_escala(img_cv, factor_escala):
 def reconocer_y_extraer_robusto(img_pil, config_ocr='--psm 6'):
     """Aplica OCR y usa patrones robustos de DMS y Decimal."""
     try:
-        texto_extraido = pytesseract.image_to_string(img_pil, lang='eng', config=config_ocr)
-        
-        # 1. Intento Decimal
-        match_dec = re.search(PATRON_DECIMAL_ROBUSTO, texto_extraido, re.IGNORECASE)
-        if match_dec:
-              lat, lon = match_dec.groups()
-              return lat.strip().upper(), lon.strip().upper(), "Patron_Decimal_Robusto"
-
-        # 2. Intento DMS
-        match_dms = re.search(PATRON_DMS_ROBUSTO, texto_extraido)
-        if match_dms:
-              lat, lon = match_dms.groups()
-              return lat.strip(), lon.strip(), "Patron_DMS_Robusto"
-        
+        texto_extraido = ocr_motor.reconocer(img_pil, config_ocr=config_ocr)
+        return extraer_coordenadas_robusto(texto_extraido)
+    except Exception:
+        pass
+    return None, None, "Fallo_Patron"
+
+def extraer_coordenadas_robusto(texto_extraido, rango=None):
+    """
+    Candidato más creíble del texto del OCR (ver coordenadas_ocr; 'rango' es el de la ciudad).
+    Los DMS llegan ya convertidos a decimal, así que se validan como los demás.
+    """
+    try:
+        candidato = coordenadas_ocr.mejor_candidato(texto_extraido, rango)
+        if candidato is not None:
+            lat, lon = coordenadas_ocr.completar_cardinales(candidato[0], candidato[1])
+            metodo = "Patron_Sexagesimal_Robusto" if candidato[2] == 'dms' else "Patron_Decimal_Robusto"
+            return lat, lon, metodo
     except Exception:
         pass
     return None, None, "Fallo_Patron"
 
-def preprocesar_otsu(img_cv):
-    """Aplica Binarización de Otsu para alto contraste."""
+def reconocer_variantes_robusto(variantes):
+    """
+    Evalúa en orden las variantes (img_pil, config_ocr, sufijo_metodo) de una foto y
+    devuelve el primer resultado con coordenadas. Con OCR_POR_LOTES las variantes que
+    comparten PSM se reconocen juntas en una sola llamada a Tesseract, hasta la primera que da
+    coordenadas (ver ocr_motor.reconocer_variantes).
+    """
+    if OCR_POR_LOTES:
+        def aceptar(_, texto):
+            lat, lon, _ = extraer_coordenadas_robusto(texto)
+            return bool(lat and lon)
+        try:
+            textos = ocr_motor.reconocer_variantes([(img_pil, config_ocr) for img_pil, config_ocr, _ in variantes], aceptar=aceptar)
+        except Exception:
+            textos = [''] * len(variantes)
+        resultados = (extraer_coordenadas_robusto(texto or '') for texto in textos)
+    else:
+        resultados = (reconocer_y_extraer_robusto(img_pil, config_ocr=config_ocr) for img_pil, config_ocr, _ in variantes)
+
+    for (_, _, sufijo), (lat, lon, metodo) in zip(variantes, resultados):
+        if lat and lon: return lat, lon, f"{metodo}_{sufijo}"
+    return None, None, None
+
+def preprocesar_otsu(img_cv, grafo=None):
+    """Aplica Binarización de Otsu para alto contraste (con 'grafo' se reutiliza su gris, ver grafo_preproceso)."""
     if img_cv is None or img_cv.size == 0: return None
-    gris = cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY)
-    _, binaria = cv2.threshold(gris, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-    return binaria
+    if grafo is None:
+        grafo = grafo_preproceso.nuevo_grafo(img_cv)
+    return grafo_preproceso.nodo(grafo, 'otsu_inv')
 
 def dibujar_coordenadas_en_imagen(img_pil, lat_str, lon_str):
     """Superpone las coordenadas extraídas en una imagen PIL para diagnóstico."""
@@ -196,32 +227,29 @@ def intento_multinivel_robusto(img_cv_recortada, nombre_debug=""):
     # ----------------------------------------------------------------------
     # --- INTENTO 0: ESCALADO 50% y RAW OCR (Optimización de ruido) ---
     # ----------------------------------------------------------------------
-    img_cv_escalada = reducir_escala(img_cv_recortada, factor_escala=FACTOR_ESCALA_OCR)
-    if img_cv_escalada is not None:
-        img_pil_escalada = Image.fromarray(cv2.cvtColor(img_cv_escalada, cv2.COLOR_BGR2RGB))
-        lat, lon, metodo = reconocer_y_extraer_robusto(img_pil_escalada, config_ocr='--psm 6')
-        if lat and lon: return lat, lon, f"{metodo}_ESCALADO_{int(FACTOR_ESCALA_OCR*100)}_PSM6"
+    variantes = []
+    grafo = grafo_preproceso.nuevo_grafo(img_cv_recortada) # RGB y gris se calculan una sola vez
+    grafo_escalado = grafo_preproceso.derivar(grafo, 'escalado', lambda img: reducir_escala(img, factor_escala=FACTOR_ESCALA_OCR))
+    if grafo_escalado is not None:
+        img_pil_escalada = Image.fromarray(grafo_preproceso.nodo(grafo_escalado, 'rgb'))
+        variantes.append((img_pil_escalada, '--psm 6', f"ESCALADO_{int(FACTOR_ESCALA_OCR*100)}_PSM6"))
 
+    img_pil_raw = Image.fromarray(grafo_preproceso.nodo(grafo, 'rgb'))
+    img_procesada = preprocesar_otsu(img_cv_recortada, grafo)
 
-    # --- INTENTO 1: RAW OCR (Sin preprocesamiento) con PSM 6 ---
-    img_pil_raw = Image.fromarray(cv2.cvtColor(img_cv_recortada, cv2.COLOR_BGR2RGB))
-    lat, lon, metodo = reconocer_y_extraer_robusto(img_pil_raw, config_ocr='--psm 6')
-    if lat and lon: return lat, lon, f"{metodo}_RAW_PSM6"
+    variantes.append((img_pil_raw, '--psm 6', "RAW_PSM6"))   # INTENTO 1: RAW OCR (Sin preprocesamiento) con PSM 6
+    variantes.append((img_pil_raw, '--psm 11', "RAW_PSM11")) # INTENTO 2: RAW OCR con PSM 11 (Sparse Text)
+    if img_procesada is not None:
+        img_pil_procesada = Image.fromarray(img_procesada)
+        variantes.append((img_pil_procesada, '--psm 6', "PROCESADO_OTSU_PSM6")) # INTENTO 3: PROCESADO OCR (Binarización Otsu) con PSM 6
 
-    # --- INTENTO 2: RAW OCR (Sin preprocesamiento) con PSM 11 (Sparse Text) ---
-    lat, lon, metodo = reconocer_y_extraer_robusto(img_pil_raw, config_ocr='--psm 11')
-    if lat and lon: return lat, lon, f"{metodo}_RAW_PSM11"
+    lat, lon, metodo = reconocer_variantes_robusto(variantes)
+    if lat and lon: return lat, lon, metodo
 
-    # --- INTENTO 3: PROCESADO OCR (Binarización Otsu) con PSM 6 ---
-    img_procesada = preprocesar_otsu(img_cv_recortada)
     if img_procesada is None:
         if nombre_debug:
-            Image.fromarray(cv2.cvtColor(img_cv_recortada, cv2.COLOR_BGR2RGB)).save(os.path.join('diagnostico_ocr', f"DEBUG_{nombre_debug}_Recorte_NoProc.png"))
+            img_pil_raw.save(os.path.join('diagnostico_ocr', f"DEBUG_{nombre_debug}_Recorte_NoProc.png"))
         return None, None, "Error_Preprocesamiento"
-        
-    img_pil_procesada = Image.fromarray(img_procesada)
-    lat, lon, metodo = reconocer_y_extraer_robusto(img_pil_procesada, config_ocr='--psm 6')
-    if lat and lon: return lat, lon, f"{metodo}_PROCESADO_OTSU_PSM6"
 
     # Si falla completamente, guardar imágenes de diagnóstico
     if nombre_debug:
@@ -237,8 +265,14 @@ def intento_multinivel_robusto(img_cv_recortada, nombre_debug=""):
 # --------------------------------------------------------------------------
 
 # 🛑 Acepta 'ciudad_seleccionada' como argumento
-def procesar_fallas_csv(ciudad_seleccionada):
-    """Lee el CSV, identifica fallas, procesa SOLO esas imágenes y actualiza el CSV."""
+def procesar_fallas_csv(ciudad_seleccionada, filas=None, exportar=True):
+    """
+    Identifica las fallas, procesa SOLO esas imágenes y actualiza sus filas.
+    Si se reciben 'filas' (pipeline en proceso) se trabaja sobre ellas en memoria; si no,
+    se consultan del almacén SOLO las filas con fallo y al final se actualizan solo esas.
+    Con exportar=False no se tocan el almacén ni el CSV; el manifiesto y las imágenes de
+    diagnóstico se escriben siempre. Devuelve la lista completa de filas actualizada.
+    """
     
     # 0. CONFIGURACIÓN DE CONTEXTO DE CIUDAD (Usando el valor recibido por sys.argv)
     print("\n\n--- CONTEXTO DE CIUDAD ---")
@@ -255,33 +289,39 @@ def procesar_fallas_csv(ciudad_seleccionada):
 
     print("--- 🚀 Iniciando Reprocesamiento de Fallas (Multinivel Robusto) ---")
     
+    # 1. LEER CSV (o usar las filas recibidas en memoria) y FILTRAR por ESTATUS_FALLO
+    ordenes_almacen = None
+    if filas is not None:
+        filas_leidas = filas
+    else:
+        ordenes_almacen, filas_leidas = almacen_resultados.fallas_para_reproceso(ESTATUS_FALLO, CSV_ENTRADA)
+    if filas_leidas is None:
+        return None
+
     filas_originales = []
     archivos_a_reprocesar_indices = []
+    # Fallas ya reintentadas en una ejecución anterior sobre la misma foto (ver manifiesto.py)
+    claves_previas = manifiesto.claves_sin_cambios(CARPETA_IMAGENES, rangos_especificos)
+    omitidas_manifiesto = 0
+    campos_esperados = ['OT', 'Resto_Nombre', 'Latitud_Extraida', 'Longitud_Extraida', 'Latitud_Decimal', 'Longitud_Decimal', 'Estatus', 'Metodo_Extraccion']
     
-    # 1. LEER CSV y FILTRAR por ESTATUS_FALLO
-    try:
-        with open(CSV_ENTRADA, 'r', newline='', encoding='utf-8') as archivo_csv:
-            lector = csv.DictReader(archivo_csv)
-            campos_esperados = ['OT', 'Resto_Nombre', 'Latitud_Extraida', 'Longitud_Extraida', 'Latitud_Decimal', 'Longitud_Decimal', 'Estatus', 'Metodo_Extraccion']
-            
-            for i, fila in enumerate(lector):
-                fila_completa = {campo: fila.get(campo, '') for campo in campos_esperados}
-                filas_originales.append(fila_completa)
-                
-                # Filtrar SOLO las filas que tienen el estado de FALLO
-                if fila_completa.get('Estatus', '').strip().upper() == ESTATUS_FALLO:
-                    archivos_a_reprocesar_indices.append(i)
-    except FileNotFoundError:
-        print(f"❌ Error: El archivo de entrada '{CSV_ENTRADA}' no se encontró. Asegúrate de que exista.")
-        return
-    except Exception as e:
-        print(f"❌ Error crítico leyendo CSV: {e}")
-        return
+    for i, fila in enumerate(filas_leidas):
+        fila_completa = {campo: fila.get(campo, '') for campo in campos_esperados}
+        filas_originales.append(fila_completa)
+        
+        # Filtrar SOLO las filas que tienen el estado de FALLO
+        if fila_completa.get('Estatus', '').strip().upper() == ESTATUS_FALLO:
+            if almacen_resultados.clave_fila(fila_completa['OT'], fila_completa['Resto_Nombre']) in claves_previas:
+                omitidas_manifiesto += 1
+                continue
+            archivos_a_reprocesar_indices.append(i)
 
-    print(f"📊 Total registros: {len(filas_originales)} | Fallas a revisar: {len(archivos_a_reprocesar_indices)}")
+    print(f"📊 Total registros: {len(filas_originales)} | Fallas a revisar: {len(archivos_a_reprocesar_indices)} | Sin cambios (manifiesto): {omitidas_manifiesto}")
     
     exitos = 0
     total_procesado = 0
+    # La carpeta de fotos se lee una sola vez para todas las búsquedas
+    indice = indice_fotos.construir_indice(CARPETA_IMAGENES) if archivos_a_reprocesar_indices else None
     
     # 2. PROCESAR SOLO LAS FILAS FILTRADAS
     for index in archivos_a_reprocesar_indices:
@@ -294,23 +334,10 @@ def procesar_fallas_csv(ciudad_seleccionada):
         ot_base = ot_raw.zfill(8)
         nombre_base = ot_base + resto # Nombre original para debug
 
-        ruta_imagen_encontrada = None
-        
         print(f"\n[{total_procesado}/{len(archivos_a_reprocesar_indices)}] ⏳ Analizando Archivo: {nombre_base}")
         
-        # Lógica de búsqueda robusta
-        EXTENSIONES_IMAGEN = ('.jpg', '.jpeg', '.png', '.tiff', '.webp') 
-        nombre_busqueda_limpio = (ot_base + resto).upper().replace(' ', '').replace('_', '')
-        
-        for archivo_en_carpeta in os.listdir(CARPETA_IMAGENES):
-            if not archivo_en_carpeta.lower().endswith(EXTENSIONES_IMAGEN):
-                continue
-            nombre_sin_extension = os.path.splitext(archivo_en_carpeta)[0]
-            nombre_archivo_limpio = nombre_sin_extension.upper().replace(' ', '').replace('_', '')
-
-            if nombre_archivo_limpio.startswith(nombre_busqueda_limpio):
-                ruta_imagen_encontrada = os.path.join(CARPETA_IMAGENES, archivo_en_carpeta)
-                break 
+        # Búsqueda robusta (nombre normalizado por prefijo) en el índice de la carpeta
+        ruta_imagen_encontrada = indice_fotos.buscar_foto(indice, [nombre_base])
         
         if not ruta_imagen_encontrada:
             fila['Metodo_Extraccion'] = 'Error_Ruta_Final'
@@ -318,16 +345,12 @@ def procesar_fallas_csv(ciudad_seleccionada):
             continue 
             
         try:
-            img_cv_original = cv2.imread(ruta_imagen_encontrada)
+            # Recortar la zona inferior (40%), solo se conserva la franja
+            img_cv_recortada = lector_imagenes.cargar_franja_inferior(ruta_imagen_encontrada, RECORTE_PORCENTAJE)
             
-            if img_cv_original is None: 
+            if img_cv_recortada is None: 
                 print(f" 	❌ Error: No se pudo cargar la imagen OpenCV desde '{ruta_imagen_encontrada}'.")
                 continue
-
-            # Recortar la zona inferior (40%)
-            height, width = img_cv_original.shape[:2]
-            y_start = int(height * (1 - RECORTE_PORCENTAJE))
-            img_cv_recortada = img_cv_original[y_start:height, 0:width]
             
             # EJECUTAR ANÁLISIS MULTINIVEL
             lat_ext, lon_ext, metodo = intento_multinivel_robusto(img_cv_recortada, nombre_debug=nombre_base)
@@ -352,14 +375,8 @@ def procesar_fallas_csv(ciudad_seleccionada):
                 
                 # VALIDACIÓN GEOGRÁFICA
                 es_valido = False
-                # Si es DMS, se acepta si es extraído, ya que la conversión decimal es compleja/ausente
-                if 'Patron_DMS' in metodo:
-                    es_valido = True
-                    # No guardar decimales para DMS
-                    lat_dec_final = ''
-                    lon_dec_final = ''
-                # Si es Decimal, debe pasar ambos filtros: Rango Mundial y Rango de Proximidad
-                elif validar_rango_geografico(lat_dec, lon_dec) and validar_rango_proximidad(lat_dec, lon_dec, lat_min, lat_max, lon_min, lon_max):
+                # Debe pasar ambos filtros: Rango Mundial y Rango de Proximidad (el DMS ya llega en decimal)
+                if validar_rango_geografico(lat_dec, lon_dec) and validar_rango_proximidad(lat_dec, lon_dec, lat_min, lat_max, lon_min, lon_max):
                     es_valido = True
 
                 # --- RESULTADO DE LA VALIDACIÓN ---
@@ -401,8 +418,21 @@ def procesar_fallas_csv(ciudad_seleccionada):
             # Si hay un error crítico, el estado se mantiene en ESTATUS_FALLO
 
     # 3. GUARDAR TODAS LAS FILAS ACTUALIZADAS EN EL CSV DE SALIDA
-    exportar_a_csv(filas_originales, CSV_SALIDA)
+    if exportar:
+        if ordenes_almacen is not None:
+            almacen_resultados.actualizar_filas(ordenes_almacen, filas_originales)
+            filas_originales = almacen_resultados.leer_filas() # Lista completa para el CSV y el manifiesto
+        else:
+            almacen_resultados.guardar_filas(filas_originales)
+        # proceso4 es la última etapa de OCR: aquí se exporta el CSV que consume proceso5
+        almacen_resultados.exportar_csv(CSV_SALIDA)
     print(f"\n✨ REPORTE FINAL: Se recuperaron {exitos} coordenadas adicionales.")
+    ocr_motor.informar_variantes_de_mas()
+
+    # proceso4 es la última etapa de OCR: su resultado es el que se guarda en el manifiesto
+    manifiesto.actualizar_manifiesto(filas_originales, rangos_especificos)
+
+    return filas_originales
 
 # --------------------------------------------------------------------------
 # IV. CONFIGURACIÓN DE EJECUCIÓN (MODIFICADA PARA RECIBIR ARGUMENTOS)
@@ -435,6 +465,7 @@ if __name__ == '__main__':
         # Configurar Tesseract con la ruta dinámica
         pytesseract.pytesseract.tesseract_cmd = tesseract_path
         print(f"[proceso4.py] Configurando Tesseract con la ruta dinámica: '{tesseract_path}'")
+        print(f"[proceso4.py] Motor OCR (variable OCR_MOTOR): '{ocr_motor.seleccionar_motor(ocr_motor.MOTOR_OCR)}'")
         
         print(f"[proceso4.py] Recibida CIUDAD desde el orquestador: '{ciudad_input}'")
         procesar_fallas_csv(ciudad_input)
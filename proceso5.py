@@ -3,6 +3,8 @@ import numpy as np
 import os
 import sys
 import csv
+import indice_espacial # Rejilla del catálogo de elementos: vecino más cercano sin producto cruzado
+import catalogo_elementos # elementos.csv leído una vez y guardado en caché binaria (con su índice)
 
 # --- CONFIGURACIÓN DE ARCHIVOS ---
 # 🛑 CORREGIDO: Usar el archivo de resultados consolidado
@@ -11,22 +13,43 @@ ARCHIVO_ELEMENTOS = 'elementos.csv'
 ARCHIVO_SALIDA = 'resultados_distancia_final_completo.csv'
 
 # --- FÓRMULA DE HAVERSINE ---
-def haversine(lat1, lon1, lat2, lon2):
-    R = 6371000 # Radio de la Tierra en metros
-    lat1_rad = np.radians(lat1); lon1_rad = np.radians(lon1)
-    lat2_rad = np.radians(lat2); lon2_rad = np.radians(lon2)
-    dlat = lat2_rad - lat1_rad; dlon = lon2_rad - lon1_rad
-    a = np.sin(dlat / 2.0)**2 + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(dlon / 2.0)**2
-    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
-    return R * c
+haversine = indice_espacial.haversine # Metros; la usa también el índice del catálogo
+
+# --- CARGA DE RESULTADOS EN MEMORIA ---
+CAMPOS_ORIGEN = ['OT', 'Resto_Nombre', 'Latitud_Extraida', 'Longitud_Extraida', 'Latitud_Decimal', 'Longitud_Decimal', 'Estatus', 'Metodo_Extraccion']
+COLUMNAS_NUMERICAS = ['OT', 'Latitud_Decimal', 'Longitud_Decimal'] # Las que pd.read_csv lee como números
+
+def _numerica(serie):
+    """La columna como números si todos sus valores lo son (como pd.read_csv); si no, sin cambios."""
+    try:
+        return pd.to_numeric(serie)
+    except (ValueError, TypeError):
+        return serie
+
+def cargar_origen_desde_filas(filas):
+    """
+    Construye df_origen a partir de las filas recibidas del pipeline en proceso, con los
+    mismos tipos que da pd.read_csv sobre ARCHIVO_ORIGEN: vacíos como NaN y OT y las
+    coordenadas decimales numéricos ('00000011' -> 11).
+    """
+    df = pd.DataFrame(filas, columns=CAMPOS_ORIGEN)
+    df = df.mask(df.isna() | (df == ''))
+    for columna in COLUMNAS_NUMERICAS:
+        df[columna] = _numerica(df[columna])
+    return df
 
 # --- FUNCIÓN PRINCIPAL DE PROCESAMIENTO ---
 
-def procesar_archivos():
-    print(f"Iniciando procesamiento de {ARCHIVO_ORIGEN} y {ARCHIVO_ELEMENTOS}...")
+def procesar_archivos(filas_origen=None):
+    """
+    Calcula el match más cercano de cada registro contra elementos.csv.
+    Si se reciben 'filas_origen' (pipeline en proceso) no se lee ARCHIVO_ORIGEN.
+    """
+    origen_descripcion = ARCHIVO_ORIGEN if filas_origen is None else 'resultados en memoria'
+    print(f"Iniciando procesamiento de {origen_descripcion} y {ARCHIVO_ELEMENTOS}...")
     
     # 1. Cargar datos y verificar existencia de archivos
-    archivos_requeridos = [ARCHIVO_ORIGEN, ARCHIVO_ELEMENTOS]
+    archivos_requeridos = [ARCHIVO_ELEMENTOS] if filas_origen is not None else [ARCHIVO_ORIGEN, ARCHIVO_ELEMENTOS]
     for archivo in archivos_requeridos:
         if not os.path.exists(archivo):
             print(f"❌ ERROR: El archivo '{archivo}' no existe. Por favor, asegúrate de que esté en la carpeta y que los procesos anteriores lo hayan generado.")
@@ -45,12 +68,13 @@ def procesar_archivos():
 
     try:
         # Intentar cargar archivos
-        df_origen = pd.read_csv(ARCHIVO_ORIGEN)
-        # Usamos 'utf-8' como principal, luego 'latin-1' como fallback para 'elementos.csv'
-        try:
-            df_elementos = pd.read_csv(ARCHIVO_ELEMENTOS, encoding='utf-8')
-        except UnicodeDecodeError:
-            df_elementos = pd.read_csv(ARCHIVO_ELEMENTOS, encoding='latin-1')
+        if filas_origen is not None:
+            df_origen = cargar_origen_desde_filas(filas_origen)
+        else:
+            df_origen = pd.read_csv(ARCHIVO_ORIGEN)
+        # Catálogo con tipos fijos e índice espacial, de la caché si 'elementos.csv' no cambió
+        # (la codificación utf-8 / latin-1 se detecta al leerlo; ver catalogo_elementos)
+        df_elementos, indice = catalogo_elementos.cargar_catalogo(ARCHIVO_ELEMENTOS)
             
     except FileNotFoundError:
         # Este error solo debería ocurrir si la verificación anterior falló
@@ -95,54 +119,38 @@ def procesar_archivos():
     print(f" 	Registros originales: {filas_originales}. Registros a procesar: {len(df_calc_valid)}.")
 
 
-    # 3. Preparar el DataFrame de Elementos
-    print("Preparando datos de elementos...")
-    
-    # 🛑 Asegurar que la columna de merge sea 'elemento_merge' para la consistencia
-    df_elementos = df_elementos.rename(columns={
-        'Latitud': 'latitud_elemento', 
-        'Longitud': 'longitud_elemento', 
-        'segmento': 'segmento_elemento',
-        'elemento': 'elemento_merge' # Asegurar que la columna de merge sea la misma
-    })
-    
-    df_elementos['coordenada_elemento'] = df_elementos['latitud_elemento'].astype(str) + ',' + df_elementos['longitud_elemento'].astype(str)
-    df_elementos['latitud_elemento'] = pd.to_numeric(df_elementos['latitud_elemento'], errors='coerce')
-    df_elementos['longitud_elemento'] = pd.to_numeric(df_elementos['longitud_elemento'], errors='coerce')
+    # 3. El DataFrame de Elementos ya viene preparado (columnas elemento_merge, coordenada_elemento,
+    # segmento_elemento, latitud_elemento, longitud_elemento) con su índice espacial
 
-    # 4. Realizar la Unión (Merge)
-    print("Realizando la comparación (se permite duplicación temporal)...")
-    
-    calc_cols = ['ot', 'elemento_merge', 'coordenada', 'latitud_origen', 'longitud_origen', 'estatus_match']
-    elementos_cols = ['elemento_merge', 'coordenada_elemento', 'segmento_elemento', 'latitud_elemento', 'longitud_elemento']
+    # 4. Vecino más cercano del mismo elemento en el índice del catálogo
+    # (sin unir cada registro con todas las filas de su elemento; ver indice_espacial)
+    print("Buscando el elemento más cercano (Haversine)...")
     
-    # Merge usando la columna consistente 'elemento_merge'
-    df_merged = pd.merge(df_calc_valid[calc_cols], df_elementos[elementos_cols], on='elemento_merge', how='left')
-
-    # 5. Cálculo de Distancia
-    print("Calculando distancias (Haversine)...")
-    
-    valid_coords_mask = df_merged['latitud_origen'].notna() & df_merged['longitud_origen'].notna() & \
-                        df_merged['latitud_elemento'].notna() & df_merged['longitud_elemento'].notna()
-    
-    df_merged['distancia_float'] = np.nan
-    
-    df_merged.loc[valid_coords_mask, 'distancia_float'] = haversine(
-        df_merged.loc[valid_coords_mask, 'latitud_origen'], df_merged.loc[valid_coords_mask, 'longitud_origen'],
-        df_merged.loc[valid_coords_mask, 'latitud_elemento'], df_merged.loc[valid_coords_mask, 'longitud_elemento']
+    posiciones, distancias = indice_espacial.vecinos_mas_cercanos(
+        indice, df_calc_valid['elemento_merge'], df_calc_valid['latitud_origen'], df_calc_valid['longitud_origen']
     )
+    con_match = posiciones >= 0
+    elementos_match = df_elementos.iloc[posiciones[con_match]]
+    
+    # 5. Registros con su elemento más cercano
+    df_with_match = pd.DataFrame({
+        'ot': df_calc_valid['ot'].to_numpy()[con_match],
+        'coordenada': df_calc_valid['coordenada'].to_numpy()[con_match],
+        'coordenada_elemento': elementos_match['coordenada_elemento'].to_numpy(),
+        'distancia_float': distancias[con_match],
+        'segmento_elemento': elementos_match['segmento_elemento'].to_numpy(),
+    }, index=df_calc_valid.index[con_match])
     
     # 6. Desduplicación y Selección del Mejor Match
     print("Seleccionando el match más cercano (distancia mínima) para cada registro...")
     
-    df_with_match = df_merged.dropna(subset=['distancia_float']).copy()
-    
     match_output_cols_base = ['ot', 'coordenada', 'coordenada_elemento', 'distancia_float', 'segmento_elemento']
     
     if df_with_match.empty:
-        df_best_match = pd.DataFrame(columns=match_output_cols_base + ['estatus_match'])
+        df_best_match = pd.DataFrame(columns=match_output_cols_base + ['estatus_match_y'])
     else:
         # Agrupamos por ot y coordenada (origen) para encontrar la distancia mínima
+        # (registros repetidos de la misma OT y coordenada se quedan con el mejor de todos)
         idx = df_with_match.groupby(['ot', 'coordenada'])['distancia_float'].idxmin()
         df_best_match = df_with_match.loc[idx].copy()
         
@@ -215,5 +223,7 @@ def procesar_archivos():
     print(f"Registros de Salida generados: {len(df_salida)}")
     print("-" * 50)
 
+    return df_salida
+
 if __name__ == "__main__":
     procesar_archivos()
\ No newline at end of file
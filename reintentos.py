@@ -0,0 +1,481 @@
+import os
+import sys
+import cv2
+from PIL import Image
+import pytesseract
+import lector_imagenes # Lectura de la franja inferior de cada foto (una sola vez por foto)
+import indice_fotos # Índice de la carpeta de fotos (una sola lectura por ejecución)
+import localizador_sello # Rectángulo ajustado del sello (perfiles de proyección)
+import manifiesto # Resultados de ejecuciones anteriores (fotos sin cambios)
+import almacen_resultados # Almacén SQLite: solo se leen y escriben las filas con fallo
+import ocr_motor # Motor OCR compartido (pytesseract o libtesseract residente, lotes de variantes)
+import cache_ocr # Tiempo de OCR de cada estrategia (con el costo original de los textos de la caché)
+import planificador_pasadas # Orden de las estrategias por aciertos por segundo de OCR (historial)
+import grafo_preproceso # Pasos intermedios (gris, CLAHE, umbrales...) calculados una vez por foto
+import revalidacion # Coordenadas crudas del OCR por foto (revalidación sin OCR)
+import proceso1 # Opciones de línea de comandos compartidas (--estrategias, --motor, ...)
+import proceso2 # Preprocesamiento intensivo y patrones flexibles
+import proceso4 # Otsu, escalado, patrones robustos y validación geográfica
+
+# =========================================================================
+# 📌 MOTOR ÚNICO DE REINTENTOS (reemplaza a proceso2, proceso3 y proceso4)
+# =========================================================================
+# Antes cada falla de proceso1 pasaba por tres scripts casi iguales: cada uno
+# releía el CSV, volvía a buscar la foto, la decodificaba de nuevo, la recortaba
+# a su manera (30% o 40%) y probaba su propia lista fija de variantes; además
+# proceso4 repetía las tres variantes que proceso3 ya había probado.
+# Aquí la foto se decodifica UNA vez (franja del 40%; la del 30% es una vista de
+# ella) y se prueban en orden las estrategias de ESTRATEGIAS, deteniéndose en la
+# primera cuyo resultado pasa la validación geográfica. La estrategia ganadora
+# queda registrada en Metodo_Extraccion.
+# Si no se eligen estrategias con --estrategias, el orden de cada foto lo decide
+# planificador_pasadas con los aciertos y el costo de OCR de ejecuciones anteriores.
+
+CARPETA_IMAGENES = 'fotos'
+CSV_ENTRADA = 'resultados_coordenadas.csv'
+CSV_SALIDA = 'resultados_coordenadas.csv'
+ESTATUS_FALLO = 'NO ENCONTRADO'
+ESTATUS_EXITO = 'CORRECTO'
+GRUPO_PASADAS = 'reintentos' # Grupo de las estadísticas de planificador_pasadas
+# Con OCR_POR_LOTES las estrategias se reconocen en bloques de TAMANO_BLOQUE
+# (las que comparten PSM van en una sola llamada a Tesseract); el resultado se
+# elige en el mismo orden de la lista, así que solo cambia el número de llamadas.
+# Con el orden adaptativo las estrategias se reconocen una por una: el planificador
+# necesita el costo de cada una y no debe contar como fallas las que nunca habrían corrido.
+OCR_POR_LOTES = True
+TAMANO_BLOQUE = 4
+
+# Formato: (nombre, porcentaje_franja, preproceso, config_ocr, extractor)
+#   preproceso: clave de PREPROCESOS; extractor: clave de EXTRACTORES.
+# El orden es el de las etapas anteriores (proceso2, proceso3 y lo nuevo de proceso4),
+# precedido por la línea del sello localizada, que es la más barata de reconocer.
+ESTRATEGIAS = [
+    ("SELLO_OTSU_PSM7", 0.40, 'sello', '--psm 7', 'robusto'),
+    ("Intensivo_inferior_optimizado_PSM3", 0.30, 'inferior_optimizado', '--psm 3', 'mejorado'),
+    ("Intensivo_inferior_optimizado_PSM6", 0.30, 'inferior_optimizado', '--psm 6', 'mejorado'),
+    ("Intensivo_alto_contraste_PSM3", 0.30, 'alto_contraste', '--psm 3', 'mejorado'),
+    ("Intensivo_alto_contraste_PSM6", 0.30, 'alto_contraste', '--psm 6', 'mejorado'),
+    ("RAW_PSM6", 0.40, 'raw', '--psm 6', 'robusto'),
+    ("RAW_PSM11", 0.40, 'raw', '--psm 11', 'robusto'),
+    ("PROCESADO_OTSU_PSM6", 0.40, 'otsu', '--psm 6', 'robusto'),
+    (f"ESCALADO_{int(proceso4.FACTOR_ESCALA_OCR*100)}_PSM6", 0.40, 'escalado', '--psm 6', 'robusto'),
+]
+NOMBRES_ESTRATEGIAS = [estrategia[0] for estrategia in ESTRATEGIAS]
+
+
+def _a_rgb(img_cv):
+    return cv2.cvtColor(img_cv, cv2.COLOR_BGR2RGB) if img_cv is not None and img_cv.size else None
+
+
+def _sello_una_linea(grafo):
+    """Línea del sello binarizada (Otsu); None si no se localizó una sola línea clara."""
+    gris = grafo_preproceso.nodo(grafo, 'gris')
+    caja = localizador_sello.localizar_sello(gris)
+    if caja is None or caja[4] != 1:
+        return None
+    x0, y0, x1, y1, _ = caja
+    recorte = gris[y0:y1, x0:x1]
+    return grafo_preproceso.nodo(grafo_preproceso.nuevo_grafo(recorte), 'otsu_inv') if recorte.size else None
+
+
+def _escalado(grafo):
+    grafo_escalado = grafo_preproceso.derivar(grafo, 'escalado', lambda img: proceso4.reducir_escala(img, proceso4.FACTOR_ESCALA_OCR))
+    return grafo_preproceso.nodo(grafo_escalado, 'rgb') if grafo_escalado is not None else None
+
+
+# Preprocesos: reciben el grafo de la franja (ver grafo_preproceso) y devuelven el arreglo
+# que se entrega al OCR (o None). Los pasos intermedios se calculan una vez por franja.
+PREPROCESOS = {
+    'inferior_optimizado': lambda grafo: proceso2.preprocesar_imagen_optimizada(None, 'inferior_optimizado', grafo),
+    'alto_contraste': lambda grafo: proceso2.preprocesar_imagen_optimizada(None, 'alto_contraste', grafo),
+    'raw': lambda grafo: grafo_preproceso.nodo(grafo, 'rgb'),
+    'sello': _sello_una_linea,
+    'otsu': lambda grafo: grafo_preproceso.nodo(grafo, 'otsu_inv'),
+    'escalado': _escalado,
+}
+
+EXTRACTORES = {
+    'mejorado': proceso2.extraer_coordenadas_mejorado,
+    'robusto': proceso4.extraer_coordenadas_robusto,
+}
+
+
+def seleccionar_estrategias(nombres=None):
+    """
+    Devuelve las estrategias a usar, en el orden pedido. 'nombres' es una lista o un
+    texto separado por comas (opción --estrategias); None usa ESTRATEGIAS completa.
+    """
+    if not nombres:
+        return list(ESTRATEGIAS)
+    if isinstance(nombres, str):
+        nombres = [nombre.strip() for nombre in nombres.split(',') if nombre.strip()]
+    por_nombre = {estrategia[0]: estrategia for estrategia in ESTRATEGIAS}
+    desconocidas = [nombre for nombre in nombres if nombre not in por_nombre]
+    if desconocidas:
+        raise ValueError(f"Estrategias desconocidas: {', '.join(desconocidas)}. Disponibles: {', '.join(NOMBRES_ESTRATEGIAS)}")
+    return [por_nombre[nombre] for nombre in nombres]
+
+
+# --------------------------------------------------------------------------
+# I. BÚSQUEDA Y LECTURA DE LA FOTO
+# --------------------------------------------------------------------------
+
+def buscar_imagen(indice, ot_raw, resto):
+    """
+    Ruta de la foto de una falla: primero los nombres exactos que usaba proceso2
+    y luego la búsqueda por prefijo de proceso4 (ver indice_fotos). None si no existe.
+    """
+    return indice_fotos.buscar_foto(indice, [ot_raw.zfill(8) + resto, "00" + ot_raw + resto])
+
+
+def franjas_de_imagen(ruta_imagen, estrategias):
+    """
+    Decodifica la foto una sola vez con la franja más alta que piden las estrategias
+    y deriva de ella las demás (vistas, sin copiar). Devuelve {porcentaje: franja} o None.
+    """
+    porcentajes = sorted({estrategia[1] for estrategia in estrategias}, reverse=True)
+    franja_mayor = lector_imagenes.cargar_franja_inferior(ruta_imagen, porcentajes[0])
+    if franja_mayor is None:
+        return None
+    franjas = {porcentajes[0]: franja_mayor}
+    for porcentaje in porcentajes[1:]:
+        filas_franja = int(round(franja_mayor.shape[0] * porcentaje / porcentajes[0]))
+        franjas[porcentaje] = franja_mayor[franja_mayor.shape[0] - filas_franja:, :]
+    return franjas
+
+
+# --------------------------------------------------------------------------
+# II. EVALUACIÓN DE ESTRATEGIAS Y VALIDACIÓN
+# --------------------------------------------------------------------------
+
+def validar_extraccion(lat_ext, lon_ext, metodo, rangos):
+    """
+    Corrección heurística, conversión y validación geográfica de una extracción.
+    Devuelve (es_valido, lat_ext, lon_ext, lat_dec, lon_dec); el DMS ya llega convertido a
+    decimal (ver coordenadas_ocr), así que pasa por la misma validación.
+    """
+    lat_min, lat_max, lon_min, lon_max = rangos or (proceso4.LAT_MIN_ESPERADA, proceso4.LAT_MAX_ESPERADA,
+                                                    proceso4.LON_MIN_ESPERADA, proceso4.LON_MAX_ESPERADA)
+    lat_ext, lon_ext = proceso4.corregir_latitud_ocr(lat_ext, lon_ext, rangos)
+    lat_dec = proceso4.convertir_a_decimal(lat_ext)
+    lon_dec = proceso4.convertir_a_decimal(lon_ext)
+    es_valido = (proceso4.validar_rango_geografico(lat_dec, lon_dec)
+                 and proceso4.validar_rango_proximidad(lat_dec, lon_dec, lat_min, lat_max, lon_min, lon_max))
+    return es_valido, lat_ext, lon_ext, lat_dec, lon_dec
+
+
+def leer_estrategia(nombre, extractor, texto, rangos):
+    """
+    Coordenadas del texto OCR de una estrategia: None si no hay par; si no, (es_valido,
+    (lat_ext, lon_ext, lat_dec, lon_dec, metodo, lectura)) con 'lectura' las coordenadas
+    crudas (lat, lon, metodo) y el método con _FUERA_RANGO si no pasó la validación.
+    """
+    lat_ext, lon_ext, patron = EXTRACTORES[extractor](texto, rangos)
+    if not (lat_ext and lon_ext):
+        return None
+    metodo = f"{patron}_{nombre}"
+    lectura = (lat_ext, lon_ext, metodo)
+    es_valido, lat_ext, lon_ext, lat_dec, lon_dec = validar_extraccion(lat_ext, lon_ext, metodo, rangos)
+    return es_valido, (lat_ext, lon_ext, lat_dec, lon_dec, metodo if es_valido else f"{metodo}_FUERA_RANGO", lectura)
+
+
+def releer_textos(textos, rangos):
+    """
+    Lectura (lat, lon, metodo) que daría aplicar_estrategias con los textos OCR ya guardados
+    [(estrategia, texto)] y los 'rangos' de la ciudad: la primera válida o, si ninguna, la
+    primera fuera de rango; None si ningún texto trae coordenadas (ver revalidacion).
+    """
+    por_nombre = {estrategia[0]: estrategia for estrategia in ESTRATEGIAS}
+    fuera_de_rango = None
+    for nombre, texto in textos:
+        if nombre not in por_nombre:
+            continue
+        leida = leer_estrategia(nombre, por_nombre[nombre][4], texto, rangos)
+        if leida is None:
+            continue
+        if leida[0]:
+            return leida[1][5]
+        if fuera_de_rango is None:
+            fuera_de_rango = leida[1][5]
+    return fuera_de_rango
+
+
+def _textos_de_bloque(bloque, aceptar=None):
+    """
+    Textos OCR de un bloque de variantes [(img_pil, config_ocr)], en el mismo orden. Con
+    'aceptar' los lotes paran en la primera variante aceptada (ver ocr_motor.reconocer_variantes).
+    """
+    if OCR_POR_LOTES:
+        try:
+            return ocr_motor.reconocer_variantes(bloque, aceptar=aceptar)
+        except Exception:
+            return [''] * len(bloque)
+    textos = []
+    for img_pil, config_ocr in bloque:
+        try:
+            textos.append(ocr_motor.reconocer(img_pil, config_ocr=config_ocr))
+        except Exception:
+            textos.append('')
+    return textos
+
+
+def aplicar_estrategias(franjas, estrategias, rangos, estadisticas=None):
+    """
+    Prueba las estrategias en orden y se detiene en la primera extracción validada.
+    Devuelve (resultado_valido, primer_fuera_de_rango, imagenes, textos); cada resultado es
+    (lat_ext, lon_ext, lat_dec, lon_dec, metodo, lectura) o None, con 'lectura' las
+    coordenadas crudas del OCR (lat, lon, metodo) antes de la corrección. 'imagenes' son las
+    variantes preprocesadas (se guardan como diagnóstico si todo falla) y 'textos' los textos
+    OCR [(estrategia, texto)] hasta la ganadora, en orden (ver revalidacion). Con 'estadisticas' (orden
+    adaptativo) las estrategias se reconocen de una en una y cada estrategia probada, hasta
+    la ganadora, se suma con su propio tiempo de OCR; sin ellas se usan bloques (OCR_POR_LOTES).
+    """
+    imagenes = {} # (porcentaje, preproceso) -> PIL; las estrategias que solo cambian el PSM comparten imagen
+    fuera_de_rango = None
+    textos_probados = []
+    # Un grafo por franja; las franjas menores son hijas de la mayor y comparten su gris
+    porcentaje_mayor = max(franjas)
+    grafo_mayor = grafo_preproceso.nuevo_grafo(franjas[porcentaje_mayor])
+    grafos = {porcentaje: grafo_preproceso.franja_inferior(grafo_mayor, franja.shape[0]) for porcentaje, franja in franjas.items()}
+    tamano_bloque = TAMANO_BLOQUE if OCR_POR_LOTES and estadisticas is None else 1
+
+    for inicio in range(0, len(estrategias), tamano_bloque):
+        bloque = []
+        for nombre, porcentaje, preproceso, config_ocr, extractor in estrategias[inicio:inicio + tamano_bloque]:
+            clave = (porcentaje, preproceso)
+            if clave not in imagenes:
+                arreglo = PREPROCESOS[preproceso](grafos[porcentaje]) if franjas[porcentaje].size else None
+                imagenes[clave] = Image.fromarray(arreglo) if arreglo is not None else None
+            if imagenes[clave] is not None:
+                bloque.append((nombre, config_ocr, extractor, imagenes[clave]))
+
+        def aceptar(posicion, texto):
+            nombre, _, extractor, _ = bloque[posicion]
+            leida = leer_estrategia(nombre, extractor, texto, rangos)
+            return leida is not None and leida[0]
+
+        inicio_ocr = cache_ocr.segundos_ocr() # Los textos de la caché cuentan con su costo original
+        textos = _textos_de_bloque([(img_pil, config_ocr) for _, config_ocr, _, img_pil in bloque], aceptar)
+        segundos_ocr = cache_ocr.segundos_ocr() - inicio_ocr # Con 'estadisticas' el bloque es una sola estrategia
+        ganadora = None
+        for (nombre, _, extractor, _), texto in zip(bloque, textos):
+            if texto is None:
+                break # Después de la aceptada ya no se reconoció
+            textos_probados.append((nombre, texto))
+            leida = leer_estrategia(nombre, extractor, texto, rangos)
+            if leida is None:
+                continue
+            if leida[0]:
+                ganadora = nombre, leida[1]
+                break
+            if fuera_de_rango is None:
+                fuera_de_rango = leida[1]
+        if estadisticas is not None:
+            for nombre, _, _, _ in bloque:
+                planificador_pasadas.registrar(estadisticas, GRUPO_PASADAS, nombre,
+                                               ganadora is not None and nombre == ganadora[0], segundos_ocr)
+        if ganadora is not None:
+            return ganadora[1], fuera_de_rango, imagenes, textos_probados
+    return None, fuera_de_rango, imagenes, textos_probados
+
+
+def guardar_diagnostico(nombre_base, ruta_imagen, franjas, imagenes, fuera_de_rango):
+    """Imágenes de diagnóstico de una falla (mismos nombres que usaban proceso3/proceso4)."""
+    try:
+        if fuera_de_rango is not None:
+            img_pil_recortada = Image.fromarray(_a_rgb(franjas[max(franjas)]))
+            img_con_coords = proceso4.dibujar_coordenadas_en_imagen(img_pil_recortada, fuera_de_rango[0], fuera_de_rango[1])
+            img_con_coords.save(os.path.join('diagnostico_ocr', f"DEBUG_{nombre_base}_FUERA_RANGO_{os.path.basename(ruta_imagen)}"))
+            return
+        for (_, preproceso), img_pil in imagenes.items():
+            if preproceso in ('raw', 'otsu') and img_pil is not None:
+                sufijo = 'RAW' if preproceso == 'raw' else 'Otsu'
+                img_pil.save(os.path.join('diagnostico_ocr', f"DEBUG_{nombre_base}_{sufijo}_Fallido.png"))
+    except Exception:
+        pass
+
+
+# --------------------------------------------------------------------------
+# III. FUNCIÓN PRINCIPAL DE REPROCESAMIENTO
+# --------------------------------------------------------------------------
+
+def procesar_fallas_csv(ciudad_seleccionada, filas=None, exportar=True, estrategias=None):
+    """
+    Reintenta las fallas de proceso1 con la lista ordenada de estrategias.
+    Si se reciben 'filas' (pipeline en proceso) se trabaja sobre ellas en memoria; si no,
+    se consultan del almacén SOLO las filas con fallo y al final se actualizan solo esas.
+    Con exportar=False no se tocan el almacén ni el CSV; el resto se escribe siempre, porque
+    las ejecuciones siguientes dependen de ello: estadisticas_pasadas.csv y lecturas_ocr.csv
+    (si hubo fallas que revisar), el manifiesto y las imágenes de diagnóstico de las fallas.
+    Devuelve la lista completa de filas actualizada. Si no se eligen 'estrategias', su orden
+    en cada foto sale del historial de aciertos y costo (ver planificador_pasadas).
+    """
+    orden_adaptativo = estrategias is None
+    estrategias = seleccionar_estrategias(estrategias)
+
+    print("\n\n--- CONTEXTO DE CIUDAD ---")
+    print(f"[reintentos.py] Procesando con el contexto de CIUDAD: {ciudad_seleccionada}")
+    rangos_especificos = proceso4.obtener_rangos_por_ciudad(ciudad_seleccionada)
+    if rangos_especificos:
+        print(f"✅ Contexto cargado: {ciudad_seleccionada}. Rango: Lat {rangos_especificos[0]}° a {rangos_especificos[1]}°")
+    else:
+        print(f"⚠️ Ciudad '{ciudad_seleccionada}' no reconocida. Usando rango general de México.")
+
+    print(f"--- 🚀 Iniciando Reintentos de Fallas ({len(estrategias)} estrategias) ---")
+    print(f"   Orden: {', '.join(estrategia[0] for estrategia in estrategias)}")
+
+    # 1. FILAS RECIBIDAS EN MEMORIA, o solo las fallas del almacén (consulta indexada por Estatus)
+    ordenes_almacen = None
+    if filas is not None:
+        filas_leidas = filas
+    else:
+        ordenes_almacen, filas_leidas = almacen_resultados.fallas_para_reproceso(ESTATUS_FALLO, CSV_ENTRADA)
+    if filas_leidas is None:
+        return None
+
+    # Fallas ya reintentadas en una ejecución anterior sobre la misma foto (ver manifiesto.py)
+    claves_previas = manifiesto.claves_sin_cambios(CARPETA_IMAGENES, rangos_especificos)
+    filas_originales = []
+    archivos_a_reprocesar_indices = []
+    omitidas_manifiesto = 0
+    for i, fila in enumerate(filas_leidas):
+        fila_completa = {campo: fila.get(campo, '') for campo in almacen_resultados.CAMPOS}
+        filas_originales.append(fila_completa)
+        if fila_completa.get('Estatus', '').strip().upper() == ESTATUS_FALLO:
+            if almacen_resultados.clave_fila(fila_completa['OT'], fila_completa['Resto_Nombre']) in claves_previas:
+                omitidas_manifiesto += 1
+                continue
+            archivos_a_reprocesar_indices.append(i)
+
+    print(f"📊 Total registros: {len(filas_originales)} | Fallas a revisar: {len(archivos_a_reprocesar_indices)} | Sin cambios (manifiesto): {omitidas_manifiesto}")
+
+    # Historial de aciertos y costo de las estrategias; la primera vez se siembra con los
+    # Metodo_Extraccion ya guardados (en el almacén solo se consultan las filas CORRECTO)
+    estadisticas = planificador_pasadas.cargar_estadisticas()
+    nombres_estrategias = [estrategia[0] for estrategia in estrategias]
+    if orden_adaptativo and archivos_a_reprocesar_indices and not any(g == GRUPO_PASADAS for g, _ in estadisticas):
+        filas_exito = filas_originales if ordenes_almacen is None else almacen_resultados.filas_con_estatus(ESTATUS_EXITO)[1]
+        planificador_pasadas.sembrar_desde_historial(estadisticas, GRUPO_PASADAS, nombres_estrategias,
+                                                     [f.get('Metodo_Extraccion', '') for f in filas_exito
+                                                      if f.get('Estatus', '').strip().upper() == ESTATUS_EXITO])
+    if orden_adaptativo:
+        por_nombre = {estrategia[0]: estrategia for estrategia in estrategias}
+        print(f"📈 Orden según historial: {', '.join(planificador_pasadas.ordenar(GRUPO_PASADAS, nombres_estrategias, estadisticas))}")
+
+    # Coordenadas crudas del OCR de cada foto, para revalidar sin OCR (ver revalidacion)
+    lecturas = revalidacion.cargar_lecturas() if archivos_a_reprocesar_indices else None
+
+    # La carpeta de fotos se lee una sola vez para todas las búsquedas
+    indice = indice_fotos.construir_indice(CARPETA_IMAGENES) if archivos_a_reprocesar_indices else None
+
+    exitos = 0
+    # 2. UNA LECTURA POR FOTO Y LAS ESTRATEGIAS EN ORDEN
+    for total_procesado, index in enumerate(archivos_a_reprocesar_indices, start=1):
+        fila = filas_originales[index]
+        ot_raw = fila.get('OT', '').strip()
+        resto = fila.get('Resto_Nombre', '').strip()
+        ot_pad = ot_raw.zfill(8)
+        nombre_base = ot_pad + resto
+
+        print(f"\n[{total_procesado}/{len(archivos_a_reprocesar_indices)}] ⏳ Analizando Archivo: {nombre_base}")
+
+        ruta_imagen_encontrada = buscar_imagen(indice, ot_raw, resto)
+        if not ruta_imagen_encontrada:
+            fila['Metodo_Extraccion'] = 'Error_Ruta_Final'
+            print(f" 	❌ Resultado: Imagen no encontrada en carpeta '{CARPETA_IMAGENES}'.")
+            continue
+
+        try:
+            franjas = franjas_de_imagen(ruta_imagen_encontrada, estrategias)
+            if franjas is None:
+                print(f" 	❌ Error: No se pudo cargar la imagen OpenCV desde '{ruta_imagen_encontrada}'.")
+                continue
+
+            estrategias_foto = estrategias
+            if orden_adaptativo:
+                estrategias_foto = [por_nombre[nombre] for nombre in
+                                    planificador_pasadas.ordenar(GRUPO_PASADAS, nombres_estrategias, estadisticas, semilla=nombre_base)]
+            resultado, fuera_de_rango, imagenes, textos = aplicar_estrategias(franjas, estrategias_foto, rangos_especificos,
+                                                                      estadisticas if orden_adaptativo else None)
+
+            lectura = ('', '', '') # Sin coordenadas: quedan los textos para revalidar
+            if resultado is not None:
+                lat_ext, lon_ext, lat_dec, lon_dec, metodo, lectura = resultado
+                fila['OT'] = ot_pad
+                fila['Estatus'] = ESTATUS_EXITO
+                exitos += 1
+                print(f" 	✔️ ÉXITO: {metodo} | Coordenadas: {lat_ext}, {lon_ext} | Estatus: {ESTATUS_EXITO}")
+            elif fuera_de_rango is not None:
+                # Se conservan las coordenadas detectadas para revisión manual
+                lat_ext, lon_ext, lat_dec, lon_dec, metodo, lectura = fuera_de_rango
+                print(f" 	❌ FALLA: {metodo} | Coordenadas extraídas: {lat_ext}, {lon_ext} | Estatus: {ESTATUS_FALLO} (Fuera de Rango)")
+            else:
+                lat_ext, lon_ext, lat_dec, lon_dec, metodo = 'FALLO', 'FALLO', '', '', "Fallo_OCR_Final"
+                print(f" 	❌ FALLA: {metodo} | Estatus: {ESTATUS_FALLO}")
+
+            if resultado is None:
+                guardar_diagnostico(nombre_base, ruta_imagen_encontrada, franjas, imagenes, fuera_de_rango)
+
+            fila['Latitud_Extraida'] = lat_ext
+            fila['Longitud_Extraida'] = lon_ext
+            fila['Latitud_Decimal'] = lat_dec if lat_dec is not None else ''
+            fila['Longitud_Decimal'] = lon_dec if lon_dec is not None else ''
+            fila['Metodo_Extraccion'] = metodo
+            revalidacion.registrar_lectura(lecturas, ot_raw, resto, revalidacion.ETAPA_REINTENTOS, lectura + (textos,))
+
+        except Exception as e:
+            print(f" 	❌ Error en el procesamiento de '{nombre_base}': {e}")
+            fila['Metodo_Extraccion'] = f'ERROR_CRITICO: {e}'
+
+    # 3. GUARDAR: solo las filas reprocesadas; es la última etapa de OCR, así que se exporta el CSV
+    if exportar:
+        if ordenes_almacen is not None:
+            almacen_resultados.actualizar_filas(ordenes_almacen, filas_originales)
+            filas_originales = almacen_resultados.leer_filas() # Lista completa para el CSV y el manifiesto
+        else:
+            almacen_resultados.guardar_filas(filas_originales)
+        almacen_resultados.exportar_csv(CSV_SALIDA)
+    print(f"\n✨ REPORTE FINAL: Se recuperaron {exitos} coordenadas de {len(archivos_a_reprocesar_indices)} fallas revisadas.")
+    ocr_motor.informar_variantes_de_mas()
+    if archivos_a_reprocesar_indices:
+        planificador_pasadas.guardar_estadisticas(estadisticas)
+        revalidacion.guardar_lecturas(lecturas)
+
+    # Resultado final de OCR: es el que se guarda en el manifiesto
+    manifiesto.actualizar_manifiesto(filas_originales, rangos_especificos)
+
+    return filas_originales
+
+# --------------------------------------------------------------------------
+# IV. CONFIGURACIÓN DE EJECUCIÓN
+# --------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    if not os.path.exists('diagnostico_ocr'):
+        os.makedirs('diagnostico_ocr')
+
+    try:
+        # sys.argv[1] es la Ciudad (Argumento 1)
+        # sys.argv[2] es la Ruta de Tesseract (Argumento 2)
+        # El resto son las opciones compartidas con proceso1 (ej. --estrategias RAW_PSM6,RAW_PSM11)
+        if len(sys.argv) < 3:
+            raise IndexError("Se esperaban los argumentos de CIUDAD y RUTA TESSERACT.")
+
+        ciudad_input = sys.argv[1].upper()
+        tesseract_path = sys.argv[2]
+        opciones = proceso1.leer_opciones(sys.argv[3:])
+
+        pytesseract.pytesseract.tesseract_cmd = tesseract_path
+        print(f"[reintentos.py] Configurando Tesseract con la ruta dinámica: '{tesseract_path}'")
+        print(f"[reintentos.py] Motor OCR: '{ocr_motor.seleccionar_motor(opciones.motor)}'")
+
+        print(f"[reintentos.py] Recibida CIUDAD desde el orquestador: '{ciudad_input}'")
+        if procesar_fallas_csv(ciudad_input, estrategias=opciones.estrategias) is None:
+            sys.exit(1)
+
+    except IndexError as e:
+        print(f"[reintentos.py] ERROR: {e} Se esperaba el argumento de la CIUDAD y la RUTA TESSERACT desde 'app.py'.")
+        sys.exit(1)
+    except Exception as e:
+        print(f"[reintentos.py] ERROR: Fallo al ejecutar los reintentos. {e}")
+        sys.exit(1)
@@ -0,0 +1,315 @@
+import os
+import sys
+import csv
+import json
+import time
+import numpy as np
+import pandas as pd
+import almacen_resultados # Clave de fila, almacén y exportación del CSV de resultados
+import manifiesto # Resultado final de cada foto (es lo que se revalida)
+
+# =========================================================================
+# 📌 LECTURAS OCR Y REVALIDACIÓN SIN OCR
+# =========================================================================
+# El contexto de ciudad (RANGOS_CIUDADES), la corrección del dígito inicial
+# (corregir_latitud_ocr), la W forzada de proceso1 y el lector de coordenadas
+# (coordenadas_ocr: confusiones O/0 e I/1, orden de los candidatos) solo cambian
+# cómo se interpreta el texto ya reconocido, pero cambiar cualquiera obligaba a
+# volver a pasar toda la carpeta por el OCR.
+# Aquí se guardan, por foto y etapa, los TEXTOS que devolvió el OCR en cada intento
+# probado, en orden (proceso1: sello, pasadas y ROIs hasta el que dio coordenadas;
+# reintentos: las estrategias hasta la válida), junto con las coordenadas crudas
+# que se tomaron de ellos (antes de la corrección, la W y la validación).
+#
+#   python revalidacion.py CIUDAD
+#
+# vuelve a leer las coordenadas de esos textos con las reglas actuales (el primer
+# intento con par en proceso1; la primera estrategia válida con la ciudad, o la
+# primera fuera de rango, en reintentos), aplica corrección, conversión a decimal y
+# validación de rangos como operaciones de columna (pandas / NumPy), sin abrir una
+# sola imagen, y reescribe el manifiesto y el CSV de resultados. Por foto se valida
+# primero la lectura de proceso1 y, si no pasa, la de reintentos (igual que el
+# pipeline). Las lecturas guardadas por versiones anteriores, sin textos, se
+# revalidan con sus coordenadas crudas.
+# Toda foto con lectura guardada toma el resultado recalculado (coordenadas,
+# decimales, estatus y método), cambie o no su estatus; solo las que siguen NO
+# ENCONTRADO sin registro de reintentos conservan lo que tenían (su fila la dejó una
+# etapa que no guarda lectura). Las que dejan de ser CORRECTO quedan NO ENCONTRADO y
+# su firma en el manifiesto se marca (MARCA_REINTENTAR) para que la siguiente
+# ejecución normal las reintente con OCR; si una revalidación posterior las vuelve a
+# dar por buenas, la marca se quita. Las fotos que quedan CORRECTO con lectura
+# guardada toman en el manifiesto el rango de la nueva ciudad (Rango_Ciudad); las
+# demás conservan el suyo y, si la ciudad cambió, la siguiente ejecución las reintenta.
+
+ARCHIVO_LECTURAS = 'lecturas_ocr.csv'
+CAMPOS_LECTURAS = ['OT', 'Resto_Nombre', 'Etapa', 'Latitud_OCR', 'Longitud_OCR', 'Metodo_Extraccion', 'Textos_OCR']
+ETAPA_PROCESO1 = 'proceso1'
+ETAPA_REINTENTOS = 'reintentos'
+ESTATUS_EXITO = 'CORRECTO'
+ESTATUS_FALLO = 'NO ENCONTRADO'
+METODO_FALLO_REINTENTOS = 'Fallo_OCR_Final' # Metodo_Extraccion de reintentos cuando ninguna estrategia dio coordenadas
+MARCA_REINTENTAR = 'reintentar:' # Prefijo de Mtime_ns: la firma ya no coincide y la foto vuelve al OCR
+
+
+def cargar_lecturas(ruta_lecturas=ARCHIVO_LECTURAS):
+    """
+    Devuelve {(clave_fila, etapa): (lat_ocr, lon_ocr, metodo, textos)}, con 'textos' la tupla
+    de (intento, texto OCR) en orden (vacía en archivos anteriores); vacío si no hay archivo.
+    """
+    if not os.path.exists(ruta_lecturas):
+        return {}
+    try:
+        with open(ruta_lecturas, 'r', newline='', encoding='utf-8') as archivo_csv:
+            return {
+                (almacen_resultados.clave_fila(e['OT'], e['Resto_Nombre']), e['Etapa']):
+                    (e['Latitud_OCR'], e['Longitud_OCR'], e['Metodo_Extraccion'],
+                     tuple(tuple(par) for par in json.loads(e.get('Textos_OCR') or '[]')))
+                for e in csv.DictReader(archivo_csv)
+            }
+    except Exception as e:
+        print(f"⚠️ No se pudieron leer las lecturas OCR '{ruta_lecturas}' ({e}). Se empieza de nuevo.")
+        return {}
+
+
+def guardar_lecturas(lecturas, ruta_lecturas=ARCHIVO_LECTURAS):
+    """Reescribe el archivo de lecturas (reemplazo atómico)."""
+    try:
+        ruta_temporal = ruta_lecturas + '.tmp'
+        with open(ruta_temporal, 'w', newline='', encoding='utf-8') as archivo_csv:
+            escritor = csv.writer(archivo_csv)
+            escritor.writerow(CAMPOS_LECTURAS)
+            for ((ot, resto_nombre), etapa), (lat_ocr, lon_ocr, metodo, textos) in sorted(lecturas.items()):
+                escritor.writerow([ot, resto_nombre, etapa, lat_ocr, lon_ocr, metodo, json.dumps(textos, ensure_ascii=False)])
+        os.replace(ruta_temporal, ruta_lecturas)
+    except Exception as e:
+        print(f"⚠️ No se pudieron escribir las lecturas OCR '{ruta_lecturas}'. {e}")
+
+
+def registrar_lectura(lecturas, ot, resto_nombre, etapa, lectura):
+    """
+    Guarda la lectura (lat_ocr, lon_ocr, metodo, textos) de la foto en esa etapa ('' en las
+    coordenadas si ningún texto dio un par; 'textos' son los (intento, texto OCR) probados en
+    orden); con None la olvida.
+    """
+    clave = (almacen_resultados.clave_fila(ot, resto_nombre), etapa)
+    if lectura is None:
+        lecturas.pop(clave, None)
+    else:
+        *coordenadas, textos = lectura
+        lecturas[clave] = tuple('' if valor is None else str(valor) for valor in coordenadas) + (
+            tuple((str(intento), '' if texto is None else str(texto)) for intento, texto in textos),)
+
+
+# --------------------------------------------------------------------------
+# REGLAS DE INTERPRETACIÓN POR COLUMNA (mismas que proceso1 / reintentos)
+# --------------------------------------------------------------------------
+
+def corregir_latitud(lat, rangos):
+    """corregir_latitud_ocr por columna: primer dígito 9/7/5/0 seguido de punto -> dígito esperado de la ciudad."""
+    if not rangos:
+        return lat
+    parte_entera_esperada = str(int(rangos[0]))
+    digito_esperado = parte_entera_esperada[0]
+    if digito_esperado not in ('1', '2', '3'):
+        return lat
+    erroneo = lat.str.match(r'[9750][.,]')
+    prefijo = pd.Series(np.where((lat.str[:1] == '0') & parte_entera_esperada.startswith('20'), '20', digito_esperado),
+                        index=lat.index)
+    return lat.where(~erroneo, prefijo + lat.str[1:])
+
+
+def forzar_oeste(lon, lon_min_mag, lon_max_mag):
+    """Ajuste de proceso1: longitud sin signo ni cardinal con magnitud de México -> se agrega 'W'."""
+    lon_temp = lon.str.strip().str.upper()
+    numero = lon_temp.str.replace(',', '.', regex=False).str.replace(r'[^0-9.]', '', regex=True).str.strip()
+    valor = pd.to_numeric(numero.where(numero != ''), errors='coerce')
+    forzar = (numero != '') & ~lon_temp.str.contains(r'[NWSE-]', regex=True) & valor.between(lon_min_mag, lon_max_mag)
+    return lon.where(~forzar, lon + 'W')
+
+
+def decimal_proceso1(coordenadas):
+    """convertir_a_decimal de proceso1 por columna (NaN donde no se puede convertir)."""
+    texto = coordenadas.str.strip()
+    negativo = texto.str.startswith('-')
+    cardinal = texto.str[-1:].str.upper()
+    con_cardinal = ~negativo & cardinal.isin(['N', 'S', 'E', 'W'])
+    valor = pd.to_numeric(texto.where(~con_cardinal, texto.str[:-1]).where(texto != ''), errors='coerce')
+    return valor.where(~(con_cardinal & cardinal.isin(['S', 'W'])), -valor)
+
+
+def decimal_reintentos(coordenadas):
+    """convertir_a_decimal de proceso4 (usado por reintentos) por columna: acepta coma decimal y signo."""
+    texto = coordenadas.str.strip()
+    vacio = (texto == '') | (texto == 'FALLO') | texto.str.contains('°', regex=False)
+    signo = np.where(texto.str.startswith('-'), -1.0, 1.0)
+    ultimo = texto.str[-1:]
+    con_cardinal = ultimo.str.isalpha()
+    cuerpo = texto.where(~con_cardinal, texto.str[:-1]).str.replace(',', '.', regex=False).str.replace('-', '', regex=False).str.strip()
+    valor = pd.to_numeric(cuerpo.where(~vacio), errors='coerce')
+    return (valor * signo).where(~(con_cardinal & ultimo.str.upper().isin(['S', 'W'])), -valor)
+
+
+def en_rango(lat_dec, lon_dec, rango):
+    """validar_rango_geografico y validar_rango_proximidad por columna (NaN nunca es válido)."""
+    lat_min, lat_max, lon_min, lon_max = rango
+    return (lat_dec.between(-90.0, 90.0) & lon_dec.between(-180.0, 180.0)
+            & lat_dec.between(lat_min, lat_max) & lon_dec.between(lon_min, lon_max))
+
+
+def releer_proceso1(textos):
+    """Coordenadas crudas (lat, lon) del primer texto de proceso1 con un par (como la cascada); ('', '') si ninguno."""
+    import proceso1
+    for _, texto in textos:
+        lat, lon = proceso1.extraer_coordenadas_texto(texto)
+        if lat and lon:
+            return lat, lon
+    return '', ''
+
+
+def releer_textos(tabla, rangos_re):
+    """
+    Vuelve a leer las coordenadas crudas de las filas con textos OCR guardados (coordenadas_ocr
+    con las reglas actuales); las filas sin textos conservan las coordenadas guardadas.
+    """
+    import reintentos
+    tabla = tabla.copy()
+    con_textos = tabla['textos_p1'].map(len) > 0
+    if con_textos.any():
+        tabla.loc[con_textos, ['lat_p1', 'lon_p1']] = pd.DataFrame(
+            [releer_proceso1(textos) for textos in tabla.loc[con_textos, 'textos_p1']],
+            index=tabla.index[con_textos], columns=['lat_p1', 'lon_p1'])
+    con_textos = tabla['textos_re'].map(len) > 0
+    if con_textos.any():
+        tabla.loc[con_textos, ['lat_re', 'lon_re', 'metodo_re']] = pd.DataFrame(
+            [reintentos.releer_textos(textos, rangos_re) or ('', '', '') for textos in tabla.loc[con_textos, 'textos_re']],
+            index=tabla.index[con_textos], columns=['lat_re', 'lon_re', 'metodo_re'])
+    return tabla
+
+
+def revalidar_tabla(tabla, ciudad):
+    """
+    'tabla' tiene una fila por foto con lo guardado de cada etapa: columnas lat_p1, lon_p1,
+    textos_p1, lat_re, lon_re, metodo_re, textos_re ('' o () si no hay) y hay_re (reintentos
+    dejó registro de la foto). Devuelve la tabla con las coordenadas crudas releídas de los
+    textos y las columnas nuevas: Latitud_Extraida, Longitud_Extraida, Latitud_Decimal,
+    Longitud_Decimal, Estatus, Metodo_Extraccion.
+    """
+    import proceso1 # Las reglas y rangos viven en los procesos (se importan solo al revalidar)
+    import proceso4
+
+    rangos_re = proceso4.obtener_rangos_por_ciudad(ciudad)
+    tabla = releer_textos(tabla, rangos_re)
+
+    # proceso1: corrección con el rango de la ciudad, W forzada, validación con la ciudad o México
+    rangos_p1 = proceso1.obtener_rangos_por_ciudad(ciudad)
+    rango_p1 = rangos_p1 or (proceso1.LAT_MIN_ESPERADA, proceso1.LAT_MAX_ESPERADA, proceso1.LON_MIN_ESPERADA, proceso1.LON_MAX_ESPERADA)
+    lat_p1 = corregir_latitud(tabla['lat_p1'], rangos_p1)
+    lon_p1 = forzar_oeste(tabla['lon_p1'], proceso1.LON_MIN_MEX_MAG, proceso1.LON_MAX_MEX_MAG)
+    lat_dec_p1, lon_dec_p1 = decimal_proceso1(lat_p1), decimal_proceso1(lon_p1)
+    sin_par_p1 = (tabla['lat_p1'] == '') | (tabla['lon_p1'] == '')
+    valido_p1 = ~sin_par_p1 & en_rango(lat_dec_p1, lon_dec_p1, rango_p1)
+
+    # reintentos: corrección con la ciudad, conversión de proceso4. 'Patron_DMS' solo aparece en
+    # lecturas guardadas antes de coordenadas_ocr (DMS sin convertir): esas se aceptaban sin decimales
+    rango_re = rangos_re or (proceso4.LAT_MIN_ESPERADA, proceso4.LAT_MAX_ESPERADA, proceso4.LON_MIN_ESPERADA, proceso4.LON_MAX_ESPERADA)
+    lat_re = corregir_latitud(tabla['lat_re'], rangos_re)
+    lon_re = tabla['lon_re']
+    dms = tabla['metodo_re'].str.contains('Patron_DMS', regex=False)
+    lat_dec_re, lon_dec_re = decimal_reintentos(lat_re), decimal_reintentos(lon_re)
+    sin_par_re = (tabla['lat_re'] == '') | (tabla['lon_re'] == '')
+    valido_re = ~sin_par_re & (dms | en_rango(lat_dec_re, lon_dec_re, rango_re))
+
+    # Si proceso1 no valida, la fila es la de reintentos (si la foto pasó por ahí); sin par en
+    # ninguna etapa queda como la dejan las etapas: 'FALLO' y, en reintentos, METODO_FALLO_REINTENTOS
+    usa_re = ~valido_p1 & tabla['hay_re'].astype(bool)
+    sin_par = sin_par_re.where(usa_re, sin_par_p1)
+    tabla['Latitud_Extraida'] = lat_re.where(usa_re, lat_p1).where(~sin_par, 'FALLO')
+    tabla['Longitud_Extraida'] = lon_re.where(usa_re, lon_p1).where(~sin_par, 'FALLO')
+    tabla['Latitud_Decimal'] = lat_dec_re.where(usa_re & ~dms & ~sin_par, lat_dec_p1.where(valido_p1))
+    tabla['Longitud_Decimal'] = lon_dec_re.where(usa_re & ~dms & ~sin_par, lon_dec_p1.where(valido_p1))
+    tabla['Estatus'] = np.where(valido_p1 | (usa_re & valido_re), ESTATUS_EXITO, ESTATUS_FALLO)
+    tabla['Metodo_Extraccion'] = np.where(usa_re, np.where(valido_re, tabla['metodo_re'],
+                                                           np.where(sin_par, METODO_FALLO_REINTENTOS, tabla['metodo_re'] + '_FUERA_RANGO')), '')
+    return tabla
+
+
+def revalidar(ciudad, exportar=True):
+    """
+    Revalida todas las fotos del manifiesto con sus lecturas guardadas y devuelve las filas
+    finales (None si no hay manifiesto). Con exportar=True reescribe el manifiesto, el
+    almacén y el CSV de resultados.
+    """
+    import proceso1 # Rango de la ciudad con que queda validada cada entrada del manifiesto
+
+    inicio = time.perf_counter()
+    entradas = list(manifiesto.cargar_manifiesto().values())
+    if not entradas:
+        print(f"❌ No hay manifiesto '{manifiesto.ARCHIVO_MANIFIESTO}': ejecute primero el pipeline completo.")
+        return None
+    lecturas = cargar_lecturas()
+
+    columnas = {nombre: [] for nombre in ('lat_p1', 'lon_p1', 'textos_p1', 'lat_re', 'lon_re', 'metodo_re', 'textos_re', 'hay_re')}
+    con_lectura = []
+    for entrada in entradas:
+        clave = almacen_resultados.clave_fila(entrada['OT'], entrada['Resto_Nombre'])
+        lectura_p1 = lecturas.get((clave, ETAPA_PROCESO1))
+        lectura_re = lecturas.get((clave, ETAPA_REINTENTOS))
+        lat_p1, lon_p1, _, textos_p1 = lectura_p1 or ('', '', '', ())
+        lat_re, lon_re, metodo_re, textos_re = lectura_re or ('', '', '', ())
+        for nombre, valor in zip(columnas, (lat_p1, lon_p1, textos_p1, lat_re, lon_re, metodo_re, textos_re, lectura_re is not None)):
+            columnas[nombre].append(valor)
+        con_lectura.append(lectura_p1 is not None or lectura_re is not None)
+    tabla = revalidar_tabla(pd.DataFrame(columnas, dtype=object), ciudad)
+
+    # Toda fila con lectura toma los valores recalculados (salvo las que siguen NO ENCONTRADO
+    # sin registro de reintentos); la firma solo se toca si cambia el estatus. Las fotos
+    # resueltas por EXIF no tienen lectura OCR que revalidar
+    anterior_exito = np.array([entrada['Estatus'] == ESTATUS_EXITO for entrada in entradas], dtype=bool)
+    nuevo_exito = (tabla['Estatus'] == ESTATUS_EXITO).to_numpy()
+    con_lectura = np.array(con_lectura, dtype=bool)
+    escribe = con_lectura & (anterior_exito | nuevo_exito | tabla['hay_re'].to_numpy(dtype=bool))
+    cambia = escribe & (nuevo_exito != anterior_exito)
+    campos_nuevos = ['Latitud_Extraida', 'Longitud_Extraida', 'Latitud_Decimal', 'Longitud_Decimal', 'Estatus', 'Metodo_Extraccion']
+    valores_nuevos = tabla[campos_nuevos].astype(object).where(tabla[campos_nuevos].notna(), '')
+
+    recuperadas = perdidas = actualizadas = 0
+    for i in np.flatnonzero(escribe):
+        entrada = entradas[i]
+        anteriores = [entrada.get(campo, '') for campo in campos_nuevos]
+        entrada.update(zip(campos_nuevos, valores_nuevos.iloc[i].tolist()))
+        if nuevo_exito[i] and tabla['Metodo_Extraccion'].iat[i]: # Como en reintentos: la OT queda rellenada
+            entrada['OT'] = entrada['OT'].strip().zfill(8)
+        if not cambia[i]:
+            actualizadas += [str(valor) for valor in anteriores] != [str(entrada[campo]) for campo in campos_nuevos]
+        elif nuevo_exito[i]:
+            recuperadas += 1
+            entrada['Mtime_ns'] = entrada['Mtime_ns'].replace(MARCA_REINTENTAR, '', 1)
+        else:
+            perdidas += 1
+            entrada['Mtime_ns'] = MARCA_REINTENTAR + entrada['Mtime_ns']
+    # Validadas con la nueva ciudad: las que quedan CORRECTO a partir de su lectura OCR
+    rango = manifiesto.texto_rango(proceso1.obtener_rangos_por_ciudad(ciudad))
+    for i in np.flatnonzero(con_lectura & nuevo_exito):
+        entradas[i]['Rango_Ciudad'] = rango
+    filas = [{campo: entrada.get(campo, '') for campo in manifiesto.CAMPOS_FILA} for entrada in entradas]
+
+    print(f"🔁 Revalidación ({ciudad}): {len(entradas)} fotos, {int(con_lectura.sum())} con lectura OCR guardada; "
+          f"{recuperadas} pasan a {ESTATUS_EXITO}, {perdidas} a {ESTATUS_FALLO} y {actualizadas} cambian de lectura sin cambiar de estatus "
+          f"({time.perf_counter() - inicio:.2f} s, sin OCR).")
+    if perdidas:
+        print(f"   Las {perdidas} fotos que dejaron de ser válidas quedan marcadas en el manifiesto: la siguiente ejecución las reintenta con OCR.")
+
+    if exportar:
+        manifiesto.guardar_entradas(entradas)
+        almacen_resultados.guardar_filas(filas)
+        almacen_resultados.exportar_csv()
+    return filas
+
+
+if __name__ == '__main__':
+    # sys.argv[1] es la Ciudad
+    if len(sys.argv) < 2:
+        print("[revalidacion.py] ERROR: Se esperaba el argumento de CIUDAD.")
+        sys.exit(1)
+    if revalidar(sys.argv[1].upper()) is None:
+        sys.exit(1)